@@ -12,9 +12,101 @@ ALLOWED_ORIGINS = [
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# 单个上传文件的大小上限 (MB)，0表示不限制
+MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "4096"))
+
+# Chunked upload sessions
+CHUNKED_UPLOAD_DIR = UPLOAD_DIR / "chunked"
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))  # 未完成会话的保留时间
+
+# Content-addressed file store for uploads and generated files
+BLOB_DIR = UPLOAD_DIR / "blobs"
+UPLOAD_QUOTA_MB = int(os.getenv("UPLOAD_QUOTA_MB", "20480"))  # 磁盘配额，0表示不限制
+UPLOAD_RETENTION_HOURS = int(os.getenv("UPLOAD_RETENTION_HOURS", "72"))  # 文件最后访问后的保留时间，0表示不过期
+BLOB_JANITOR_INTERVAL_SECONDS = int(os.getenv("BLOB_JANITOR_INTERVAL_SECONDS", "600"))
+
+# Data directory (SQLite databases etc.)
+DATA_DIR = Path("data")
+DATA_DIR.mkdir(exist_ok=True)
+
+# Cache directory (transcription results etc.)
+CACHE_DIR = Path("cache")
+CACHE_DIR.mkdir(exist_ok=True)
+
 # Models directory
 MODELS_DIR = Path("models")
 
+# Whisper模型常驻内存预算 (MB)，超出时按LRU驱逐空闲模型，0表示不限制
+WHISPER_MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "4096"))
+
+# Whisper计算类型自动选择: 模型配置 (config.json 的 whisper_model_profiles) 中 compute_type 为 auto 时，
+# 在后台 (启动预加载时，或首次加载后) 比较各候选类型的速度，选择内存占用不超过上限 (MB，0表示使用模型内存预算)
+# 的最快类型并记录，结果产生前使用CTranslate2的默认类型。设为0禁用，始终使用默认类型
+WHISPER_AUTOTUNE = os.getenv("WHISPER_AUTOTUNE", "1") != "0"
+WHISPER_AUTOTUNE_MEMORY_MB = int(os.getenv("WHISPER_AUTOTUNE_MEMORY_MB", "0"))
+WHISPER_TUNING_PATH = DATA_DIR / "whisper_tuning.json"
+
+# 启动时在后台预加载并预热的Whisper模型 (逗号分隔)，未设置时为配置文件中的默认模型，设为 none 不预加载
+WHISPER_PRELOAD_MODELS = os.getenv("WHISPER_PRELOAD_MODELS")
+
+# Demucs模型常驻内存预算 (MB)，超出时按LRU驱逐空闲模型，0表示不限制。多进程分离的工作进程中的模型也计入此预算
+DEMUCS_MEMORY_BUDGET_MB = int(os.getenv("DEMUCS_MEMORY_BUDGET_MB", "1024"))
+
+# Demucs按窗口分离: 每个窗口的长度和相邻窗口的重叠 (秒)，重叠部分交叉淡化
+SEPARATION_WINDOW_SECONDS = float(os.getenv("SEPARATION_WINDOW_SECONDS", "30"))
+SEPARATION_OVERLAP_SECONDS = float(os.getenv("SEPARATION_OVERLAP_SECONDS", "2"))
+
+# CPU多进程分离: 进程数 (-1 自动按核心数分配, 0 禁用)、每个进程的torch线程数、每段的最短时长 (秒)
+SEPARATION_PROCESS_WORKERS = int(os.getenv("SEPARATION_PROCESS_WORKERS", "-1"))
+SEPARATION_THREADS_PER_WORKER = int(os.getenv("SEPARATION_THREADS_PER_WORKER", "2"))
+SEPARATION_MIN_SEGMENT_SECONDS = float(os.getenv("SEPARATION_MIN_SEGMENT_SECONDS", "60"))
+
+# 长音频分块并行转录: 工作进程数 (-1 自动按核心数分配, 0 禁用)、每个进程的线程数、
+# 每块的目标时长 (秒)、VAD切分所需的最短静音 (毫秒)
+TRANSCRIPTION_PROCESS_WORKERS = int(os.getenv("TRANSCRIPTION_PROCESS_WORKERS", "-1"))
+TRANSCRIPTION_THREADS_PER_WORKER = int(os.getenv("TRANSCRIPTION_THREADS_PER_WORKER", "2"))
+LONGFORM_CHUNK_SECONDS = float(os.getenv("LONGFORM_CHUNK_SECONDS", "120"))
+LONGFORM_MIN_SILENCE_MS = int(os.getenv("LONGFORM_MIN_SILENCE_MS", "500"))
+
+# 并发短音频的批量转录: 每批最多的30秒窗口数 (1 禁用)、凑批的最长等待时间 (毫秒)、
+# 参与批量转录的音频最长时长 (秒)，更长的音频按单个请求转录
+TRANSCRIPTION_BATCH_SIZE = int(os.getenv("TRANSCRIPTION_BATCH_SIZE", "8"))
+TRANSCRIPTION_BATCH_WAIT_MS = int(os.getenv("TRANSCRIPTION_BATCH_WAIT_MS", "50"))
+TRANSCRIPTION_BATCH_MAX_SECONDS = float(os.getenv("TRANSCRIPTION_BATCH_MAX_SECONDS", "120"))
+
+# 推理线程池配置
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))  # 推理线程数
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "8"))  # 最多排队的请求数
+INFERENCE_MODEL_CONCURRENCY = int(os.getenv("INFERENCE_MODEL_CONCURRENCY", "1"))  # 每个模型的并发数
+INFERENCE_MODEL_MAX_QUEUE = int(os.getenv("INFERENCE_MODEL_MAX_QUEUE", "4"))  # 每个模型最多排队的请求数
+
+BLOB_DB_PATH = DATA_DIR / "blobs.sqlite3"
+
+# 后台任务配置
+JOBS_DB_PATH = DATA_DIR / "jobs.sqlite3"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # 任务工作线程数
+TRANSLATION_JOB_WORKERS = int(os.getenv("TRANSLATION_JOB_WORKERS", "1"))  # 翻译任务的独立工作线程数
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "0.5"))  # 任务事件流检查进度的间隔
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))  # 结束的任务保留的小时数，0表示永久保留
+
+# 字幕翻译记忆
+TRANSLATION_MEMORY_DB_PATH = DATA_DIR / "translation_memory.sqlite3"
+
+# 转录结果缓存上限 (MB)
+TRANSCRIPTION_CACHE_MAX_MB = int(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", "512"))
+
+# 分离结果缓存索引的大小上限 (MB)，轨道文件本身保存在文件仓库中，受上传配额限制
+SEPARATION_CACHE_MAX_MB = int(os.getenv("SEPARATION_CACHE_MAX_MB", "16"))
+
+# 解码后的PCM缓存: 转录、分离和分析共享同一次解码，按文件哈希、采样率和声道数缓存 (MB)
+PCM_CACHE_DIR = CACHE_DIR / "pcm"
+PCM_CACHE_MAX_MB = int(os.getenv("PCM_CACHE_MAX_MB", "4096"))
+
+# 音频分析配置
+ANALYSIS_CACHE_MAX_MB = int(os.getenv("ANALYSIS_CACHE_MAX_MB", "16"))  # 分析结果缓存上限 (MB)
+ANALYSIS_BLOCK_SECONDS = float(os.getenv("ANALYSIS_BLOCK_SECONDS", "10"))  # 每次分析的音频长度
+ANALYSIS_SILENCE_THRESHOLD_DB = float(os.getenv("ANALYSIS_SILENCE_THRESHOLD_DB", "-60"))  # 低于此RMS视为静音 (dBFS)
+
 # Logs directory
 LOGS_DIR = Path("logs")
 LOGS_DIR.mkdir(exist_ok=True)
@@ -26,6 +118,19 @@ APP_VERSION = "1.0.0"
 # OpenAI API configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")  # 兼容OpenAI接口的服务地址 (如本地测试服务)
+
+# OpenAI客户端连接池: 最大连接数、空闲长连接保持时间 (秒)、请求超时 (秒)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_SECONDS", "120"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
+
+# 字幕批量翻译: 并发请求数、每批的token预算和条数上限、每批附带的上下文条数、限流重试次数
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))
+TRANSLATION_BATCH_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "1500"))
+TRANSLATION_BATCH_MAX_SEGMENTS = int(os.getenv("TRANSLATION_BATCH_MAX_SEGMENTS", "40"))
+TRANSLATION_CONTEXT_SEGMENTS = int(os.getenv("TRANSLATION_CONTEXT_SEGMENTS", "2"))
+TRANSLATION_MAX_RETRIES = int(os.getenv("TRANSLATION_MAX_RETRIES", "5"))
 
 # Logging configuration
 def setup_logging():
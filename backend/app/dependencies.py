@@ -1,4 +1,103 @@
+from .config import (
+    INFERENCE_WORKERS, INFERENCE_MAX_QUEUE, INFERENCE_MODEL_CONCURRENCY, INFERENCE_MODEL_MAX_QUEUE,
+    JOBS_DB_PATH, JOB_WORKERS, JOB_RETENTION_HOURS,
+    TRANSLATION_MEMORY_DB_PATH, CACHE_DIR, TRANSCRIPTION_CACHE_MAX_MB, SEPARATION_CACHE_MAX_MB,
+    ANALYSIS_CACHE_MAX_MB, PCM_CACHE_DIR, PCM_CACHE_MAX_MB,
+    CHUNKED_UPLOAD_DIR, UPLOAD_SESSION_TTL_HOURS,
+    BLOB_DIR, BLOB_DB_PATH, UPLOAD_QUOTA_MB, UPLOAD_RETENTION_HOURS,
+    SEPARATION_PROCESS_WORKERS, SEPARATION_THREADS_PER_WORKER, SEPARATION_MIN_SEGMENT_SECONDS,
+    TRANSCRIPTION_PROCESS_WORKERS, TRANSCRIPTION_THREADS_PER_WORKER, LONGFORM_CHUNK_SECONDS, LONGFORM_MIN_SILENCE_MS,
+    TRANSCRIPTION_BATCH_SIZE, TRANSCRIPTION_BATCH_WAIT_MS, TRANSCRIPTION_BATCH_MAX_SECONDS,
+    OPENAI_MAX_CONNECTIONS, OPENAI_KEEPALIVE_SECONDS, OPENAI_TIMEOUT_SECONDS, WHISPER_MEMORY_BUDGET_MB,
+    DEMUCS_MEMORY_BUDGET_MB
+)
+from .models.blob_store import BlobStore
+from .models.demucs_manager import DemucsModelManager
+from .models.inference_pool import InferencePool
+from .models.job_manager import JobManager
+from .models.model_preloader import ModelPreloader
+from .models.openai_client import OpenAIClientPool
+from .models.pcm_cache import PcmCache
+from .models.separation_pool import SeparationProcessPool
+from .models.transcription_batcher import TranscriptionBatcher
+from .models.transcription_pool import TranscriptionProcessPool
+from .models.translation_memory import TranslationMemory
+from .models.upload_manager import ChunkedUploadManager
 from .models.whisper_manager import WhisperModelManager
+from .utils.disk_cache import DiskCache
 
 # Global model manager instance
-model_manager = WhisperModelManager()
\ No newline at end of file
+model_manager = WhisperModelManager()
+
+# Background preload and warm-up of Whisper models at startup, reported by /api/ready
+model_preloader = ModelPreloader(model_manager)
+
+# Global Demucs model registry, keeps separation models warm between requests
+demucs_manager = DemucsModelManager()
+
+# Multi-process CPU separation, one process pool per model sized by the shared Demucs memory budget
+separation_pool = SeparationProcessPool(
+    workers=SEPARATION_PROCESS_WORKERS,
+    threads_per_worker=SEPARATION_THREADS_PER_WORKER,
+    min_segment_seconds=SEPARATION_MIN_SEGMENT_SECONDS,
+    memory_budget_mb=DEMUCS_MEMORY_BUDGET_MB,
+    resident_memory=demucs_manager.get_used_memory_mb,
+)
+
+# Long-form transcription: VAD chunks transcribed in parallel, one process pool per model sized by the shared Whisper memory budget
+transcription_pool = TranscriptionProcessPool(
+    workers=TRANSCRIPTION_PROCESS_WORKERS,
+    threads_per_worker=TRANSCRIPTION_THREADS_PER_WORKER,
+    chunk_seconds=LONGFORM_CHUNK_SECONDS,
+    min_silence_ms=LONGFORM_MIN_SILENCE_MS,
+    memory_budget_mb=WHISPER_MEMORY_BUDGET_MB,
+    resident_memory=model_manager.get_used_memory_mb,
+)
+
+# Global inference executor, keeps model inference off the event loop
+inference_pool = InferencePool(
+    max_workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_MAX_QUEUE,
+    per_model_concurrency=INFERENCE_MODEL_CONCURRENCY,
+    max_model_queue=INFERENCE_MODEL_MAX_QUEUE,
+)
+
+# Micro-batches concurrent short transcription requests for the same model into one batched forward pass
+transcription_batcher = TranscriptionBatcher(
+    model_manager,
+    inference_pool,
+    max_batch_size=TRANSCRIPTION_BATCH_SIZE,
+    max_wait_ms=TRANSCRIPTION_BATCH_WAIT_MS,
+    max_clip_seconds=TRANSCRIPTION_BATCH_MAX_SECONDS,
+)
+
+# Global background job queue, persisted to SQLite
+job_manager = JobManager(JOBS_DB_PATH, workers=JOB_WORKERS, retention_hours=JOB_RETENTION_HOURS)
+
+# Transcription result cache keyed by audio hash, model and decode options
+transcription_cache = DiskCache("transcription", CACHE_DIR / "transcription", TRANSCRIPTION_CACHE_MAX_MB)
+
+# Separated stems keyed by audio hash, model and channel mode (stems are stored as blobs)
+separation_cache = DiskCache("separation", CACHE_DIR / "separation", SEPARATION_CACHE_MAX_MB)
+
+# Audio analysis results keyed by audio hash and analysis settings
+analysis_cache = DiskCache("analysis", CACHE_DIR / "analysis", ANALYSIS_CACHE_MAX_MB)
+
+# Decoded PCM shared by transcription, separation and analysis, keyed by audio hash and sample format
+pcm_cache = PcmCache(PCM_CACHE_DIR, PCM_CACHE_MAX_MB)
+
+# Long-lived OpenAI client, rebuilt only when the API key or base URL changes
+openai_clients = OpenAIClientPool(
+    max_connections=OPENAI_MAX_CONNECTIONS,
+    keepalive_seconds=OPENAI_KEEPALIVE_SECONDS,
+    timeout_seconds=OPENAI_TIMEOUT_SECONDS,
+)
+
+# Subtitle translation memory keyed by normalized source text, languages, model and prompt version
+translation_memory = TranslationMemory(TRANSLATION_MEMORY_DB_PATH)
+
+# Content-addressed store for uploads and generated files
+blob_store = BlobStore(BLOB_DIR, BLOB_DB_PATH, UPLOAD_QUOTA_MB, UPLOAD_RETENTION_HOURS)
+
+# Resumable chunked uploads, finalized into the blob store
+upload_manager = ChunkedUploadManager(CHUNKED_UPLOAD_DIR, blob_store, UPLOAD_SESSION_TTL_HOURS)
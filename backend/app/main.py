@@ -0,0 +1,130 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from .config import (
+    ALLOWED_ORIGINS, APP_TITLE, APP_VERSION, BLOB_JANITOR_INTERVAL_SECONDS, WHISPER_PRELOAD_MODELS, setup_logging
+)
+from .routers.health import router as health_router
+from .routers.models import router as models_router
+from .routers.audio import router as audio_router
+from .routers.config import router as config_router, load_config
+from .routers.jobs import router as jobs_router
+from .routers.cache import router as cache_router
+from .routers.uploads import router as uploads_router
+from .dependencies import (
+    model_manager, model_preloader, inference_pool, job_manager, blob_store, separation_pool, transcription_pool,
+    openai_clients
+)
+from .models.model_preloader import parse_preload_list
+from .utils.system_utils import check_cuda
+from loguru import logger
+
+# 初始化日志系统
+setup_logging()
+
+# 启动时检查CUDA
+cuda_info = check_cuda()
+if cuda_info["available"]:
+    logger.info(f"✅ CUDA可用: {cuda_info['device_count']} 个设备")
+else:
+    logger.info(f"⚠️ CUDA不可用: {cuda_info.get('error', '未知原因')}")
+
+# 固定默认模型，避免被LRU驱逐
+model_manager.pin_model(load_config().get("whisper_default_model", "base"))
+
+# 创建FastAPI应用
+app = FastAPI(title=APP_TITLE, version=APP_VERSION)
+
+# 配置CORS，允许前端访问
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=ALLOWED_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.on_event("startup")
+async def bind_inference_pool():
+    """后台任务线程通过服务的事件循环提交推理，需在任务调度器启动前绑定"""
+    inference_pool.bind_loop(asyncio.get_running_loop())
+
+@app.on_event("startup")
+def start_job_manager():
+    """恢复中断的任务并启动任务调度器"""
+    job_manager.start()
+
+@app.on_event("startup")
+def start_model_preload():
+    """在后台预加载并预热模型，完成前 /api/ready 返回503"""
+    default_model = load_config().get("whisper_default_model", "base")
+    model_preloader.start(parse_preload_list(WHISPER_PRELOAD_MODELS, default_model))
+
+@app.on_event("startup")
+def start_blob_janitor():
+    """启动文件仓库的后台清理线程"""
+    blob_store.start_janitor(BLOB_JANITOR_INTERVAL_SECONDS)
+
+@app.on_event("shutdown")
+def stop_job_manager():
+    """停止任务工作线程，未执行的任务在下次启动时恢复"""
+    job_manager.stop()
+
+@app.on_event("shutdown")
+def shutdown_inference_pool():
+    """关闭推理线程池"""
+    inference_pool.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_separation_pool():
+    """关闭分离进程池"""
+    separation_pool.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_transcription_pool():
+    """关闭长音频转录进程池"""
+    transcription_pool.shutdown()
+
+@app.on_event("shutdown")
+async def close_openai_clients():
+    """关闭OpenAI客户端的连接池"""
+    await openai_clients.close()
+
+@app.on_event("shutdown")
+def stop_blob_janitor():
+    blob_store.stop_janitor()
+
+# 包含路由
+app.include_router(health_router)
+app.include_router(models_router)
+app.include_router(audio_router)
+app.include_router(config_router)
+app.include_router(jobs_router)
+app.include_router(cache_router)
+app.include_router(uploads_router)
+
+@app.get("/")
+async def root():
+    """根路径，返回API信息"""
+    return {
+        "message": "AudioLab API",
+        "version": APP_VERSION,
+        "endpoints": {
+            "health": "/api/health",
+            "ready": "/api/ready",
+            "upload": "/api/upload",
+            "process": "/api/process",
+            "transcribe": "/api/transcribe",
+            "models": "/api/models",
+            "model_status": "/api/model/status?model_name=...",
+            "download_model": "/api/model/download?model_name=...",
+            "delete_model": "/api/model/delete?model_name=...",
+            "resident_models": "/api/model/resident",
+            "transcribe_job": "/api/jobs/transcribe",
+            "job_status": "/api/jobs/{job_id}",
+            "cache_stats": "/api/cache/stats",
+            "chunked_upload": "/api/uploads",
+            "file_download": "/api/files/{blob_id}",
+            "storage_stats": "/api/storage/stats"
+        }
+    }
\ No newline at end of file
@@ -0,0 +1,282 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from fastapi import HTTPException, UploadFile
+from loguru import logger
+from ..utils.upload_utils import save_upload
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """按内容寻址的文件存储。
+
+    文件以SHA-256命名保存 (<dir>/<sha[:2]>/<sha><ext>)，相同内容只保存一份；
+    每次存入都会生成一个引用 (blob_id)，记录原始文件名。
+    存入新文件时立即按LRU驱逐超出磁盘配额的部分，后台清理线程再按最后访问时间清理过期文件。
+    """
+
+    def __init__(self, directory: Path, db_path: Path, quota_mb: int, retention_hours: int):
+        self.directory = Path(directory)
+        self.quota_bytes = max(0, quota_mb) * 1024 * 1024
+        self.retention_seconds = max(0, retention_hours) * 3600
+        self.lock = threading.Lock()
+        self.in_use: Dict[str, int] = {}
+        self.janitor_thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / "tmp").mkdir(exist_ok=True)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blob_refs (
+                    id TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    original_name TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_blob_refs_sha256 ON blob_refs (sha256)")
+
+    def _blob_path(self, sha256: str, suffix: str) -> Path:
+        return self.directory / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+    def _temp_path(self, suffix: str = "") -> Path:
+        return self.directory / "tmp" / f"{uuid.uuid4().hex}{suffix}"
+
+    def _evict_over_quota(self, keep: str) -> int:
+        """按LRU驱逐文件直到不超出配额，跳过使用中的文件和 keep。调用方需持有 self.lock"""
+        if not self.quota_bytes:
+            return 0
+        rows = self.conn.execute("SELECT sha256, path, size FROM blobs ORDER BY last_access").fetchall()
+        total = sum(row["size"] for row in rows)
+        evicted = 0
+        for row in rows:
+            if total <= self.quota_bytes:
+                break
+            if row["sha256"] in self.in_use or row["sha256"] == keep:
+                continue
+            self._delete_blob(row["sha256"], row["path"])
+            total -= row["size"]
+            evicted += 1
+        return evicted
+
+    def _ingest(
+        self, tmp_path: Path, sha256: str, size: int, original_name: str, kind: str, acquire: bool = False
+    ) -> Dict:
+        """将已计算哈希的临时文件存入仓库 (已存在相同内容时丢弃临时文件)，并创建引用。
+
+        acquire 为 True 时在同一次加锁中标记为使用中 (用完需调用 release)，存入后不会被清理
+        """
+        now = time.time()
+        suffix = Path(original_name).suffix
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            deduplicated = row is not None and os.path.exists(row["path"])
+            if deduplicated:
+                blob_path = row["path"]
+                os.unlink(tmp_path)
+                self.conn.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (now, sha256))
+            else:
+                blob_path = self._blob_path(sha256, suffix)
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, blob_path)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO blobs (sha256, path, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (sha256, str(blob_path), size, now, now),
+                )
+                evicted = self._evict_over_quota(keep=sha256)
+                if evicted:
+                    logger.info(f"存入文件超出配额，驱逐 {evicted} 个文件")
+            if acquire:
+                self.in_use[sha256] = self.in_use.get(sha256, 0) + 1
+            blob_id = uuid.uuid4().hex
+            self.conn.execute(
+                "INSERT INTO blob_refs (id, sha256, original_name, kind, created_at) VALUES (?, ?, ?, ?, ?)",
+                (blob_id, sha256, Path(original_name).name, kind, now),
+            )
+        if deduplicated:
+            logger.info(f"文件内容已存在，复用: {original_name} -> {sha256[:12]}")
+        return {
+            "blob_id": blob_id,
+            "sha256": sha256,
+            "size": size,
+            "filename": Path(original_name).name,
+            "kind": kind,
+            "file_path": str(blob_path),
+            "deduplicated": deduplicated,
+        }
+
+    async def put_upload(self, file: UploadFile, kind: str = "upload", acquire: bool = False) -> Dict:
+        """流式保存上传文件，边写边计算哈希"""
+        tmp_path = self._temp_path(Path(file.filename or "").suffix)
+        size, sha256 = await save_upload(file, tmp_path)
+        return self._ingest(tmp_path, sha256, size, file.filename or sha256, kind, acquire)
+
+    def put_file(
+        self, path: Path, original_name: str, kind: str = "artifact", sha256: Optional[str] = None,
+        acquire: bool = False,
+    ) -> Dict:
+        """将已有文件移动到仓库 (如分块上传完成的文件、生成的ZIP)。已计算过哈希时通过 sha256 传入。
+
+        acquire 为 True 时返回的文件已标记为使用中，用完需调用 release
+        """
+        sha256 = sha256 or file_sha256(path)
+        tmp_path = self._temp_path(Path(original_name).suffix)
+        shutil.move(str(path), tmp_path)
+        return self._ingest(tmp_path, sha256, os.path.getsize(tmp_path), original_name, kind, acquire)
+
+    def get(self, blob_id: str) -> Dict:
+        """获取引用对应的文件信息，并更新访问时间"""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                """
+                SELECT r.id, r.sha256, r.original_name, r.kind, b.path, b.size
+                FROM blob_refs r JOIN blobs b ON r.sha256 = b.sha256
+                WHERE r.id = ?
+                """,
+                (blob_id,),
+            ).fetchone()
+            if row is None or not os.path.exists(row["path"]):
+                raise HTTPException(status_code=404, detail=f"文件不存在或已过期: {blob_id}")
+            self.conn.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), row["sha256"]))
+        return {
+            "blob_id": row["id"],
+            "sha256": row["sha256"],
+            "filename": row["original_name"],
+            "kind": row["kind"],
+            "file_path": row["path"],
+            "size": row["size"],
+        }
+
+    def acquire(self, blob_id: str) -> Dict:
+        """获取文件并标记为使用中，使用中的文件不会被清理线程删除。用完需调用 release"""
+        blob = self.get(blob_id)
+        with self.lock:
+            self.in_use[blob["sha256"]] = self.in_use.get(blob["sha256"], 0) + 1
+        return blob
+
+    def release(self, blob: Dict):
+        with self.lock:
+            sha256 = blob["sha256"]
+            self.in_use[sha256] = self.in_use.get(sha256, 1) - 1
+            if self.in_use[sha256] <= 0:
+                self.in_use.pop(sha256, None)
+
+    @contextmanager
+    def use(self, blob_id: str) -> Iterator[Dict]:
+        """在使用期间保护文件不被清理线程删除"""
+        blob = self.acquire(blob_id)
+        try:
+            yield blob
+        finally:
+            self.release(blob)
+
+    def _delete_blob(self, sha256: str, path: str):
+        """删除文件及其所有引用。调用方需持有 self.lock"""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self.conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        self.conn.execute("DELETE FROM blob_refs WHERE sha256 = ?", (sha256,))
+
+    def collect_garbage(self) -> Dict:
+        """清理过期文件，并在超出配额时按LRU驱逐"""
+        now = time.time()
+        expired = evicted = 0
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT sha256, path, size, last_access FROM blobs ORDER BY last_access"
+            ).fetchall()
+            total = sum(row["size"] for row in rows)
+            for row in rows:
+                if row["sha256"] in self.in_use:
+                    continue
+                too_old = self.retention_seconds and now - row["last_access"] > self.retention_seconds
+                over_quota = self.quota_bytes and total > self.quota_bytes
+                if not (too_old or over_quota):
+                    continue
+                self._delete_blob(row["sha256"], row["path"])
+                total -= row["size"]
+                if too_old:
+                    expired += 1
+                else:
+                    evicted += 1
+
+        # 清理中断的上传留下的临时文件
+        for tmp_path in (self.directory / "tmp").glob("*"):
+            try:
+                if now - tmp_path.stat().st_mtime > 24 * 3600:
+                    tmp_path.unlink()
+            except OSError:
+                pass
+
+        if expired or evicted:
+            logger.info(f"文件清理完成: 过期 {expired} 个, 超出配额驱逐 {evicted} 个, 剩余 {total / 1024 / 1024:.1f} MB")
+        return {"expired": expired, "evicted": evicted, "total_mb": round(total / 1024 / 1024, 2)}
+
+    def start_janitor(self, interval_seconds: int):
+        """启动后台清理线程"""
+        if self.janitor_thread is not None:
+            return
+
+        def janitor():
+            while not self.stop_event.wait(interval_seconds):
+                try:
+                    self.collect_garbage()
+                except Exception as e:
+                    logger.error(f"文件清理失败: {str(e)}")
+
+        self.janitor_thread = threading.Thread(target=janitor, name="blob-janitor", daemon=True)
+        self.janitor_thread.start()
+        logger.info(f"文件清理线程已启动，间隔: {interval_seconds} 秒")
+
+    def stop_janitor(self):
+        self.stop_event.set()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            blobs = self.conn.execute("SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS size FROM blobs").fetchone()
+            refs = self.conn.execute("SELECT COUNT(*) AS count FROM blob_refs").fetchone()
+        return {
+            "blobs": blobs["count"],
+            "refs": refs["count"],
+            "size_mb": round(blobs["size"] / 1024 / 1024, 2),
+            "quota_mb": round(self.quota_bytes / 1024 / 1024, 2),
+            "retention_hours": round(self.retention_seconds / 3600, 2),
+        }
@@ -0,0 +1,248 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+import gc
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+from fastapi import HTTPException
+from loguru import logger
+from ..config import DEMUCS_MEMORY_BUDGET_MB
+
+# 所有Demucs预训练模型的输入采样率
+DEMUCS_SAMPLE_RATE = 44100
+
+# 常用的Demucs预训练模型
+DEMUCS_MODELS = {
+    "htdemucs": {
+        "name": "Hybrid Transformer Demucs",
+        "description": "默认模型，速度和质量平衡 (~80 MB)",
+        "size_mb": 80,
+        "stems": ["drums", "bass", "other", "vocals"]
+    },
+    "htdemucs_ft": {
+        "name": "Hybrid Transformer Demucs (Fine-tuned)",
+        "description": "微调版本，质量更好但速度约为默认模型的1/4 (~320 MB)",
+        "size_mb": 320,
+        "stems": ["drums", "bass", "other", "vocals"]
+    },
+    "htdemucs_6s": {
+        "name": "Hybrid Transformer Demucs 6 Stems",
+        "description": "额外分离吉他和钢琴 (~105 MB)",
+        "size_mb": 105,
+        "stems": ["drums", "bass", "other", "vocals", "guitar", "piano"]
+    },
+    "mdx_extra": {
+        "name": "MDX Extra",
+        "description": "MDX挑战赛模型 (~660 MB)",
+        "size_mb": 660,
+        "stems": ["drums", "bass", "other", "vocals"]
+    },
+    "mdx_extra_q": {
+        "name": "MDX Extra (Quantized)",
+        "description": "MDX量化版本，体积更小 (~170 MB)",
+        "size_mb": 170,
+        "stems": ["drums", "bass", "other", "vocals"]
+    },
+}
+
+
+class DemucsModelManager:
+    """缓存已加载的Demucs模型，避免每次分离请求都重新构建模型和加载权重。
+
+    与 WhisperModelManager 相同: 同一模型的并发请求共享一次加载，
+    超出内存预算时按LRU驱逐空闲模型，使用中的模型不会被驱逐。
+    """
+
+    def __init__(self, memory_budget_mb: int = DEMUCS_MEMORY_BUDGET_MB):
+        # 按最近使用顺序排列，最久未使用的在最前面
+        self.models: "OrderedDict[str, Any]" = OrderedDict()
+        self.model_memory: Dict[str, float] = {}
+        self.last_used: Dict[str, float] = {}
+        self.active_users: Dict[str, int] = {}
+        self.loading: Dict[str, Future] = {}
+        self.errors: Dict[str, str] = {}
+        self.memory_budget_mb = memory_budget_mb
+        self.device = None
+        self.lock = threading.Lock()
+
+    def get_available_models(self) -> Dict:
+        """获取常用Demucs模型信息"""
+        return DEMUCS_MODELS
+
+    def get_device(self) -> str:
+        """检测推理设备 (只检测一次)"""
+        if self.device is None:
+            import torch
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            logger.info(f"Demucs使用设备: {self.device}")
+        return self.device
+
+    def get_model_status(self, model_name: str) -> Dict:
+        """获取模型状态"""
+        with self.lock:
+            if model_name in self.models:
+                return {"status": "loaded", "model_name": model_name, "message": "模型已加载"}
+            if model_name in self.loading:
+                return {"status": "loading", "model_name": model_name, "message": "模型加载中"}
+            if model_name in self.errors:
+                return {"status": "error", "model_name": model_name, "message": self.errors[model_name]}
+            return {"status": "not_loaded", "model_name": model_name, "message": "模型未加载"}
+
+    def _used_memory_mb(self) -> float:
+        return sum(self.model_memory.get(name, 0.0) for name in self.models)
+
+    def get_used_memory_mb(self) -> float:
+        with self.lock:
+            return self._used_memory_mb()
+
+    def estimate_model_memory(self, model_name: str) -> float:
+        """根据模型信息估算模型占用的内存 (MB)"""
+        return float(DEMUCS_MODELS.get(model_name, {}).get("size_mb", 0))
+
+    def _evict_for(self, required_mb: float) -> List[str]:
+        """按LRU顺序驱逐空闲模型。调用方需持有 self.lock"""
+        evicted = []
+        if self.memory_budget_mb <= 0:
+            return evicted
+
+        while self._used_memory_mb() + required_mb > self.memory_budget_mb:
+            candidate = next(
+                (name for name in self.models if self.active_users.get(name, 0) == 0), None
+            )
+            if candidate is None:
+                logger.warning(
+                    f"Demucs内存预算不足，但没有可驱逐的空闲模型: 需要 {required_mb:.0f} MB, "
+                    f"已用 {self._used_memory_mb():.0f}/{self.memory_budget_mb} MB"
+                )
+                break
+            self.models.pop(candidate)
+            freed = self.model_memory.pop(candidate, 0.0)
+            self.last_used.pop(candidate, None)
+            evicted.append(candidate)
+            logger.info(f"驱逐空闲Demucs模型: {candidate}, 释放约 {freed:.0f} MB")
+        return evicted
+
+    def _load_model(self, model_name: str):
+        """构建模型并加载权重，在锁外执行"""
+        from demucs.pretrained import get_model
+
+        device = self.get_device()
+        estimated_mb = self.estimate_model_memory(model_name)
+        with self.lock:
+            evicted = self._evict_for(estimated_mb)
+        if evicted:
+            gc.collect()
+            if device == "cuda":
+                import torch
+                torch.cuda.empty_cache()
+
+        start = time.monotonic()
+        model = get_model(model_name)
+        model.to(device)
+        model.eval()
+
+        # 按参数和缓冲区实际大小计算内存占用 (GPU上RSS无法反映显存)
+        memory_mb = sum(
+            t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers())
+        ) / 1024 / 1024
+        logger.info(
+            f"Demucs模型 {model_name} 加载完成, 设备: {device}, "
+            f"占用内存: {memory_mb:.0f} MB, 耗时: {time.monotonic() - start:.1f} 秒"
+        )
+
+        with self.lock:
+            self.models[model_name] = model
+            self.models.move_to_end(model_name)
+            self.model_memory[model_name] = memory_mb
+            self.last_used[model_name] = time.time()
+            self.errors.pop(model_name, None)
+        return model
+
+    def get_model(self, model_name: str):
+        """获取模型，未加载时加载 (首次加载时会从网络下载权重)"""
+        with self.lock:
+            if model_name in self.models:
+                self.models.move_to_end(model_name)
+                self.last_used[model_name] = time.time()
+                return self.models[model_name]
+
+            # 如果模型正在被其他请求加载，等待同一次加载的结果
+            future = self.loading.get(model_name)
+            is_loader = future is None
+            if is_loader:
+                future = Future()
+                self.loading[model_name] = future
+
+        if not is_loader:
+            logger.debug(f"等待Demucs模型加载完成: {model_name}")
+            return future.result()
+
+        logger.info(f"加载Demucs模型: {model_name}")
+        try:
+            model = self._load_model(model_name)
+            future.set_result(model)
+            return model
+        except Exception as e:
+            logger.error(f"加载Demucs模型失败: {model_name}, 错误: {str(e)}")
+            with self.lock:
+                self.errors[model_name] = f"加载失败: {str(e)}"
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(model_name, None)
+
+    @contextmanager
+    def use_model(self, model_name: str) -> Iterator[Any]:
+        """获取模型并在使用期间标记为活跃，活跃模型不会被驱逐。加载失败时抛出 HTTPException"""
+        with self.lock:
+            self.active_users[model_name] = self.active_users.get(model_name, 0) + 1
+        try:
+            try:
+                model = self.get_model(model_name)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"加载模型失败: {str(e)}。请确保模型已下载。"
+                )
+            yield model
+        finally:
+            with self.lock:
+                self.active_users[model_name] -= 1
+                if self.active_users[model_name] <= 0:
+                    self.active_users.pop(model_name, None)
+                if model_name in self.last_used:
+                    self.last_used[model_name] = time.time()
+
+    def unload_model(self, model_name: str) -> bool:
+        """从内存中卸载空闲模型"""
+        with self.lock:
+            if model_name not in self.models or self.active_users.get(model_name, 0) > 0:
+                return False
+            self.models.pop(model_name)
+            self.model_memory.pop(model_name, None)
+            self.last_used.pop(model_name, None)
+        gc.collect()
+        logger.info(f"卸载Demucs模型: {model_name}")
+        return True
+
+    def get_resident_models(self) -> Dict:
+        """获取内存中驻留的Demucs模型"""
+        now = time.time()
+        with self.lock:
+            return {
+                "models": [
+                    {
+                        "model_name": name,
+                        "memory_mb": round(self.model_memory.get(name, 0.0), 1),
+                        "in_use": self.active_users.get(name, 0),
+                        "idle_seconds": round(now - self.last_used.get(name, now), 1),
+                    }
+                    for name in self.models
+                ],
+                "used_memory_mb": round(self._used_memory_mb(), 1),
+                "memory_budget_mb": self.memory_budget_mb,
+                "loading": sorted(self.loading),
+                "device": self.device,
+            }
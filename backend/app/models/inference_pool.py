@@ -0,0 +1,180 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from loguru import logger
+
+
+class InferenceBusyError(Exception):
+    """推理队列已满，请求被拒绝"""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: int = 5):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """在独立线程池中执行推理，避免阻塞asyncio事件循环。
+
+    - 线程池大小可配置
+    - 每个模型有并发上限，超出的请求在事件循环中排队等待
+    - 准入队列有上限: 整体饱和返回503，单个模型排队超过 max_model_queue 返回429
+    - 准入名额和模型并发槽在线程中的推理结束时才释放，请求被取消时不会提前释放
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, per_model_concurrency: int, max_model_queue: int):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.per_model_concurrency = max(1, per_model_concurrency)
+        # 单个模型最多排队的请求数，小于整体队列，避免一个模型占满整个队列
+        self.max_model_queue = max(0, min(max_model_queue, self.max_queue))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self.lock = threading.Lock()
+        # 已准入的请求数 (排队中 + 执行中)
+        self.admitted = 0
+        self.admitted_per_model: Dict[str, int] = {}
+        self.running_per_model: Dict[str, int] = {}
+        self.model_slots: Dict[str, asyncio.Semaphore] = {}
+        # 推理耗时的指数滑动平均，用于估算重试等待时间
+        self.avg_duration = 10.0
+        self.completed = 0
+        self.rejected = 0
+        # 服务的事件循环，后台任务线程通过它提交推理
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _retry_after(self, backlog: int, concurrency: int) -> int:
+        """根据积压量和平均耗时估算重试等待秒数"""
+        return max(1, math.ceil(self.avg_duration * (backlog + 1) / concurrency))
+
+    def _admit(self, model_name: str):
+        with self.lock:
+            if self.admitted >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise InferenceBusyError(
+                    "服务器繁忙，推理队列已满，请稍后重试",
+                    status_code=503,
+                    retry_after=self._retry_after(self.admitted - self.max_workers, self.max_workers),
+                )
+            model_admitted = self.admitted_per_model.get(model_name, 0)
+            if model_admitted >= self.per_model_concurrency + self.max_model_queue:
+                self.rejected += 1
+                raise InferenceBusyError(
+                    f"模型 {model_name} 的请求过多，请稍后重试",
+                    status_code=429,
+                    retry_after=self._retry_after(
+                        model_admitted - self.per_model_concurrency, self.per_model_concurrency
+                    ),
+                )
+            self.admitted += 1
+            self.admitted_per_model[model_name] = model_admitted + 1
+
+    def _release(self, model_name: str):
+        with self.lock:
+            self.admitted -= 1
+            self.admitted_per_model[model_name] -= 1
+            if self.admitted_per_model[model_name] <= 0:
+                self.admitted_per_model.pop(model_name, None)
+
+    def _get_slot(self, model_name: str) -> asyncio.Semaphore:
+        slot = self.model_slots.get(model_name)
+        if slot is None:
+            slot = asyncio.Semaphore(self.per_model_concurrency)
+            self.model_slots[model_name] = slot
+        return slot
+
+    def _run_timed(self, model_name: str, fn: Callable[..., Any], args, kwargs) -> Any:
+        with self.lock:
+            self.running_per_model[model_name] = self.running_per_model.get(model_name, 0) + 1
+        start = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            duration = time.monotonic() - start
+            with self.lock:
+                self.running_per_model[model_name] -= 1
+                if self.running_per_model[model_name] <= 0:
+                    self.running_per_model.pop(model_name, None)
+                self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+                self.completed += 1
+
+    async def _run_admitted(
+        self, model_name: str, fn: Callable[..., Any], args, kwargs, execution: Dict[str, Future]
+    ) -> Any:
+        slot = self._get_slot(model_name)
+        await slot.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(self._run_timed, model_name, fn, args, kwargs)
+        except BaseException:
+            slot.release()
+            raise
+        execution["future"] = future
+
+        def release_slot(_future):
+            # 在线程中的推理结束后才释放并发槽 (等待的请求被取消时推理仍在运行)
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(slot.release)
+
+        future.add_done_callback(release_slot)
+        logger.debug(f"提交推理任务: {model_name}")
+        return await asyncio.wrap_future(future)
+
+    def submit(self, model_name: str, fn: Callable[..., Any], *args, **kwargs) -> "asyncio.Task":
+        """立即完成准入检查 (队列已满时抛出 InferenceBusyError)，返回在后台执行的任务。
+
+        适用于需要在开始响应之前确定是否被接受的流式请求。
+        """
+        self._admit(model_name)
+        execution: Dict[str, Future] = {}
+        task = asyncio.ensure_future(self._run_admitted(model_name, fn, args, kwargs, execution))
+
+        def release_admission(_task):
+            # 任务在提交到线程池之前结束 (如被取消) 时立即释放，否则等线程中的推理结束
+            future = execution.get("future")
+            if future is None:
+                self._release(model_name)
+            else:
+                future.add_done_callback(lambda _future: self._release(model_name))
+
+        task.add_done_callback(release_admission)
+        return task
+
+    async def run(self, model_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """在推理线程池中执行 fn，队列已满时抛出 InferenceBusyError"""
+        return await self.submit(model_name, fn, *args, **kwargs)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def run_from_thread(self, model_name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """在事件循环以外的线程 (如后台任务) 中执行推理并等待结果。
+
+        与接口请求共享准入检查和每个模型的并发限制，队列已满时同样抛出 InferenceBusyError。
+        """
+        if self.loop is None:
+            raise RuntimeError("推理线程池尚未绑定事件循环")
+        return asyncio.run_coroutine_threadsafe(self.run(model_name, fn, *args, **kwargs), self.loop).result()
+
+    def get_stats(self) -> Dict:
+        """获取推理线程池状态"""
+        with self.lock:
+            running = sum(self.running_per_model.values())
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "per_model_concurrency": self.per_model_concurrency,
+                "max_model_queue": self.max_model_queue,
+                "running": running,
+                "queued": self.admitted - running,
+                "running_per_model": dict(self.running_per_model),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_duration_seconds": round(self.avg_duration, 2),
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
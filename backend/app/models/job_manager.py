@@ -0,0 +1,457 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from loguru import logger
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+# 清理过期任务的间隔 (秒)
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class JobContext:
+    """传给任务处理函数的上下文，用于上报进度和部分结果"""
+
+    def __init__(self, manager: "JobManager", job_id: str, params: Dict):
+        self.manager = manager
+        self.job_id = job_id
+        self.params = params
+
+    def report_progress(self, processed: float, total: Optional[float] = None):
+        """上报进度 (如已处理的音频秒数 / 总秒数)，任务被取消时抛出 JobCancelled"""
+        self.manager._update_progress(self.job_id, processed, total)
+        self.check_cancelled()
+
+    def get_inputs(self):
+        """提交任务时单独保存的输入数据 (如待翻译的字幕段)"""
+        return self.manager.get_inputs(self.job_id)
+
+    def add_items(self, items: List[Dict]):
+        """追加部分结果 (如已解码的字幕段)"""
+        self.manager._append_items(self.job_id, items)
+
+    def check_cancelled(self):
+        if self.manager._is_cancelled(self.job_id):
+            raise JobCancelled(self.job_id)
+
+
+class JobManager:
+    """基于SQLite持久化的后台任务队列。
+
+    任务处理函数按类型注册，由固定数量的工作线程执行。注册时指定 workers 的任务类型使用独立的队列和工作线程，
+    不会排在其他类型的长任务之后。服务重启时，
+    中断的任务会重新排队 (超过重试次数则标记为失败)，不会丢失。
+    结束超过 retention_hours 的任务连同其输入和部分结果定期删除 (0 表示永久保留)。
+    """
+
+    def __init__(self, db_path: Path, workers: int = 1, max_attempts: int = 2, retention_hours: float = 0):
+        self.db_path = Path(db_path)
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retention_seconds = max(0.0, retention_hours) * 3600
+        self.handlers: Dict[str, Callable[[JobContext], Dict]] = {}
+        self.finalizers: Dict[str, Callable[[Dict], None]] = {}
+        self.preparers: Dict[str, Callable[[Dict], None]] = {}
+        self.queue: "queue.Queue[str]" = queue.Queue()
+        # 使用独立工作线程的任务类型: 类型 -> (队列, 线程数)
+        self.dedicated: Dict[str, tuple] = {}
+        self.cancelled: set = set()
+        self.threads: List[threading.Thread] = []
+        # 工作线程的队列: (线程名前缀, 队列, 线程数)
+        self.lanes: List[tuple] = []
+        self.lock = threading.Lock()
+        self.started = False
+        self.stop_event = threading.Event()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    processed REAL NOT NULL DEFAULT 0,
+                    total REAL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_inputs (
+                    job_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (job_id, idx)
+                )
+                """
+            )
+
+    def register_handler(
+        self,
+        kind: str,
+        handler: Callable[[JobContext], Dict],
+        finalizer: Optional[Callable[[Dict], None]] = None,
+        preparer: Optional[Callable[[Dict], None]] = None,
+        workers: Optional[int] = None,
+    ):
+        """注册任务处理函数。
+
+        preparer 在提交任务时 (以及服务重启恢复任务时) 调用，用于在排队期间占用资源，
+        finalizer 在任务结束 (成功/失败/取消) 后调用，用于清理资源。
+        指定 workers 时该类型的任务由独立的工作线程执行
+        """
+        self.handlers[kind] = handler
+        if finalizer is not None:
+            self.finalizers[kind] = finalizer
+        if preparer is not None:
+            self.preparers[kind] = preparer
+        if workers is not None:
+            self.dedicated[kind] = (queue.Queue(), max(1, workers))
+
+    def _queue_for(self, kind: str) -> "queue.Queue[str]":
+        dedicated = self.dedicated.get(kind)
+        return dedicated[0] if dedicated else self.queue
+
+    def start(self):
+        """恢复中断的任务并启动工作线程"""
+        if self.started:
+            return
+        self.started = True
+        self._recover()
+        lanes = [("job-worker", self.queue, self.workers)] + [
+            (f"job-worker-{kind}", job_queue, workers) for kind, (job_queue, workers) in self.dedicated.items()
+        ]
+        self.lanes = lanes
+        for name, job_queue, workers in lanes:
+            for i in range(workers):
+                thread = threading.Thread(target=self._worker, args=(job_queue,), name=f"{name}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        if self.retention_seconds > 0:
+            threading.Thread(target=self._pruner, name="job-pruner", daemon=True).start()
+        logger.info(f"任务调度器已启动，工作线程数: {len(self.threads)}")
+
+    def stop(self):
+        """停止工作线程: 正在执行的任务继续到结束，队列中剩余的任务留待下次启动时恢复"""
+        if not self.started:
+            return
+        self.stop_event.set()
+        for _, job_queue, workers in self.lanes:
+            for _ in range(workers):
+                job_queue.put(None)
+        logger.info("任务调度器已停止")
+
+    def prune(self) -> int:
+        """删除结束超过保留时间的任务及其输入和部分结果，返回删除的任务数"""
+        if self.retention_seconds <= 0:
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        placeholders = ", ".join("?" for _ in FINISHED_STATES)
+        expired = f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?"
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM job_items WHERE job_id IN ({expired})", (*FINISHED_STATES, cutoff))
+            self.conn.execute(f"DELETE FROM job_inputs WHERE job_id IN ({expired})", (*FINISHED_STATES, cutoff))
+            cursor = self.conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?", (*FINISHED_STATES, cutoff)
+            )
+        if cursor.rowcount:
+            logger.info(f"已删除 {cursor.rowcount} 个过期任务")
+        return cursor.rowcount
+
+    def _pruner(self):
+        while True:
+            try:
+                self.prune()
+            except Exception as e:
+                logger.error(f"清理过期任务失败: {str(e)}")
+            if self.stop_event.wait(PRUNE_INTERVAL_SECONDS):
+                return
+
+    def _recover(self):
+        """服务重启后: 中断的任务重新排队或标记失败，排队中的任务重新入队"""
+        now = time.time()
+        failed = []
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status = ?", (JOB_RUNNING,)
+            ).fetchall()
+            for row in rows:
+                self.conn.execute("DELETE FROM job_items WHERE job_id = ?", (row["id"],))
+                if row["attempts"] < self.max_attempts:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, processed = 0, updated_at = ? WHERE id = ?",
+                        (JOB_QUEUED, now, row["id"]),
+                    )
+                    logger.info(f"恢复中断的任务: {row['id']}")
+                else:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                        (JOB_FAILED, "服务重启导致任务中断，已超过最大重试次数", now, row["id"]),
+                    )
+                    failed.append(self._row_to_job(row))
+                    logger.warning(f"任务中断且超过最大重试次数: {row['id']}")
+            queued = self.conn.execute(
+                "SELECT id, kind FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+            ).fetchall()
+        # 重启后重新占用排队任务的资源，失败的任务先占用再随清理释放，保持计数平衡
+        for row in queued:
+            self._prepare(self.get_job(row["id"]))
+        for job in failed:
+            self._prepare(job)
+            self._cleanup(job)
+        for row in queued:
+            self._queue_for(row["kind"]).put(row["id"])
+        if rows or queued:
+            logger.info(f"任务恢复完成: 中断 {len(rows)} 个, 排队 {len(queued)} 个")
+
+    def submit(self, kind: str, params: Dict, inputs=None) -> Dict:
+        """提交任务，立即返回任务信息。
+
+        较大的输入数据 (如整个字幕文件) 通过 inputs 单独保存，不放入 params，
+        查询任务状态和任务列表时不会读取和返回它，处理函数通过 JobContext.get_inputs 获取
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"未知的任务类型: {kind}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        preparer = self.preparers.get(kind)
+        if preparer is not None:
+            preparer(params)
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO jobs (id, kind, status, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, JOB_QUEUED, json.dumps(params, ensure_ascii=False), now, now),
+                )
+                if inputs is not None:
+                    self.conn.execute(
+                        "INSERT INTO job_inputs (job_id, data) VALUES (?, ?)",
+                        (job_id, json.dumps(inputs, ensure_ascii=False)),
+                    )
+        except Exception:
+            self._cleanup({"job_id": job_id, "kind": kind, "params": params})
+            raise
+        self._queue_for(kind).put(job_id)
+        logger.info(f"提交任务: {job_id}, 类型: {kind}")
+        return self.get_job(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """取消任务。排队中的任务直接取消，运行中的任务在下次上报进度时停止"""
+        job = self.get_job(job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return job
+        with self.lock, self.conn:
+            # 只取消仍在排队的任务，避免与工作线程的 _claim 竞争
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (JOB_CANCELLED, "任务已取消", time.time(), job_id, JOB_QUEUED),
+            )
+            cancelled_queued = cursor.rowcount == 1
+            if not cancelled_queued:
+                row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is not None and row["status"] == JOB_RUNNING:
+                    self.cancelled.add(job_id)
+        if cancelled_queued:
+            self._cleanup(job)
+        logger.info(f"取消任务: {job_id}")
+        return self.get_job(job_id)
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict:
+        total = row["total"]
+        progress = min(1.0, row["processed"] / total) if total else 0.0
+        if row["status"] == JOB_SUCCEEDED:
+            progress = 1.0
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "processed": row["processed"],
+            "total": total,
+            "progress": round(progress, 4),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit: int = 50, kind: Optional[str] = None) -> List[Dict]:
+        with self.lock:
+            if kind:
+                rows = self.conn.execute(
+                    "SELECT * FROM jobs WHERE kind = ? ORDER BY created_at DESC LIMIT ?", (kind, limit)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def get_inputs(self, job_id: str):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM job_inputs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def get_items(self, job_id: str, since: int = 0) -> List[Dict]:
+        """获取任务的部分结果，since 为起始序号，便于客户端增量拉取"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT data FROM job_items WHERE job_id = ? AND idx >= ? ORDER BY idx",
+                (job_id, since),
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def _update_progress(self, job_id: str, processed: float, total: Optional[float]):
+        with self.lock, self.conn:
+            if total is None:
+                self.conn.execute(
+                    "UPDATE jobs SET processed = ?, updated_at = ? WHERE id = ?",
+                    (processed, time.time(), job_id),
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE jobs SET processed = ?, total = ?, updated_at = ? WHERE id = ?",
+                    (processed, total, time.time(), job_id),
+                )
+
+    def _append_items(self, job_id: str, items: List[Dict]):
+        if not items:
+            return
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT COALESCE(MAX(idx) + 1, 0) AS next_idx FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            start = row["next_idx"]
+            self.conn.executemany(
+                "INSERT INTO job_items (job_id, idx, data) VALUES (?, ?, ?)",
+                [(job_id, start + i, json.dumps(item, ensure_ascii=False)) for i, item in enumerate(items)],
+            )
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self.lock:
+            return job_id in self.cancelled
+
+    def _claim(self, job_id: str) -> Optional[Dict]:
+        """将排队中的任务标记为运行中"""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ? AND status = ?",
+                (JOB_RUNNING, time.time(), job_id, JOB_QUEUED),
+            )
+            if cursor.rowcount == 0:
+                return None
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self.cancelled.discard(job_id)
+
+    def _worker(self, job_queue: "queue.Queue[Optional[str]]"):
+        while True:
+            job_id = job_queue.get()
+            if job_id is None:
+                # stop() 放入的结束标记
+                job_queue.task_done()
+                return
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"任务调度异常: {job_id}, 错误: {str(e)}")
+            finally:
+                job_queue.task_done()
+
+    def _run_job(self, job_id: str):
+        job = self._claim(job_id)
+        if job is None:
+            return
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self._finish(job_id, JOB_FAILED, error=f"未知的任务类型: {job['kind']}")
+            return
+
+        logger.info(f"开始执行任务: {job_id}, 类型: {job['kind']}, 第 {job['attempts']} 次尝试")
+        context = JobContext(self, job_id, job["params"])
+        try:
+            result = handler(context)
+            self._finish(job_id, JOB_SUCCEEDED, result=result)
+            logger.info(f"任务完成: {job_id}")
+        except JobCancelled:
+            self._finish(job_id, JOB_CANCELLED, error="任务已取消")
+            logger.info(f"任务已取消: {job_id}")
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            self._finish(job_id, JOB_FAILED, error=detail)
+            logger.error(f"任务失败: {job_id}, 错误: {detail}")
+        finally:
+            self._cleanup(job)
+
+    def _prepare(self, job: Dict):
+        preparer = self.preparers.get(job["kind"])
+        if preparer is None:
+            return
+        try:
+            preparer(job["params"])
+        except Exception as e:
+            logger.warning(f"任务资源准备失败: {job['job_id']}, 错误: {str(e)}")
+
+    def _cleanup(self, job: Dict):
+        finalizer = self.finalizers.get(job["kind"])
+        if finalizer is None:
+            return
+        try:
+            finalizer(job["params"])
+        except Exception as e:
+            logger.warning(f"任务清理失败: {job['job_id']}, 错误: {str(e)}")
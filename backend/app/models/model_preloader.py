@@ -0,0 +1,94 @@
+"""Background preload and warm-up of Whisper models at startup, with readiness reporting"""
+import threading
+import time
+from typing import Dict, List, Optional
+from loguru import logger
+from .whisper_tuner import benchmark_audio
+
+# 预热解码使用的合成音频时长 (秒) 和最多生成的token数
+WARMUP_SECONDS = 2
+WARMUP_MAX_TOKENS = 8
+
+
+def parse_preload_list(value: Optional[str], default_model: str) -> List[str]:
+    """解析预加载列表 (逗号分隔)。未设置时为默认模型，none 表示不预加载"""
+    if value is None:
+        return [default_model] if default_model else []
+    if value.strip().lower() == "none":
+        return []
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class ModelPreloader:
+    """启动后在后台线程中依次加载并预热模型，首个请求不再承担模型加载和CTranslate2内核初始化的耗时。
+
+    每个模型的状态: pending → tuning → loading → warming → ready，或 failed / skipped (未下载)。
+    tuning 阶段为计算类型自动选择测速 (已有结果时跳过)，之后按选择的类型加载。
+    预加载的模型被固定，不会被LRU驱逐。全部模型为 ready 或 skipped 时才算就绪。
+    """
+
+    def __init__(self, model_manager):
+        self.model_manager = model_manager
+        self.status: Dict[str, Dict] = {}
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def start(self, model_names: List[str]):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.status = {name: {"status": "pending"} for name in dict.fromkeys(model_names)}
+            self.thread = threading.Thread(target=self._run, name="model-preloader", daemon=True)
+        if model_names:
+            logger.info(f"开始预加载模型: {', '.join(self.status)}")
+        self.thread.start()
+
+    def _set_status(self, model_name: str, status: str, **info):
+        with self.lock:
+            self.status[model_name].update(status=status, **info)
+
+    def _run(self):
+        for model_name in list(self.status):
+            try:
+                self._preload(model_name)
+            except Exception as e:
+                logger.error(f"预加载模型失败: {model_name}, 错误: {str(e)}")
+                self._set_status(model_name, "failed", error=str(e))
+
+    def _preload(self, model_name: str):
+        if not self.model_manager.is_model_downloaded(model_name):
+            logger.warning(f"模型未下载，跳过预加载: {model_name}")
+            self._set_status(model_name, "skipped", error="模型未下载")
+            return
+
+        self.model_manager.pin_model(model_name)
+        self._set_status(model_name, "tuning")
+        self.model_manager.tune_model(model_name)
+        self._set_status(model_name, "loading")
+        start = time.monotonic()
+        with self.model_manager.use_model(model_name) as model:
+            if model is None:
+                raise RuntimeError("模型加载失败")
+            load_seconds = time.monotonic() - start
+
+            # 短的合成音频完整走一遍语言检测和解码，完成内核和内存分配的初始化
+            self._set_status(model_name, "warming", load_seconds=round(load_seconds, 2))
+            start = time.monotonic()
+            segments, _ = model.transcribe(
+                benchmark_audio()[:WARMUP_SECONDS * 16000], temperature=0.0,
+                condition_on_previous_text=False, max_new_tokens=WARMUP_MAX_TOKENS,
+            )
+            list(segments)
+            warmup_seconds = time.monotonic() - start
+
+        self._set_status(model_name, "ready", warmup_seconds=round(warmup_seconds, 2))
+        logger.info(f"模型已预热: {model_name}, 加载 {load_seconds:.2f} 秒, 预热 {warmup_seconds:.2f} 秒")
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            models = {name: dict(info) for name, info in self.status.items()}
+            started = self.thread is not None
+        return {
+            "ready": started and all(info["status"] in ("ready", "skipped") for info in models.values()),
+            "models": models,
+        }
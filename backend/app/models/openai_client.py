@@ -0,0 +1,90 @@
+import importlib.util
+import threading
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+
+# 安装了 h2 时启用HTTP/2，多个并发请求复用同一个连接
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class OpenAIClientPool:
+    """长期复用的异步OpenAI客户端。
+
+    客户端底层的HTTP连接池保持长连接 (keep-alive) 和TLS会话，只有API密钥或base_url
+    变化时才重建。被替换的旧客户端可能仍有请求在使用，保留到服务关闭时再关闭。
+    """
+
+    def __init__(self, max_connections: int, keepalive_seconds: float, timeout_seconds: float):
+        self.max_connections = max(1, max_connections)
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout_seconds = timeout_seconds
+        self.lock = threading.Lock()
+        self.client = None
+        self.client_key: Optional[Tuple[str, Optional[str]]] = None
+        self.retired: List = []
+        self.builds = 0
+        self.reuses = 0
+
+    def _build_client(self, api_key: str, base_url: Optional[str]):
+        import httpx
+        from openai import AsyncOpenAI
+
+        http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=self.keepalive_seconds,
+            ),
+            timeout=httpx.Timeout(self.timeout_seconds, connect=10.0),
+        )
+        # 重试由调用方按限流信息控制
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+
+    def create_client(self, api_key: str, base_url: Optional[str] = None):
+        """创建独立的客户端，由调用方负责关闭。
+
+        共享客户端的连接池绑定在服务的事件循环上，在其他事件循环 (如后台任务线程) 中需使用独立客户端。
+        """
+        return self._build_client(api_key, base_url or None)
+
+    def get_client(self, api_key: str, base_url: Optional[str] = None):
+        """获取与当前配置对应的客户端，配置未变化时复用"""
+        key = (api_key, base_url or None)
+        with self.lock:
+            if self.client is not None and self.client_key == key:
+                self.reuses += 1
+                return self.client
+
+            client = self._build_client(api_key, base_url or None)
+            if self.client is not None:
+                self.retired.append(self.client)
+            self.client = client
+            self.client_key = key
+            self.builds += 1
+        logger.info(f"创建OpenAI客户端: base_url={base_url or '默认'}, HTTP/2: {HTTP2_AVAILABLE}")
+        return client
+
+    async def close(self):
+        """关闭所有客户端及其连接池"""
+        with self.lock:
+            clients = self.retired + ([self.client] if self.client is not None else [])
+            self.client = None
+            self.client_key = None
+            self.retired = []
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"关闭OpenAI客户端失败: {str(e)}")
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "active": self.client is not None,
+                "retired": len(self.retired),
+                "builds": self.builds,
+                "reuses": self.reuses,
+                "http2": HTTP2_AVAILABLE,
+                "max_connections": self.max_connections,
+            }
@@ -0,0 +1,351 @@
+"""Decode-once PCM cache: audio is decoded to raw samples on disk and shared as memory-mapped NumPy arrays"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+# Whisper 模型的输入: 16kHz 单声道 float32
+WHISPER_SAMPLE_RATE = 16000
+
+# 支持的采样格式及对应的 FFmpeg 交错采样格式
+PCM_DTYPES = {"float32": "flt", "int16": "s16"}
+
+_CHANNEL_LAYOUTS = {1: "mono", 2: "stereo"}
+
+
+def open_pcm(pcm: Dict) -> np.ndarray:
+    """以只读内存映射打开缓存的PCM，返回形状为 (帧数, 声道数) 的数组。
+
+    只依赖 pcm 中的路径和格式信息，可在工作进程中调用，多个进程共享同一份页缓存。
+    """
+    if pcm["frames"] == 0:
+        return np.zeros((0, pcm["channels"]), dtype=pcm["dtype"])
+    return np.memmap(pcm["path"], dtype=pcm["dtype"], mode="r", shape=(pcm["frames"], pcm["channels"]))
+
+
+def pcm_to_float32(samples: np.ndarray) -> np.ndarray:
+    """转换为取值范围 [-1, 1] 的float32数组，int16按 1/32768 缩放"""
+    if samples.dtype == np.int16:
+        result = samples.astype(np.float32)
+        result *= 1.0 / 32768
+        return result
+    return np.asarray(samples, dtype=np.float32)
+
+
+def _resample(resampler, frame):
+    result = resampler.resample(frame)
+    # 旧版PyAV返回单个帧，新版返回帧列表
+    return result if isinstance(result, list) else ([result] if result is not None else [])
+
+
+def probe_pcm_format(audio_path: str) -> Tuple[int, int]:
+    """读取音频流的原始采样率和声道数，不解码音频"""
+    import av
+
+    try:
+        with av.open(audio_path) as container:
+            if not container.streams.audio:
+                raise ValueError("文件中没有音频流")
+            stream = container.streams.audio[0]
+            return stream.sample_rate, len(stream.layout.channels)
+    except av.error.FFmpegError as e:
+        raise ValueError(f"无法解码音频文件: {str(e)}")
+
+
+def decode_to_pcm(audio_path: str, output_path: Path, sample_rate: int, channels: int, dtype: str) -> int:
+    """流式解码并重采样为交错的PCM，逐帧追加写入 output_path，返回帧数。
+
+    内存占用与音频长度无关。文件无法解码时抛出 ValueError。
+    """
+    import av
+
+    try:
+        with av.open(audio_path) as container:
+            if not container.streams.audio:
+                raise ValueError("文件中没有音频流")
+            stream = container.streams.audio[0]
+            if channels == len(stream.layout.channels):
+                layout = stream.layout.name
+            else:
+                layout = _CHANNEL_LAYOUTS[channels]
+            resampler = av.AudioResampler(format=PCM_DTYPES[dtype], layout=layout, rate=sample_rate)
+
+            frames = 0
+            with open(output_path, "wb") as f:
+                decoded = (out for frame in container.decode(stream) for out in _resample(resampler, frame))
+                # 最后传入 None 取出重采样器中剩余的采样
+                for out in itertools.chain(decoded, _resample(resampler, None)):
+                    # 交错格式的 to_ndarray 形状为 (1, 采样数 * 声道数)
+                    f.write(out.to_ndarray().reshape(-1)[:out.samples * channels].tobytes())
+                    frames += out.samples
+            return frames
+    except av.error.FFmpegError as e:
+        raise ValueError(f"无法解码音频文件: {str(e)}")
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 超过这个时间 (秒) 未修改的解码临时文件视为中断的解码留下的
+STALE_TMP_SECONDS = 3600
+
+
+class PcmCache:
+    """按 (文件哈希, 采样率, 声道数, 采样格式) 缓存解码后的PCM。
+
+    每个条目保存为 <dir>/<sha[:2]>/<key>.pcm (交错的原始采样) 和同名的 .json (格式和帧数)，
+    使用时以只读内存映射打开，转录、分离和分析共享同一次解码，多个请求和工作进程共享操作系统的页缓存。
+    同一条目的并发请求只解码一次；总大小超过上限时按最近访问时间驱逐未在使用的条目。
+    """
+
+    def __init__(self, directory: Path, max_size_mb: int):
+        self.directory = Path(directory)
+        self.max_size_bytes = max(0, max_size_mb) * 1024 * 1024
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        self.loading: Dict[str, Future] = {}
+        self.in_use: Dict[str, int] = {}
+        self.total_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.decode_seconds = 0.0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def make_key(audio_sha256: str, sample_rate: int, channels: int, dtype: str) -> str:
+        return f"{audio_sha256}_{sample_rate}_{channels}_{dtype}"
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        base = self.directory / key[:2] / key
+        return base.with_suffix(".pcm"), base.with_suffix(".json")
+
+    def _scan(self):
+        """启动时扫描已有的缓存条目，删除中断的解码留下的临时文件。
+
+        解码过程中临时文件持续写入，只删除长时间未修改的，不影响其他进程中正在进行的解码
+        """
+        now = time.time()
+        for tmp_path in self.directory.glob("*/*.tmp"):
+            try:
+                if now - tmp_path.stat().st_mtime > STALE_TMP_SECONDS:
+                    tmp_path.unlink()
+            except OSError:
+                pass
+        for meta_path in self.directory.glob("*/*.json"):
+            data_path = meta_path.with_suffix(".pcm")
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    pcm = json.load(f)
+                size = data_path.stat().st_size
+                atime = meta_path.stat().st_mtime
+            except (OSError, ValueError):
+                continue
+            pcm["path"] = str(data_path)
+            self.entries[meta_path.stem] = {"pcm": pcm, "size": size, "atime": atime}
+            self.total_size += size
+        if self.entries:
+            logger.info(f"PCM缓存: 已加载 {len(self.entries)} 个条目, {self.total_size / 1024 / 1024:.1f} MB")
+
+    def _decode(self, key: str, audio_path: str, sample_rate: int, channels: int, dtype: str) -> Dict:
+        """解码到临时文件后重命名，最后写入格式信息，.json存在即表示条目完整"""
+        data_path, meta_path = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        # 临时文件名包含进程号，多个进程同时解码同一条目时互不覆盖
+        tmp_path = data_path.with_suffix(f".{os.getpid()}.tmp")
+        start = time.monotonic()
+        try:
+            frames = decode_to_pcm(audio_path, tmp_path, sample_rate, channels, dtype)
+            os.replace(tmp_path, data_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        elapsed = time.monotonic() - start
+
+        pcm = {"sample_rate": sample_rate, "channels": channels, "frames": frames, "dtype": dtype}
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(pcm, f)
+        pcm["path"] = str(data_path)
+        size = data_path.stat().st_size
+        logger.info(
+            f"解码音频到PCM缓存: {Path(audio_path).name}, {sample_rate} Hz, {channels} 声道, {dtype}, "
+            f"时长 {frames / sample_rate:.1f} 秒, {size / 1024 / 1024:.1f} MB, 耗时 {elapsed:.1f} 秒"
+        )
+
+        with self.lock:
+            self.entries[key] = {"pcm": pcm, "size": size, "atime": time.time()}
+            self.total_size += size
+            self.decode_seconds += elapsed
+            # 加入索引的同时标记为使用中，避免在返回前被其他请求驱逐
+            self.in_use[key] = self.in_use.get(key, 0) + 1
+            self._evict()
+        return pcm
+
+    def acquire(
+        self,
+        audio_path: str,
+        audio_sha256: Optional[str] = None,
+        sample_rate: Optional[int] = None,
+        channels: Optional[int] = None,
+        dtype: str = "float32",
+        max_channels: Optional[int] = None,
+    ) -> Dict:
+        """获取音频的PCM (未缓存时解码) 并标记为使用中，使用中的条目不会被驱逐。用完需调用 release。
+
+        sample_rate/channels 为 None 时保持原始采样率/声道数；原始声道数超过 max_channels 时
+        由FFmpeg下混 (如5.1的中置和环绕声道混入左右声道)。阻塞调用，不要在事件循环中直接调用。
+        返回的字典包含 path / sample_rate / channels / frames / dtype，用 open_pcm 打开。
+        """
+        if dtype not in PCM_DTYPES:
+            raise ValueError(f"不支持的PCM采样格式: {dtype}")
+        if channels is not None and channels not in _CHANNEL_LAYOUTS:
+            raise ValueError(f"不支持的声道数: {channels}")
+        if sample_rate is None or channels is None:
+            source_rate, source_channels = probe_pcm_format(audio_path)
+            sample_rate = sample_rate or source_rate
+            channels = channels or source_channels
+            if max_channels is not None:
+                channels = min(channels, max_channels)
+        audio_sha256 = audio_sha256 or hash_file(audio_path)
+        key = self.make_key(audio_sha256, sample_rate, channels, dtype)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and not Path(entry["pcm"]["path"]).exists():
+                # 文件已被外部删除
+                self.entries.pop(key)
+                self.total_size -= entry["size"]
+                entry = None
+
+            is_loader = False
+            if entry is not None:
+                entry["atime"] = time.time()
+                self.in_use[key] = self.in_use.get(key, 0) + 1
+                self.hits += 1
+            else:
+                # 如果正在被其他请求解码，等待同一次解码的结果
+                future = self.loading.get(key)
+                is_loader = future is None
+                if is_loader:
+                    future = Future()
+                    self.loading[key] = future
+                    self.misses += 1
+                else:
+                    self.hits += 1
+
+        if entry is not None:
+            # 更新访问时间，重启后仍按最近访问时间驱逐
+            try:
+                os.utime(self._paths(key)[1])
+            except OSError:
+                pass
+            return entry["pcm"]
+
+        if not is_loader:
+            pcm = future.result()
+            with self.lock:
+                self.in_use[key] = self.in_use.get(key, 0) + 1
+            return pcm
+
+        try:
+            pcm = self._decode(key, audio_path, sample_rate, channels, dtype)
+            future.set_result(pcm)
+            return pcm
+        except Exception as e:
+            logger.error(f"解码音频失败: {audio_path}, 错误: {str(e)}")
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+
+    def release(self, pcm: Dict):
+        key = Path(pcm["path"]).stem
+        with self.lock:
+            self.in_use[key] = self.in_use.get(key, 1) - 1
+            if self.in_use[key] <= 0:
+                self.in_use.pop(key, None)
+            self._evict()
+
+    @contextmanager
+    def use(
+        self,
+        audio_path: str,
+        audio_sha256: Optional[str] = None,
+        sample_rate: Optional[int] = None,
+        channels: Optional[int] = None,
+        dtype: str = "float32",
+        max_channels: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """在使用期间保护PCM缓存条目不被驱逐"""
+        pcm = self.acquire(audio_path, audio_sha256, sample_rate, channels, dtype, max_channels)
+        try:
+            yield pcm
+        finally:
+            self.release(pcm)
+
+    def _remove(self, key: str) -> bool:
+        """删除条目。调用方需持有 self.lock"""
+        data_path, meta_path = self._paths(key)
+        try:
+            meta_path.unlink(missing_ok=True)
+            data_path.unlink(missing_ok=True)
+        except OSError as e:
+            # Windows上仍被内存映射的文件无法删除，下次再试
+            logger.debug(f"删除PCM缓存条目失败: {key}, 错误: {str(e)}")
+            return False
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_size -= entry["size"]
+        return True
+
+    def _evict(self):
+        """按最近访问时间驱逐未在使用的条目，直到总大小不超过上限。调用方需持有 self.lock"""
+        if not self.max_size_bytes or self.total_size <= self.max_size_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1]["atime"]):
+            if self.total_size <= self.max_size_bytes:
+                break
+            if self.in_use.get(key):
+                continue
+            if self._remove(key):
+                self.evictions += 1
+                logger.debug(f"驱逐PCM缓存条目: {key}")
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                if not self.in_use.get(key):
+                    self._remove(key)
+        logger.info("已清空PCM缓存 (使用中的条目除外)")
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": "pcm",
+                "entries": len(self.entries),
+                "size_mb": round(self.total_size / 1024 / 1024, 2),
+                "max_size_mb": round(self.max_size_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "in_use": sum(self.in_use.values()),
+                "decode_seconds": round(self.decode_seconds, 1),
+            }
@@ -0,0 +1,236 @@
+import asyncio
+import gc
+import math
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+# 工作进程内缓存的Demucs模型 (模型名称, 模型)，每个进程只保留一个，换用其他模型时先释放
+_worker_model: Optional[Tuple[str, object]] = None
+
+
+def _init_worker(threads: int):
+    """设置工作进程的torch线程数，避免多个进程争抢CPU核心"""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def _get_worker_model(model_name: str):
+    global _worker_model
+    if _worker_model is not None and _worker_model[0] == model_name:
+        return _worker_model[1]
+
+    from demucs.pretrained import get_model
+
+    if _worker_model is not None:
+        # 先释放之前的模型，进程内同时只有一个模型
+        _worker_model = None
+        gc.collect()
+    model = get_model(model_name)
+    model.cpu()
+    model.eval()
+    _worker_model = (model_name, model)
+    logger.info(f"工作进程 {os.getpid()} 已加载Demucs模型: {model_name}")
+    return model
+
+
+def _separate_segment(
+    model_name: str,
+    pcm: Dict,
+    output_dir: str,
+    start_frame: int,
+    end_frame: Optional[int],
+    window_seconds: float,
+    overlap_seconds: float,
+    stereo: bool,
+) -> Dict[str, str]:
+    """在工作进程中分离音频的一段，返回各轨道文件路径。PCM以内存映射打开，各进程共享页缓存"""
+    from ..utils.separation_utils import separate_to_files
+
+    stem_files = separate_to_files(
+        _get_worker_model(model_name), pcm, Path(output_dir), "cpu",
+        window_seconds, overlap_seconds, start_frame=start_frame, end_frame=end_frame, stereo=stereo
+    )
+    return {name: str(path) for name, path in stem_files.items()}
+
+
+class SeparationProcessPool:
+    """CPU上的多进程Demucs分离。
+
+    每个模型使用各自固定大小的进程池，池内每个进程只持有该模型并限制torch线程数；
+    长音频切分为多段分发到不同进程，同一模型的并发请求的分段在同一个进程池中排队，吞吐量随核心数近似线性增长。
+    创建进程池时按 Demucs内存预算 - 主进程中驻留的模型 - 其他进程池的模型 确定进程数 (预算为 0 表示不限制)，
+    空间不足时先关闭空闲的其他进程池 (最久未使用的在前)，正在使用的进程池不受影响。
+    工作进程使用spawn方式启动，首次提交任务时才创建。
+    """
+
+    def __init__(
+        self, workers: int, threads_per_worker: int, min_segment_seconds: float,
+        memory_budget_mb: float = 0, resident_memory: Optional[Callable[[], float]] = None,
+    ):
+        self.threads_per_worker = max(1, threads_per_worker)
+        if workers < 0:
+            # 自动: 按每个进程的线程数分配所有核心
+            workers = max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.workers = workers
+        self.min_segment_seconds = max(1.0, min_segment_seconds)
+        self.memory_budget_mb = memory_budget_mb
+        # 主进程中已加载的Demucs模型占用的内存，与工作进程共用同一预算
+        self.resident_memory = resident_memory
+        # 模型名称 -> {"executor", "workers", "memory_mb", "users"}，按最近使用顺序排列
+        self.pools: "OrderedDict[str, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.running_segments = 0
+        self.completed_segments = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _available_memory_mb(self, exclude: str) -> float:
+        """预算中还可分配给新进程池的内存。调用方需持有 self.lock"""
+        used = self.resident_memory() if self.resident_memory else 0.0
+        used += sum(pool["workers"] * pool["memory_mb"] for name, pool in self.pools.items() if name != exclude)
+        return self.memory_budget_mb - used
+
+    def _acquire_pool(self, model_name: str, model_memory_mb: float) -> Dict:
+        """返回该模型的进程池 (不存在时创建) 并登记使用，用完后调用 _release_pool"""
+        closing: List[ProcessPoolExecutor] = []
+        with self.lock:
+            pool = self.pools.get(model_name)
+            if pool is None:
+                workers = self.workers
+                if self.memory_budget_mb > 0 and model_memory_mb > 0:
+                    # 空间不足时关闭空闲的其他进程池
+                    for other_name in list(self.pools):
+                        if self._available_memory_mb(model_name) >= workers * model_memory_mb:
+                            break
+                        if self.pools[other_name]["users"] == 0:
+                            closing.append(self.pools.pop(other_name)["executor"])
+                    workers = max(1, min(workers, int(self._available_memory_mb(model_name) // model_memory_mb)))
+                pool = {
+                    "executor": ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.threads_per_worker,),
+                    ),
+                    "workers": workers,
+                    "memory_mb": model_memory_mb,
+                    "users": 0,
+                }
+                self.pools[model_name] = pool
+                logger.info(
+                    f"启动分离进程池: 模型 {model_name}, {workers} 个进程, 每个进程 {self.threads_per_worker} 个线程"
+                )
+            self.pools.move_to_end(model_name)
+            pool["users"] += 1
+        # 空闲的进程池没有任务，等待其进程退出后再启动新进程
+        for executor in closing:
+            executor.shutdown(wait=True)
+        if closing:
+            logger.info(f"关闭了 {len(closing)} 个空闲的分离进程池")
+        return pool
+
+    def _release_pool(self, pool: Dict):
+        with self.lock:
+            pool["users"] -= 1
+
+    def plan_segments(
+        self, total_frames: int, sample_rate: int, overlap_frames: int, workers: int
+    ) -> List[List[int]]:
+        """将音频切分为最多 workers 段 [start, end)，除最后一段外每段向后多取 overlap_frames 帧用于拼接"""
+        duration = total_frames / sample_rate
+        count = max(1, min(workers, math.floor(duration / self.min_segment_seconds)))
+        boundaries = [round(total_frames * i / count) for i in range(count + 1)]
+        return [
+            [boundaries[i], min(total_frames, boundaries[i + 1] + overlap_frames) if i < count - 1 else total_frames]
+            for i in range(count)
+        ]
+
+    def _on_segment_done(self, _future):
+        with self.lock:
+            self.running_segments -= 1
+            self.completed_segments += 1
+
+    async def separate(
+        self,
+        model_name: str,
+        pcm: Dict,
+        output_dir: Path,
+        window_seconds: float,
+        overlap_seconds: float,
+        stereo: bool = True,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        model_memory_mb: float = 0,
+    ) -> Dict[str, Path]:
+        """分段并行分离解码缓存中的PCM (调用方需在分离期间持有该条目)，拼接后的轨道写入 output_dir。
+
+        model_memory_mb 为每个进程中模型的估算内存，用于确定该模型进程池的进程数
+        """
+        from ..utils.separation_utils import concat_segments
+
+        loop = asyncio.get_running_loop()
+        # 关闭空闲进程池时需等待其进程退出，不在事件循环中执行
+        pool = await loop.run_in_executor(None, self._acquire_pool, model_name, model_memory_mb)
+        overlap_frames = int(overlap_seconds * pcm["sample_rate"])
+        segments = self.plan_segments(max(1, pcm["frames"]), pcm["sample_rate"], overlap_frames, pool["workers"])
+
+        output_dir = Path(output_dir)
+        results: List[Optional[Dict[str, str]]] = [None] * len(segments)
+        try:
+            futures = []
+            for i, (start, end) in enumerate(segments):
+                segment_dir = output_dir if len(segments) == 1 else output_dir / f"segment_{i}"
+                future = pool["executor"].submit(
+                    _separate_segment, model_name, pcm, str(segment_dir),
+                    start, end, window_seconds, overlap_seconds, stereo
+                )
+                with self.lock:
+                    self.running_segments += 1
+                future.add_done_callback(self._on_segment_done)
+                futures.append(asyncio.wrap_future(future, loop=loop))
+            logger.info(f"音频切分为 {len(segments)} 段并行分离: {pcm['path']}")
+
+            async def collect(index: int, future):
+                results[index] = await future
+                if progress_callback:
+                    progress_callback(sum(r is not None for r in results), len(results))
+
+            await asyncio.gather(*(collect(i, f) for i, f in enumerate(futures)))
+        finally:
+            self._release_pool(pool)
+
+        parts = [{name: Path(path) for name, path in result.items()} for result in results]
+        if len(parts) == 1:
+            return parts[0]
+        return await loop.run_in_executor(None, concat_segments, parts, output_dir, overlap_frames)
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "threads_per_worker": self.threads_per_worker,
+                "memory_budget_mb": self.memory_budget_mb,
+                "pools": [
+                    {"model_name": name, "workers": pool["workers"], "memory_mb": round(pool["memory_mb"], 1),
+                     "in_use": pool["users"]}
+                    for name, pool in self.pools.items()
+                ],
+                "running_segments": self.running_segments,
+                "completed_segments": self.completed_segments,
+            }
+
+    def shutdown(self):
+        with self.lock:
+            pools, self.pools = list(self.pools.values()), OrderedDict()
+        for pool in pools:
+            pool["executor"].shutdown(wait=False, cancel_futures=True)
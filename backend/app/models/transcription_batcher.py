@@ -0,0 +1,186 @@
+"""Micro-batching of concurrent short transcription requests into batched Whisper forward passes"""
+import asyncio
+import bisect
+import json
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from fastapi import HTTPException
+from loguru import logger
+from .pcm_cache import WHISPER_SAMPLE_RATE, open_pcm
+
+# Whisper一次处理的窗口长度 (秒)
+WINDOW_SECONDS = 30
+
+
+def count_windows(frames: int) -> int:
+    return math.ceil(frames / (WINDOW_SECONDS * WHISPER_SAMPLE_RATE))
+
+
+def transcribe_batch(model, audios: List[np.ndarray], transcribe_options: dict, batch_size: int) -> List[Dict]:
+    """把多段16kHz音频拼接后用faster-whisper的批量管线一起解码，再按时间拆分回各段。
+
+    每段音频按30秒切分为独立的窗口 (clip_timestamps)，不同音频的窗口不会合并，
+    同一语言的所有窗口按 batch_size 一批送入模型。未指定语言时逐段检测语言，按语言分组解码。
+    返回与 audios 一一对应的 {"language", "segments"}，时间戳为在各自音频中的时间。
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    options = dict(transcribe_options)
+    fixed_language = options.pop("language", None)
+    results = [{"language": fixed_language, "segments": []} for _ in audios]
+
+    groups: Dict[str, List[int]] = {}
+    for i, audio in enumerate(audios):
+        if len(audio) == 0:
+            continue
+        language = fixed_language or model.detect_language(audio=audio)[0]
+        results[i]["language"] = language
+        groups.setdefault(language, []).append(i)
+
+    pipeline = BatchedInferencePipeline(model)
+    for language, indices in groups.items():
+        offsets: List[int] = []
+        clips: List[Dict] = []
+        position = 0
+        for i in indices:
+            offsets.append(position)
+            for start in range(0, len(audios[i]), WINDOW_SECONDS * WHISPER_SAMPLE_RATE):
+                end = min(len(audios[i]), start + WINDOW_SECONDS * WHISPER_SAMPLE_RATE)
+                clips.append({
+                    "start": (position + start) / WHISPER_SAMPLE_RATE,
+                    "end": (position + end) / WHISPER_SAMPLE_RATE,
+                })
+            position += len(audios[i])
+
+        segments, _ = pipeline.transcribe(
+            np.concatenate([audios[i] for i in indices]),
+            language=language,
+            vad_filter=False,
+            clip_timestamps=clips,
+            batch_size=batch_size,
+            without_timestamps=False,
+            **options,
+        )
+        for segment in segments:
+            # 按字幕段中点所在的位置找到所属的音频，时间戳换算回该音频中的时间
+            k = max(0, bisect.bisect_right(offsets, (segment.start + segment.end) / 2 * WHISPER_SAMPLE_RATE) - 1)
+            i = indices[k]
+            base = offsets[k] / WHISPER_SAMPLE_RATE
+            duration = len(audios[i]) / WHISPER_SAMPLE_RATE
+            results[i]["segments"].append({
+                "start": round(max(0.0, segment.start - base), 3),
+                "end": round(min(duration, segment.end - base), 3),
+                "text": segment.text,
+            })
+    return results
+
+
+class TranscriptionBatcher:
+    """合并并发的短音频转录请求，一次批量前向计算。
+
+    同一模型和解码参数的请求在 max_wait_ms 内凑成一批 (凑满 max_batch_size 个30秒窗口时立即发出)，
+    整批作为一个推理任务提交到推理线程池 (受同样的准入和并发限制)，结果按请求拆分后分别返回。
+    等待结束时只有一个请求则不走批量管线，由调用方按单个请求转录。
+    只在事件循环线程中调用。
+    """
+
+    def __init__(self, model_manager, inference_pool, max_batch_size: int, max_wait_ms: int, max_clip_seconds: float):
+        self.model_manager = model_manager
+        self.inference_pool = inference_pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0, max_wait_ms) / 1000
+        self.max_clip_frames = int(max(0.0, max_clip_seconds) * WHISPER_SAMPLE_RATE)
+        self.pending: Dict[Tuple[str, str], List[Tuple[Dict, asyncio.Future]]] = {}
+        self.timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self.batches = 0
+        self.batched_requests = 0
+        self.max_batch_requests = 0
+        self.single_requests = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    def accepts(self, pcm: Dict) -> bool:
+        """只有较短的音频参与批量转录"""
+        return self.enabled and 0 < pcm["frames"] <= self.max_clip_frames
+
+    async def transcribe(self, model_name: str, pcm: Dict, transcribe_options: dict) -> Optional[Dict]:
+        """加入当前批次并等待结果 {"language", "segments"}。调用方需在等待期间持有 pcm 对应的缓存条目。
+
+        没有其他请求可以合并时返回 None
+        """
+        key = (model_name, json.dumps(transcribe_options, sort_keys=True))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = self.pending.setdefault(key, [])
+        group.append((pcm, future))
+
+        if len(group) == 1:
+            self.timers[key] = loop.call_later(self.max_wait_seconds, self._dispatch, key)
+        elif sum(count_windows(item[0]["frames"]) for item in group) >= self.max_batch_size:
+            self._dispatch(key)
+        return await future
+
+    def _dispatch(self, key: Tuple[str, str]):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self.pending.pop(key, [])
+        if len(group) == 1:
+            # 单个请求按普通方式解码，结果与不启用批量时一致
+            self.single_requests += 1
+            if not group[0][1].done():
+                group[0][1].set_result(None)
+        elif group:
+            asyncio.ensure_future(self._run(key, group))
+
+    async def _run(self, key: Tuple[str, str], group: List[Tuple[Dict, asyncio.Future]]):
+        model_name, options_json = key
+        self.batches += 1
+        self.batched_requests += len(group)
+        self.max_batch_requests = max(self.max_batch_requests, len(group))
+        try:
+            results = await self.inference_pool.run(
+                model_name, self._transcribe_batch, model_name, [pcm for pcm, _ in group], json.loads(options_json)
+            )
+        except Exception as e:
+            # 整批失败 (包括推理队列已满) 时每个请求都收到同样的错误
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _transcribe_batch(self, model_name: str, pcms: List[Dict], transcribe_options: dict) -> List[Dict]:
+        """在推理线程中执行一批"""
+        with self.model_manager.use_model(model_name) as model:
+            if model is None:
+                raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载或加载失败，请先下载模型")
+
+            start = time.monotonic()
+            audios = [open_pcm(pcm).reshape(-1) for pcm in pcms]
+            results = transcribe_batch(model, audios, transcribe_options, self.max_batch_size)
+            logger.info(
+                f"批量转录完成: 模型 {model_name}, {len(pcms)} 个请求, "
+                f"{sum(count_windows(len(audio)) for audio in audios)} 个窗口, 耗时 {time.monotonic() - start:.2f} 秒"
+            )
+            return results
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait_seconds * 1000),
+            "max_clip_seconds": self.max_clip_frames / WHISPER_SAMPLE_RATE,
+            "pending_requests": sum(len(group) for group in self.pending.values()),
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "avg_batch_requests": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_requests": self.max_batch_requests,
+            "single_requests": self.single_requests,
+        }
@@ -0,0 +1,339 @@
+"""Voice-activity-aware chunked transcription of long audio across CPU worker processes"""
+import gc
+import math
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from .pcm_cache import WHISPER_SAMPLE_RATE, open_pcm
+
+# 每次送入VAD的音频长度 (秒)，内存占用与音频总长度无关
+VAD_BLOCK_SECONDS = 600
+# 语音区间两侧保留的静音 (毫秒)，避免切掉字词的开头和结尾
+VAD_SPEECH_PAD_MS = 200
+# Whisper一次处理30秒，块长不小于一个窗口
+MIN_CHUNK_SECONDS = 30
+
+# 工作进程内缓存的Whisper模型 ((模型名称, 加载参数), 模型)，每个进程只保留一个，换用其他模型或参数时先释放
+_worker_model: Optional[Tuple[Tuple, object]] = None
+
+
+def _init_worker(threads: int):
+    """限制工作进程的线程数，避免多个进程争抢CPU核心"""
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+
+def _get_worker_model(model_name: str, model_settings: dict):
+    global _worker_model
+    key = (model_name, tuple(sorted(model_settings.items())))
+    if _worker_model is not None and _worker_model[0] == key:
+        return _worker_model[1]
+
+    from faster_whisper import WhisperModel
+    from ..config import MODELS_DIR
+    from .whisper_manager import resolve_model_name
+
+    if _worker_model is not None:
+        # 先释放之前的模型，进程内同时只有一个模型
+        _worker_model = None
+        gc.collect()
+    model = WhisperModel(resolve_model_name(model_name), download_root=str(MODELS_DIR), **model_settings)
+    _worker_model = (key, model)
+    logger.info(
+        f"工作进程 {os.getpid()} 已加载Whisper模型: {model_name}, 计算类型: {model_settings.get('compute_type')}"
+    )
+    return model
+
+
+def transcribe_chunk(
+    model, samples: np.ndarray, start_frame: int, end_frame: int, transcribe_options: dict
+) -> Tuple[List[Dict], str]:
+    """转录16kHz音频中的一块，时间戳换算为在整个文件中的时间。返回 (字幕段列表, 检测到的语言)"""
+    offset = start_frame / WHISPER_SAMPLE_RATE
+    chunk_end = end_frame / WHISPER_SAMPLE_RATE
+    segments, info = model.transcribe(samples[start_frame:end_frame], **transcribe_options)
+    return [
+        {"start": offset + segment.start, "end": min(offset + segment.end, chunk_end), "text": segment.text}
+        for segment in segments
+    ], info.language
+
+
+def _transcribe_chunk_in_worker(
+    model_name: str, model_settings: dict, pcm: Dict, start_frame: int, end_frame: int, transcribe_options: dict
+) -> Tuple[List[Dict], str]:
+    """在工作进程中转录一块。PCM以内存映射打开，各进程共享页缓存"""
+    model = _get_worker_model(model_name, model_settings)
+    return transcribe_chunk(model, open_pcm(pcm).reshape(-1), start_frame, end_frame, transcribe_options)
+
+
+def detect_speech(samples: np.ndarray, min_silence_ms: int) -> List[List[int]]:
+    """使用faster-whisper自带的Silero VAD逐块检测16kHz音频中的语音区间，返回 [[起始帧, 结束帧], ...]"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    vad_options = VadOptions(min_silence_duration_ms=min_silence_ms, speech_pad_ms=VAD_SPEECH_PAD_MS)
+    block_frames = VAD_BLOCK_SECONDS * WHISPER_SAMPLE_RATE
+    spans: List[List[int]] = []
+    for block_start in range(0, len(samples), block_frames):
+        block = np.asarray(samples[block_start:block_start + block_frames], dtype=np.float32)
+        for timestamp in get_speech_timestamps(block, vad_options):
+            start, end = block_start + timestamp["start"], block_start + timestamp["end"]
+            if spans and start <= spans[-1][1]:
+                # 跨越块边界的语音区间
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([start, end])
+    return spans
+
+
+def plan_chunks(spans: List[List[int]], chunk_frames: int) -> List[List[int]]:
+    """将相邻的语音区间合并为不超过 chunk_frames 的块 [start, end)，块之间的静音不再转录。
+
+    单个语音区间超过 chunk_frames 时 (极少见，VAD通常能找到停顿) 按 chunk_frames 切分。
+    """
+    chunks: List[List[int]] = []
+    for start, end in spans:
+        if chunks and end - chunks[-1][0] <= chunk_frames:
+            chunks[-1][1] = end
+            continue
+        while end - start > chunk_frames:
+            chunks.append([start, start + chunk_frames])
+            start += chunk_frames
+        chunks.append([start, end])
+    return chunks
+
+
+class TranscriptionProcessPool:
+    """长音频的分块并行转录。
+
+    先用VAD找出语音区间，在静音处切分为若干块 (静音部分直接跳过)，
+    各块分发到多个工作进程并行转录，再按块的起始时间换算为全局时间戳后按顺序拼接。
+    每个模型 (及其加载参数) 使用各自固定大小的进程池，池内每个进程只持有该模型并限制线程数。
+    创建进程池时按 内存预算 - 主进程中驻留的模型 - 其他进程池的模型 确定进程数 (预算为 0 表示不限制)，
+    空间不足时先关闭空闲的其他进程池 (最久未使用的在前)，正在使用的进程池不受影响。
+    工作进程使用spawn方式启动，首次提交任务时才创建。
+    """
+
+    def __init__(
+        self, workers: int, threads_per_worker: int, chunk_seconds: float, min_silence_ms: int,
+        memory_budget_mb: float = 0, resident_memory: Optional[Callable[[], float]] = None,
+    ):
+        self.threads_per_worker = max(1, threads_per_worker)
+        if workers < 0:
+            # 自动: 按每个进程的线程数分配所有核心
+            workers = max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.workers = workers
+        self.chunk_seconds = max(MIN_CHUNK_SECONDS, chunk_seconds)
+        self.min_silence_ms = max(100, min_silence_ms)
+        self.memory_budget_mb = memory_budget_mb
+        # 主进程中已加载的Whisper模型占用的内存，与工作进程共用同一预算
+        self.resident_memory = resident_memory
+        # (模型名称, 加载参数) -> {"executor", "workers", "memory_mb", "users"}，按最近使用顺序排列
+        self.pools: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.running_chunks = 0
+        self.completed_chunks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _available_memory_mb(self, exclude: Tuple) -> float:
+        """预算中还可分配给新进程池的内存。调用方需持有 self.lock"""
+        used = self.resident_memory() if self.resident_memory else 0.0
+        used += sum(pool["workers"] * pool["memory_mb"] for key, pool in self.pools.items() if key != exclude)
+        return self.memory_budget_mb - used
+
+    def _acquire_pool(self, model_name: str, model_settings: dict, model_memory_mb: float) -> Dict:
+        """返回该模型的进程池 (不存在时创建) 并登记使用，用完后调用 _release_pool"""
+        key = (model_name, tuple(sorted(model_settings.items())))
+        closing: List[ProcessPoolExecutor] = []
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                workers = self.workers
+                if self.memory_budget_mb > 0 and model_memory_mb > 0:
+                    # 空间不足时关闭空闲的其他进程池
+                    for other_key in list(self.pools):
+                        if self._available_memory_mb(key) >= workers * model_memory_mb:
+                            break
+                        if self.pools[other_key]["users"] == 0:
+                            closing.append(self.pools.pop(other_key)["executor"])
+                    workers = max(1, min(workers, int(self._available_memory_mb(key) // model_memory_mb)))
+                pool = {
+                    "executor": ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.threads_per_worker,),
+                    ),
+                    "workers": workers,
+                    "memory_mb": model_memory_mb,
+                    "users": 0,
+                }
+                self.pools[key] = pool
+                logger.info(
+                    f"启动转录进程池: 模型 {model_name}, {workers} 个进程, 每个进程 {self.threads_per_worker} 个线程"
+                )
+            self.pools.move_to_end(key)
+            pool["users"] += 1
+        # 空闲的进程池没有任务，等待其进程退出后再启动新进程
+        for executor in closing:
+            executor.shutdown(wait=True)
+        if closing:
+            logger.info(f"关闭了 {len(closing)} 个空闲的转录进程池")
+        return pool
+
+    def _release_pool(self, pool: Dict):
+        with self.lock:
+            pool["users"] -= 1
+
+    def _on_chunk_done(self, _future):
+        with self.lock:
+            self.running_chunks -= 1
+            self.completed_chunks += 1
+
+    def _submit(
+        self, pool: Dict, model_name: str, model_settings: dict, pcm: Dict, chunk: List[int], transcribe_options: dict
+    ) -> Future:
+        future = pool["executor"].submit(
+            _transcribe_chunk_in_worker, model_name, model_settings, pcm, chunk[0], chunk[1], transcribe_options
+        )
+        with self.lock:
+            self.running_chunks += 1
+        future.add_done_callback(self._on_chunk_done)
+        return future
+
+    def transcribe(
+        self,
+        model_name: str,
+        pcm: Dict,
+        transcribe_options: dict,
+        local_model=None,
+        model_settings: Optional[dict] = None,
+        model_memory_mb: float = 0,
+        segment_callback: Optional[Callable[[List[Dict]], None]] = None,
+        progress_callback: Optional[Callable[[float, float], None]] = None,
+    ) -> Dict:
+        """分块转录16kHz单声道的PCM (调用方需在转录期间持有该条目)，阻塞直到完成。
+
+        提供 local_model 时 (如GPU上的共享模型，或进程池已禁用) 在当前线程中按顺序转录各块，
+        仍可跳过静音部分。否则工作进程以 model_settings (WhisperModel 的参数) 加载模型，
+        按 model_memory_mb 确定进程数。segment_callback 按时间顺序以每块的字幕段调用，
+        progress_callback(已完成的秒数, 总秒数) 在每块按顺序完成后调用。
+        返回 {"language", "segments", "chunk_count", "speech_seconds"}。
+        """
+        samples = open_pcm(pcm).reshape(-1)
+        total_seconds = pcm["frames"] / WHISPER_SAMPLE_RATE
+        spans = detect_speech(samples, self.min_silence_ms)
+        speech_frames = sum(end - start for start, end in spans)
+
+        if model_settings is None:
+            model_settings = {"device": "cpu", "cpu_threads": self.threads_per_worker}
+        pool = self._acquire_pool(model_name, model_settings, model_memory_mb) if local_model is None else None
+        try:
+            workers = pool["workers"] if pool is not None else 1
+            chunk_frames = int(self.chunk_seconds * WHISPER_SAMPLE_RATE)
+            if local_model is None and workers > 1:
+                # 语音总长较短时缩小块长，使每个进程都有任务
+                chunk_frames = min(
+                    chunk_frames, max(MIN_CHUNK_SECONDS * WHISPER_SAMPLE_RATE, math.ceil(speech_frames / workers))
+                )
+            chunks = plan_chunks(spans, chunk_frames)
+            logger.info(
+                f"长音频分块转录: 时长 {total_seconds:.0f} 秒, 语音 {speech_frames / WHISPER_SAMPLE_RATE:.0f} 秒, "
+                f"切分为 {len(chunks)} 块, {'当前线程顺序转录' if local_model is not None else f'{workers} 个进程并行'}"
+            )
+
+            options = dict(transcribe_options)
+            results: Dict[int, List[Dict]] = {}
+            flushed = 0
+
+            def flush():
+                """按顺序交出已完成的块"""
+                nonlocal flushed
+                while flushed in results:
+                    if segment_callback:
+                        segment_callback(results[flushed])
+                    flushed += 1
+                    if progress_callback:
+                        done_seconds = (
+                            total_seconds if flushed == len(chunks) else chunks[flushed][0] / WHISPER_SAMPLE_RATE
+                        )
+                        progress_callback(done_seconds, total_seconds)
+
+            def run(index: int) -> str:
+                if local_model is not None:
+                    segments, language = transcribe_chunk(
+                        local_model, samples, chunks[index][0], chunks[index][1], options
+                    )
+                else:
+                    segments, language = self._submit(
+                        pool, model_name, model_settings, pcm, chunks[index], options
+                    ).result()
+                results[index] = segments
+                return language
+
+            language = options.get("language")
+            if chunks:
+                # 未指定语言时先转录第一块并使用其检测结果，避免各块检测出不同的语言
+                detected = run(0)
+                language = language or detected
+                options["language"] = language
+                flush()
+
+            if local_model is not None:
+                for index in range(1, len(chunks)):
+                    run(index)
+                    flush()
+            elif len(chunks) > 1:
+                pending = {
+                    self._submit(pool, model_name, model_settings, pcm, chunks[i], options): i
+                    for i in range(1, len(chunks))
+                }
+                try:
+                    while pending:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            results[pending.pop(future)] = future.result()[0]
+                        flush()
+                finally:
+                    # 出错时取消还未开始的块
+                    for future in pending:
+                        future.cancel()
+        finally:
+            if pool is not None:
+                self._release_pool(pool)
+
+        return {
+            "language": language,
+            "segments": [segment for index in range(len(chunks)) for segment in results[index]],
+            "chunk_count": len(chunks),
+            "speech_seconds": round(speech_frames / WHISPER_SAMPLE_RATE, 3),
+        }
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "threads_per_worker": self.threads_per_worker,
+                "memory_budget_mb": self.memory_budget_mb,
+                "chunk_seconds": self.chunk_seconds,
+                "pools": [
+                    {"model_name": key[0], "workers": pool["workers"], "memory_mb": round(pool["memory_mb"], 1),
+                     "in_use": pool["users"]}
+                    for key, pool in self.pools.items()
+                ],
+                "running_chunks": self.running_chunks,
+                "completed_chunks": self.completed_chunks,
+            }
+
+    def shutdown(self):
+        with self.lock:
+            pools, self.pools = list(self.pools.values()), OrderedDict()
+        for pool in pools:
+            pool["executor"].shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,147 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from loguru import logger
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化原文: Unicode NFC、合并连续空白、去除首尾空白"""
+    return _WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TranslationMemory:
+    """基于SQLite持久化的字幕翻译记忆。
+
+    以 (规范化原文, 源语言, 目标语言, 模型, 提示词版本) 为键保存译文，
+    翻译前先查询，重复的字幕行和重复翻译同一文件不再调用API。
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    source_text TEXT NOT NULL,
+                    source_lang TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    use_count INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+
+    @staticmethod
+    def make_key(text: str, source_lang: Optional[str], target_lang: str, model: str, prompt_version: str) -> str:
+        parts = "\x1f".join([normalize_text(text), source_lang or "", target_lang, model, prompt_version])
+        return hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self, texts: Iterable[str], source_lang: Optional[str], target_lang: str, model: str, prompt_version: str
+    ) -> Dict[str, str]:
+        """批量查询，返回 {规范化原文: 译文}，只包含命中的条目"""
+        keys = {
+            self.make_key(text, source_lang, target_lang, model, prompt_version): normalize_text(text)
+            for text in texts
+        }
+        if not keys:
+            return {}
+        found: Dict[str, str] = {}
+        key_list = list(keys)
+        with self.lock, self.conn:
+            # SQLite单条语句的参数数量有限，分批查询
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for row in rows:
+                    found[keys[row["key"]]] = row["translation"]
+                if rows:
+                    self.conn.execute(
+                        f"UPDATE translations SET last_used = ?, use_count = use_count + 1 "
+                        f"WHERE key IN ({','.join('?' * len(rows))})",
+                        [time.time()] + [row["key"] for row in rows],
+                    )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        if found:
+            logger.info(f"翻译记忆命中 {len(found)}/{len(keys)} 条")
+        return found
+
+    def store(
+        self,
+        translations: Dict[str, str],
+        source_lang: Optional[str],
+        target_lang: str,
+        model: str,
+        prompt_version: str,
+    ):
+        """保存 {原文: 译文}"""
+        if not translations:
+            return
+        now = time.time()
+        rows = [
+            (
+                self.make_key(text, source_lang, target_lang, model, prompt_version),
+                normalize_text(text), source_lang or "", target_lang, model, prompt_version,
+                translation, now, now,
+            )
+            for text, translation in translations.items()
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO translations
+                    (key, source_text, source_lang, target_lang, model, prompt_version,
+                     translation, created_at, last_used, use_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                rows,
+            )
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM translations")
+        logger.info("已清空翻译记忆")
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            row = self.conn.execute("SELECT COUNT(*) AS count FROM translations").fetchone()
+            lookups = self.hits + self.misses
+            try:
+                size = self.db_path.stat().st_size
+            except OSError:
+                size = 0
+            return {
+                "name": "translation",
+                "entries": row["count"],
+                "size_mb": round(size / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
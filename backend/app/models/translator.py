@@ -0,0 +1,293 @@
+import asyncio
+import json
+import random
+import re
+from typing import Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+from .translation_memory import TranslationMemory, normalize_text
+
+# 提示词或输出格式变化时递增，翻译记忆中旧版本的译文不再使用
+PROMPT_VERSION = "batch-json-1"
+
+SYSTEM_PROMPT = (
+    "You are a professional subtitle translator. Translate subtitle text accurately while preserving "
+    "the meaning and style. Keep each subtitle as a separate line of translation; never merge or split them."
+)
+
+_JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数: 英文约4字符一个token，中日韩文字约1字一个token (UTF-8下3字节)"""
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+class TranslationError(Exception):
+    """批次翻译失败 (重试后仍失败或返回结果无法解析)"""
+
+
+class SubtitleTranslator:
+    """批量并发翻译字幕。
+
+    - 多条字幕按token预算打包为一个请求，每条带编号，并附带相邻字幕作为上下文
+    - 多个批次通过异步客户端并发请求，并发数可配置
+    - 遇到限流/超时等可重试错误时按指数退避重试，优先使用服务端返回的 Retry-After
+    - 按编号把译文映射回字幕段；缺失或无法解析时拆分批次重试，最终仍失败的保留原文
+    - 接口错误 (认证失败、请求无效、模型不存在，或重试后仍失败) 不拆分重试，直接中止整个翻译
+    - 提供翻译记忆时先查询记忆，文件内重复的行也只翻译一次
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        temperature: float = 0.3,
+        max_tokens: int = 500,
+        concurrency: int = 4,
+        batch_token_budget: int = 1500,
+        max_batch_segments: int = 40,
+        context_segments: int = 2,
+        max_retries: int = 5,
+        memory: Optional[TranslationMemory] = None,
+    ):
+        self.client = client
+        self.memory = memory
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.concurrency = max(1, concurrency)
+        self.batch_token_budget = max(1, batch_token_budget)
+        self.max_batch_segments = max(1, max_batch_segments)
+        self.context_segments = max(0, context_segments)
+        self.max_retries = max(0, max_retries)
+
+    def make_batches(self, segments: List[Dict], indices: Optional[List[int]] = None) -> List[List[int]]:
+        """将需要翻译的字幕段 (按下标，默认全部) 打包为不超过token预算和条数上限的批次"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for index in range(len(segments)) if indices is None else indices:
+            text = segments[index]["text"].strip()
+            if not text:
+                continue
+            tokens = estimate_tokens(text)
+            if current and (
+                current_tokens + tokens > self.batch_token_budget or len(current) >= self.max_batch_segments
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _build_prompt(
+        self, segments: List[Dict], batch: List[int], target_language: str, source_language: Optional[str]
+    ) -> str:
+        first, last = batch[0], batch[-1]
+        context_before = [
+            segments[i]["text"].strip() for i in range(max(0, first - self.context_segments), first)
+        ]
+        context_after = [
+            segments[i]["text"].strip()
+            for i in range(last + 1, min(len(segments), last + 1 + self.context_segments))
+        ]
+        payload = {
+            "context_before": context_before,
+            "segments": [{"id": i + 1, "text": segments[i]["text"].strip()} for i in batch],
+            "context_after": context_after,
+        }
+        source_lang_text = f" from {source_language}" if source_language else ""
+        return (
+            f"Translate each subtitle in \"segments\"{source_lang_text} to {target_language}. "
+            "\"context_before\" and \"context_after\" are neighbouring subtitles for reference only; "
+            "do not translate them.\n"
+            "Return only a JSON object of the form "
+            "{\"translations\": [{\"id\": <id>, \"text\": \"<translation>\"}]} "
+            "with exactly one entry per input id, and no explanations or notes.\n\n"
+            + json.dumps(payload, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _parse_response(content: str, batch_ids: List[int]) -> Dict[int, str]:
+        """解析模型返回的JSON，按编号取出译文，忽略不属于本批次的编号"""
+        match = _JSON_OBJECT_PATTERN.search(content or "")
+        if not match:
+            raise TranslationError("翻译结果不是JSON")
+        try:
+            data = json.loads(match.group(0))
+        except ValueError as e:
+            raise TranslationError(f"翻译结果JSON解析失败: {str(e)}")
+
+        items = data.get("translations", data) if isinstance(data, dict) else data
+        translations: Dict[int, str] = {}
+        if isinstance(items, dict):
+            # 兼容 {"12": "..."} 形式
+            items = [{"id": key, "text": value} for key, value in items.items()]
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                segment_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            text = item.get("text")
+            if segment_id in batch_ids and isinstance(text, str) and text.strip():
+                translations[segment_id] = text.strip()
+        return translations
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+        """可重试的错误返回等待秒数，否则返回 None"""
+        import openai
+
+        retryable = (
+            openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError
+        )
+        if not isinstance(error, retryable):
+            return None
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(60.0, float(retry_after))
+            except ValueError:
+                pass
+        return min(30.0, 2 ** attempt) + random.uniform(0, 1)
+
+    async def _request(self, prompt: str, max_tokens: int) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=self.temperature,
+                    max_tokens=max_tokens
+                )
+                return response.choices[0].message.content or ""
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                logger.warning(f"翻译请求失败，{delay:.1f} 秒后重试 ({attempt + 1}/{self.max_retries}): {str(e)}")
+                await asyncio.sleep(delay)
+        raise TranslationError("翻译请求重试次数已用完")
+
+    async def _translate_batch(
+        self, segments: List[Dict], batch: List[int], target_language: str, source_language: Optional[str]
+    ) -> Dict[int, str]:
+        """翻译一个批次，返回 {字幕段下标: 译文}。
+
+        返回结果无法解析或部分缺失时拆分为两半分别重试；接口错误直接抛出，拆分重试不会改变结果
+        """
+        batch_ids = [i + 1 for i in batch]
+        batch_tokens = sum(estimate_tokens(segments[i]["text"]) for i in batch)
+        # 译文长度与原文相近，预留两倍原文的输出token
+        max_tokens = max(self.max_tokens, batch_tokens * 2 + 16 * len(batch))
+        prompt = self._build_prompt(segments, batch, target_language, source_language)
+        content = await self._request(prompt, max_tokens)
+        try:
+            translations = self._parse_response(content, batch_ids)
+        except TranslationError as e:
+            logger.error(f"翻译批次失败: 字幕 {batch_ids[0]}-{batch_ids[-1]}, 错误: {str(e)}")
+            translations = {}
+
+        result = {segment_id - 1: text for segment_id, text in translations.items()}
+        missing = [i for i in batch if i not in result]
+        if missing and len(batch) > 1:
+            logger.warning(f"批次缺少 {len(missing)} 条译文，拆分后重试: 字幕 {batch_ids[0]}-{batch_ids[-1]}")
+            # 按连续区间拆分，保留上下文的连贯性
+            half = len(missing) // 2 or 1
+            for part in (missing[:half], missing[half:]):
+                if part:
+                    result.update(await self._translate_batch(segments, part, target_language, source_language))
+        return result
+
+    async def translate(
+        self,
+        segments: List[Dict],
+        target_language: str,
+        source_language: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        segment_callback: Optional[Callable[[Dict[int, str]], Awaitable[None]]] = None,
+    ) -> List[Dict]:
+        """翻译所有字幕段，返回与输入一一对应的新字幕段列表，翻译失败的保留原文。
+
+        segment_callback 在译文可用时立即以 {字幕段下标: 译文} 调用: 先是翻译记忆命中的部分，
+        之后每完成一个批次调用一次 (包含与该批次原文相同的重复字幕段)。
+        """
+        normalized = {i: normalize_text(segment["text"]) for i, segment in enumerate(segments)}
+        normalized = {i: text for i, text in normalized.items() if text}
+
+        # 先查询翻译记忆 (SQLite读写在线程池中执行，不阻塞事件循环)
+        loop = asyncio.get_running_loop()
+        known: Dict[str, str] = {}
+        if self.memory is not None:
+            known = await loop.run_in_executor(
+                None, self.memory.lookup,
+                set(normalized.values()), source_language, target_language, self.model, PROMPT_VERSION
+            )
+
+        # 未命中的原文只翻译第一次出现的那一条
+        representatives: Dict[str, int] = {}
+        for i, text in normalized.items():
+            if text not in known and text not in representatives:
+                representatives[text] = i
+
+        batches = self.make_batches(segments, sorted(representatives.values()))
+        total = sum(len(batch) for batch in batches)
+        remembered = sum(text in known for text in normalized.values())
+        logger.info(
+            f"字幕共 {len(normalized)} 条, 记忆命中 {remembered} 条, 需翻译 {total} 条不重复原文, "
+            f"打包为 {len(batches)} 个批次, 并发数: {self.concurrency}"
+        )
+
+        def expand(found: Dict[str, str]) -> Dict[int, str]:
+            return {i: found[text] for i, text in normalized.items() if text in found}
+
+        if segment_callback and known:
+            await segment_callback(expand(known))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        translated: Dict[int, str] = {}
+        done = 0
+
+        async def run(batch: List[int]):
+            nonlocal done
+            async with semaphore:
+                result = await self._translate_batch(segments, batch, target_language, source_language)
+            translated.update(result)
+            # 每批完成后立即写入翻译记忆，中途失败时已完成的部分不会浪费
+            if self.memory is not None and result:
+                await loop.run_in_executor(
+                    None, self.memory.store,
+                    {normalized[i]: text for i, text in result.items()},
+                    source_language, target_language, self.model, PROMPT_VERSION
+                )
+            if segment_callback and result:
+                await segment_callback(expand({normalized[i]: text for i, text in result.items()}))
+            done += len(batch)
+            if progress_callback:
+                await progress_callback(done, total)
+
+        tasks = [asyncio.ensure_future(run(batch)) for batch in batches]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # 任一批次遇到接口错误时取消其余批次，已完成的译文已写入翻译记忆
+            for task in tasks:
+                task.cancel()
+            raise
+
+        failed = total - len(translated)
+        if failed:
+            logger.warning(f"{failed} 条字幕翻译失败，保留原文")
+        known.update({normalized[i]: text for i, text in translated.items()})
+        return [
+            {**segment, "text": known.get(normalized.get(i), segment["text"])}
+            for i, segment in enumerate(segments)
+        ]
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from loguru import logger
+from .blob_store import BlobStore, file_sha256
+
+# 上传会话状态
+UPLOAD_PENDING = "pending"
+UPLOAD_FINALIZING = "finalizing"
+UPLOAD_FINALIZED = "finalized"
+
+
+def merge_ranges(ranges: List[List[int]]) -> List[List[int]]:
+    """合并重叠或相邻的 [start, end) 区间"""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(received: List[List[int]], total_size: int) -> List[List[int]]:
+    """计算 [0, total_size) 中尚未收到的区间"""
+    missing = []
+    position = 0
+    for start, end in received:
+        if start > position:
+            missing.append([position, start])
+        position = max(position, end)
+    if position < total_size:
+        missing.append([position, total_size])
+    return missing
+
+
+class ChunkedUploadManager:
+    """可断点续传的分块上传。
+
+    每个上传会话对应一个预分配大小的 .part 文件和一个 .json 元数据文件，
+    分块可以并行、乱序写入指定偏移；元数据记录已收到的区间，
+    服务重启后客户端可以查询缺失的区间继续上传。
+    """
+
+    def __init__(self, directory: Path, blob_store: BlobStore, session_ttl_hours: int = 24):
+        self.directory = Path(directory)
+        self.blob_store = blob_store
+        self.session_ttl = session_ttl_hours * 3600
+        self.lock = threading.Lock()
+        # 正在校验和存入文件仓库的会话，同一会话的并发完成请求只执行一次
+        self.finalizing: set = set()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def _load_meta(self, upload_id: str) -> Dict:
+        # upload_id 来自URL，只接受uuid格式，防止路径穿越
+        try:
+            uuid.UUID(hex=upload_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"上传会话不存在: {upload_id}")
+        meta_path = self._meta_path(upload_id)
+        if not meta_path.exists():
+            raise HTTPException(status_code=404, detail=f"上传会话不存在: {upload_id}")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_meta(self, meta: Dict):
+        meta["updated_at"] = time.time()
+        meta_path = self._meta_path(meta["upload_id"])
+        tmp_path = meta_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def _status(self, meta: Dict) -> Dict:
+        received = meta["received"]
+        received_bytes = sum(end - start for start, end in received)
+        return {
+            "upload_id": meta["upload_id"],
+            "filename": meta["filename"],
+            "total_size": meta["total_size"],
+            "received_bytes": received_bytes,
+            "received": received,
+            "missing": missing_ranges(received, meta["total_size"]),
+            "status": UPLOAD_FINALIZING if meta["upload_id"] in self.finalizing else meta["status"],
+            "sha256": meta.get("sha256"),
+            "blob_id": meta.get("blob_id"),
+        }
+
+    def cleanup_expired(self):
+        """删除超时未完成的上传会话"""
+        now = time.time()
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("upload_id") in self.finalizing:
+                continue
+            if meta.get("status") == UPLOAD_PENDING and now - meta.get("updated_at", now) > self.session_ttl:
+                self.abort(meta["upload_id"])
+                logger.info(f"清理过期的上传会话: {meta['upload_id']}")
+
+    def create(self, filename: str, total_size: int, sha256: Optional[str] = None) -> Dict:
+        """创建上传会话并预分配文件"""
+        if total_size <= 0:
+            raise HTTPException(status_code=400, detail="文件大小必须大于0")
+        self.cleanup_expired()
+
+        upload_id = uuid.uuid4().hex
+        with open(self._part_path(upload_id), "wb") as f:
+            f.truncate(total_size)
+        meta = {
+            "upload_id": upload_id,
+            "filename": Path(filename).name,
+            "total_size": total_size,
+            "expected_sha256": sha256.lower() if sha256 else None,
+            "received": [],
+            "status": UPLOAD_PENDING,
+            "created_at": time.time(),
+        }
+        with self.lock:
+            self._save_meta(meta)
+        logger.info(f"创建上传会话: {upload_id}, 文件: {filename}, 大小: {total_size} bytes")
+        return self._status(meta)
+
+    def open_chunk(self, upload_id: str, offset: int):
+        """校验偏移并打开 .part 文件用于写入分块，返回 (文件对象, 会话元数据)"""
+        meta = self._load_meta(upload_id)
+        if meta["status"] != UPLOAD_PENDING or upload_id in self.finalizing:
+            raise HTTPException(status_code=409, detail="上传已完成或正在完成，不能再写入分块")
+        if offset < 0 or offset >= meta["total_size"]:
+            raise HTTPException(status_code=416, detail=f"偏移超出文件范围: {offset}")
+        f = open(self._part_path(upload_id), "r+b")
+        f.seek(offset)
+        return f, meta
+
+    def commit_chunk(self, upload_id: str, offset: int, length: int) -> Dict:
+        """记录已成功写入的区间"""
+        with self.lock:
+            meta = self._load_meta(upload_id)
+            end = min(offset + length, meta["total_size"])
+            meta["received"] = merge_ranges(meta["received"] + [[offset, end]])
+            self._save_meta(meta)
+        return self._status(meta)
+
+    def get_status(self, upload_id: str) -> Dict:
+        return self._status(self._load_meta(upload_id))
+
+    def finalize(self, upload_id: str) -> Dict:
+        """校验所有区间已收到及整体SHA-256，将文件存入文件仓库。
+
+        已完成时返回已有的结果；其他请求正在完成同一会话时返回409
+        """
+        with self.lock:
+            meta = self._load_meta(upload_id)
+            if meta["status"] == UPLOAD_FINALIZED:
+                return self._status(meta)
+            if upload_id in self.finalizing:
+                raise HTTPException(status_code=409, detail="上传正在完成，请稍后查询状态")
+            missing = missing_ranges(meta["received"], meta["total_size"])
+            if missing:
+                raise HTTPException(status_code=409, detail={"message": "仍有未上传的区间", "missing": missing})
+            self.finalizing.add(upload_id)
+
+        try:
+            # 先校验整体SHA-256，通过后再存入文件仓库 (相同内容只保留一份)
+            part_path = self._part_path(upload_id)
+            sha256 = file_sha256(part_path)
+            if meta.get("expected_sha256") and meta["expected_sha256"] != sha256:
+                # 保留会话和文件，清空已收到的区间，客户端可以重新上传各分块
+                with self.lock:
+                    meta["received"] = []
+                    self._save_meta(meta)
+                raise HTTPException(status_code=422, detail="文件SHA-256校验失败，请重新上传")
+            blob = self.blob_store.put_file(part_path, meta["filename"], kind="upload", sha256=sha256)
+
+            with self.lock:
+                meta["status"] = UPLOAD_FINALIZED
+                meta["sha256"] = blob["sha256"]
+                meta["blob_id"] = blob["blob_id"]
+                self._save_meta(meta)
+        finally:
+            with self.lock:
+                self.finalizing.discard(upload_id)
+        logger.info(f"上传完成: {upload_id}, 文件: {meta['filename']}, SHA-256: {blob['sha256']}")
+        return self._status(meta)
+
+    def resolve_blob_id(self, upload_id: str) -> str:
+        """将上传ID解析为文件仓库中的 blob_id。
+
+        同时接受分块上传的会话ID和 /api/upload 返回的 blob_id。
+        """
+        try:
+            meta = self._load_meta(upload_id)
+        except HTTPException:
+            return upload_id
+        if meta["status"] != UPLOAD_FINALIZED:
+            raise HTTPException(status_code=409, detail=f"上传尚未完成: {upload_id}")
+        return meta["blob_id"]
+
+    def abort(self, upload_id: str):
+        """删除上传会话及未完成的数据 (已完成的文件由文件仓库管理)"""
+        self._load_meta(upload_id)
+        if upload_id in self.finalizing:
+            raise HTTPException(status_code=409, detail="上传正在完成，不能删除")
+        self._part_path(upload_id).unlink(missing_ok=True)
+        self._meta_path(upload_id).unlink(missing_ok=True)
+        logger.info(f"删除上传会话: {upload_id}")
@@ -0,0 +1,647 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+import gc
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set
+from fastapi import HTTPException
+from loguru import logger
+from faster_whisper import WhisperModel
+from ..config import WHISPER_MEMORY_BUDGET_MB, WHISPER_AUTOTUNE, WHISPER_AUTOTUNE_MEMORY_MB, WHISPER_TUNING_PATH
+from ..utils.system_utils import get_process_memory_mb
+from .whisper_tuner import COMPUTE_TYPE_BYTES, WhisperAutoTuner, tuning_key
+
+# faster-whisper使用简短名称，但实际下载的是完整名称
+MODEL_NAME_MAPPING = {
+    "tiny": "Systran/faster-whisper-tiny",
+    "base": "Systran/faster-whisper-base",
+    "small": "Systran/faster-whisper-small",
+    "medium": "Systran/faster-whisper-medium",
+    "large-v1": "Systran/faster-whisper-large-v1",
+    "large-v2": "Systran/faster-whisper-large-v2",
+    "large-v3": "Systran/faster-whisper-large-v3",
+}
+
+
+# 模型信息中的 size_mb 实际约为参数量 (百万)，按float16每个参数2字节换算为权重大小
+FP16_BYTES_PER_PARAM = 2
+
+
+def resolve_model_name(model_name: str) -> str:
+    """如果是简短名称，转换为完整名称"""
+    return MODEL_NAME_MAPPING.get(model_name, model_name)
+
+
+class WhisperModelManager:
+    def __init__(self, memory_budget_mb: int = WHISPER_MEMORY_BUDGET_MB):
+        # 按最近使用顺序排列，最久未使用的在最前面
+        self.models: "OrderedDict[str, WhisperModel]" = OrderedDict()
+        self.model_memory: Dict[str, float] = {}
+        self.last_used: Dict[str, float] = {}
+        self.active_users: Dict[str, int] = {}
+        self.pinned: Set[str] = set()
+        # 正在加载的模型: 同一模型的并发请求共享一次加载
+        self.loading: Dict[str, Future] = {}
+        # 正在加载的模型和正在测速的计算类型预留的内存
+        self.loading_memory: Dict[str, float] = {}
+        self.memory_budget_mb = memory_budget_mb
+        self.download_status: Dict[str, Dict] = {}
+        self.device: Optional[str] = None
+        # 已加载模型实际使用的设备、计算类型和线程设置
+        self.model_settings: Dict[str, Dict] = {}
+        # 按模型名称返回运行配置 (device / compute_type / cpu_threads / num_workers)，由配置模块注册
+        self.profile_provider: Optional[Callable[[str], Dict]] = None
+        self.tuner = WhisperAutoTuner(
+            WHISPER_TUNING_PATH, WHISPER_AUTOTUNE_MEMORY_MB or memory_budget_mb
+        ) if WHISPER_AUTOTUNE else None
+        # 本进程中已开始测速的 模型|设备|线程数，每个只测一次
+        self.tuning_started: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def get_device(self) -> str:
+        """检测推理设备 (只检测一次)，与 WhisperModel 的 device="auto" 一致"""
+        if self.device is None:
+            import ctranslate2
+            self.device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+            logger.info(f"Whisper使用设备: {self.device}")
+        return self.device
+
+    def set_profile_provider(self, provider: Callable[[str], Dict]):
+        self.profile_provider = provider
+
+    def get_profile(self, model_name: str) -> Dict:
+        """模型的运行配置，未配置的项为 auto / 0 (由CTranslate2决定)"""
+        profile = self.profile_provider(model_name) if self.profile_provider else {}
+        return {
+            "device": profile.get("device") or "auto",
+            "compute_type": profile.get("compute_type") or "auto",
+            "cpu_threads": max(0, int(profile.get("cpu_threads") or 0)),
+            "num_workers": max(1, int(profile.get("num_workers") or 1)),
+        }
+
+    def get_model_device(self, model_name: str) -> str:
+        """模型实际使用的推理设备: 运行配置中指定的设备，否则为自动检测的设备"""
+        device = self.get_profile(model_name)["device"]
+        return self.get_device() if device == "auto" else device
+
+    def _resolve_settings(
+        self, model_name: str, load_name: str, load_kwargs: dict, cpu_threads: Optional[int] = None
+    ) -> Dict:
+        """按运行配置确定加载参数。compute_type 为 auto 时使用自动选择的结果，
+        还没有结果时使用默认类型并在后台测速选择 (不阻塞当前加载)。
+
+        指定 cpu_threads 时代替运行配置中的线程数 (自动选择按线程数分别记录)
+        """
+        profile = self.get_profile(model_name)
+        if cpu_threads is not None:
+            profile["cpu_threads"] = cpu_threads
+        device = self.get_model_device(model_name)
+        settings = {
+            "device": device,
+            "compute_type": profile["compute_type"],
+            "cpu_threads": profile["cpu_threads"],
+            "num_workers": profile["num_workers"],
+        }
+        if settings["compute_type"] == "auto":
+            if self.tuner is None:
+                settings["compute_type"] = "default"
+            else:
+                key = tuning_key(model_name, device, profile["cpu_threads"])
+                settings["compute_type"] = self.tuner.get_choice(key) or "default"
+                if settings["compute_type"] == "default" and key not in self.tuning_started:
+                    self.tune_async(model_name, cpu_threads)
+        return settings
+
+    def tune_model(self, model_name: str, cpu_threads: Optional[int] = None) -> Optional[str]:
+        """为模型测速选择计算类型 (阻塞)，已有结果或运行配置指定了计算类型时直接返回。
+
+        测速期间依次加载各候选类型，按其中最大的估算内存在模型内存预算中预留并驱逐空闲模型。
+        """
+        if self.tuner is None:
+            return None
+        profile = self.get_profile(model_name)
+        if profile["compute_type"] != "auto":
+            return profile["compute_type"]
+        if cpu_threads is not None:
+            profile["cpu_threads"] = cpu_threads
+        device = self.get_model_device(model_name)
+        key = tuning_key(model_name, device, profile["cpu_threads"])
+        with self.lock:
+            choice = self.tuner.get_choice(key)
+            if choice is not None or key in self.tuning_started:
+                return choice
+            self.tuning_started.add(key)
+
+        reserved_mb = self.tuner.peak_memory_mb(device, self.estimate_model_memory(model_name))
+        reservation = f"tuning:{key}"
+        with self.lock:
+            evicted = self._evict_for(reserved_mb)
+            self.loading_memory[reservation] = reserved_mb
+        if evicted:
+            gc.collect()
+        try:
+            return self.tuner.tune(
+                key, resolve_model_name(model_name), device,
+                {"download_root": "models", "cpu_threads": profile["cpu_threads"], "num_workers": profile["num_workers"]},
+                self.estimate_model_memory(model_name),
+            )
+        finally:
+            with self.lock:
+                self.loading_memory.pop(reservation, None)
+
+    def tune_async(self, model_name: str, cpu_threads: Optional[int] = None):
+        """在后台线程中测速选择计算类型，之后加载的模型使用选择结果"""
+        def tune_worker():
+            try:
+                self.tune_model(model_name, cpu_threads)
+            except Exception as e:
+                logger.error(f"选择计算类型失败: {model_name}, 错误: {str(e)}")
+
+        threading.Thread(target=tune_worker, name=f"whisper-tune-{model_name}", daemon=True).start()
+
+    def get_worker_settings(self, model_name: str, cpu_threads: int) -> Dict:
+        """在其他进程中加载同一模型 (如长音频转录的工作进程) 使用的加载参数和估算内存。
+
+        与本进程使用相同的运行配置和自动选择的计算类型，线程数由调用方指定，每个进程只执行一个转录。
+        返回 {"settings": WhisperModel 的参数, "memory_mb": 按计算类型估算的内存}
+        """
+        settings = self._resolve_settings(
+            model_name, resolve_model_name(model_name), {"download_root": "models"}, cpu_threads=cpu_threads
+        )
+        settings["num_workers"] = 1
+        bytes_per_weight = COMPUTE_TYPE_BYTES.get(settings["compute_type"], 4)
+        return {
+            "settings": settings,
+            "memory_mb": self.estimate_model_memory(model_name) * bytes_per_weight / 2,
+        }
+
+    def get_available_models(self):
+        """获取常用模型信息"""
+        models_info = {
+            "tiny": {
+                "name": "Tiny",
+                "description": "最快速度，精度较低 (~39 MB)",
+                "size_mb": 39,
+                "speed": "最快",
+                "accuracy": "较低"
+            },
+            "base": {
+                "name": "Base",
+                "description": "平衡速度和精度 (~74 MB)",
+                "size_mb": 74,
+                "speed": "中等",
+                "accuracy": "中等"
+            },
+            "small": {
+                "name": "Small",
+                "description": "较好精度 (~244 MB)",
+                "size_mb": 244,
+                "speed": "较慢",
+                "accuracy": "良好"
+            },
+            "medium": {
+                "name": "Medium",
+                "description": "高精度 (~769 MB)",
+                "size_mb": 769,
+                "speed": "慢",
+                "accuracy": "高"
+            },
+            "large-v1": {
+                "name": "Large v1",
+                "description": "最高精度 (~1550 MB)",
+                "size_mb": 1550,
+                "speed": "最慢",
+                "accuracy": "最高"
+            },
+            "large-v2": {
+                "name": "Large v2",
+                "description": "最新最高精度 (~1550 MB)",
+                "size_mb": 1550,
+                "speed": "最慢",
+                "accuracy": "最高"
+            },
+            "large-v3": {
+                "name": "Large v3",
+                "description": "最新最高精度 (~1550 MB)",
+                "size_mb": 1550,
+                "speed": "最慢",
+                "accuracy": "最高"
+            },
+            "openai/whisper-tiny": {
+                "name": "OpenAI Tiny",
+                "description": "OpenAI官方Tiny模型 (~39 MB)",
+                "size_mb": 39,
+                "speed": "最快",
+                "accuracy": "较低"
+            },
+            "openai/whisper-base": {
+                "name": "OpenAI Base",
+                "description": "OpenAI官方Base模型 (~74 MB)",
+                "size_mb": 74,
+                "speed": "中等",
+                "accuracy": "中等"
+            },
+            "openai/whisper-small": {
+                "name": "OpenAI Small",
+                "description": "OpenAI官方Small模型 (~244 MB)",
+                "size_mb": 244,
+                "speed": "较慢",
+                "accuracy": "良好"
+            },
+            "openai/whisper-medium": {
+                "name": "OpenAI Medium",
+                "description": "OpenAI官方Medium模型 (~769 MB)",
+                "size_mb": 769,
+                "speed": "慢",
+                "accuracy": "高"
+            },
+            "openai/whisper-large-v3": {
+                "name": "OpenAI Large v3",
+                "description": "OpenAI官方最新Large模型 (~1550 MB)",
+                "size_mb": 1550,
+                "speed": "最慢",
+                "accuracy": "最高"
+            }
+        }
+        return models_info
+
+    def is_model_downloaded(self, model_name: str) -> bool:
+       """检查模型是否已下载到磁盘"""
+       full_model_name = resolve_model_name(model_name)
+       model_dir = Path("models") / f"models--{full_model_name.replace('/', '--')}"
+       return model_dir.exists() and model_dir.is_dir()
+
+    def get_model_revision(self, model_name: str) -> Optional[str]:
+        """读取已下载模型的版本 (Hugging Face缓存中 refs/main 记录的commit)"""
+        full_model_name = resolve_model_name(model_name)
+        refs_dir = Path("models") / f"models--{full_model_name.replace('/', '--')}" / "refs"
+        try:
+            return (refs_dir / "main").read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+
+    def get_model_status(self, model_name: str) -> Dict:
+        """获取模型状态"""
+        with self.lock:
+            if model_name in self.models:
+                return {
+                    "status": "loaded",
+                    "model_name": model_name,
+                    "message": "模型已加载"
+                }
+            elif model_name in self.loading:
+                return {
+                    "status": "loading",
+                    "model_name": model_name,
+                    "message": "模型加载中"
+                }
+            elif model_name in self.download_status:
+                status_info = self.download_status[model_name]
+                return {
+                    "status": status_info.get("status", "unknown"),
+                    "model_name": model_name,
+                    "progress": status_info.get("progress", 0),
+                    "message": status_info.get("message", "")
+                }
+            else:
+                if self.is_model_downloaded(model_name):
+                    return {
+                        "status": "downloaded",
+                        "model_name": model_name,
+                        "message": "模型已下载"
+                    }
+                else:
+                    return {
+                        "status": "not_downloaded",
+                        "model_name": model_name,
+                        "message": "模型未下载"
+                    }
+
+    def _model_file_mb(self, model_name: str) -> Optional[float]:
+        """已下载模型的权重文件 (model.bin，以float16保存) 的大小 (MB)"""
+        revision = self.get_model_revision(model_name)
+        if revision is None:
+            return None
+        full_model_name = resolve_model_name(model_name)
+        path = Path("models") / f"models--{full_model_name.replace('/', '--')}" / "snapshots" / revision / "model.bin"
+        try:
+            return path.stat().st_size / (1024 * 1024)
+        except OSError:
+            return None
+
+    def estimate_model_memory(self, model_name: str) -> float:
+        """估算模型以float16权重加载时占用的内存 (MB)。
+
+        已下载时取权重文件的大小，否则按模型信息中的参数量换算
+        """
+        file_mb = self._model_file_mb(model_name)
+        if file_mb is not None:
+            return file_mb
+        models_info = self.get_available_models()
+        info = models_info.get(model_name)
+        if info is None:
+            # 完整名称 (如 Systran/faster-whisper-base) 反查简短名称
+            for short_name, full_name in MODEL_NAME_MAPPING.items():
+                if full_name == model_name:
+                    info = models_info.get(short_name)
+                    break
+        return float(info["size_mb"]) * FP16_BYTES_PER_PARAM if info else 0.0
+
+    def _used_memory_mb(self) -> float:
+        """已加载和正在加载的模型占用的内存"""
+        loaded = sum(self.model_memory.get(name, 0.0) for name in self.models)
+        return loaded + sum(self.loading_memory.values())
+
+    def get_used_memory_mb(self) -> float:
+        with self.lock:
+            return self._used_memory_mb()
+
+    def _evict_for(self, required_mb: float) -> List[str]:
+        """按LRU顺序驱逐空闲模型，为新模型腾出内存。调用方需持有 self.lock"""
+        evicted = []
+        if self.memory_budget_mb <= 0:
+            return evicted
+
+        while self._used_memory_mb() + required_mb > self.memory_budget_mb:
+            candidate = None
+            for name in self.models:
+                if name in self.pinned or self.active_users.get(name, 0) > 0:
+                    continue
+                candidate = name
+                break
+            if candidate is None:
+                logger.warning(
+                    f"内存预算不足，但没有可驱逐的空闲模型: 需要 {required_mb:.0f} MB, "
+                    f"已用 {self._used_memory_mb():.0f}/{self.memory_budget_mb} MB"
+                )
+                break
+
+            self.models.pop(candidate)
+            self.model_settings.pop(candidate, None)
+            freed = self.model_memory.pop(candidate, 0.0)
+            self.last_used.pop(candidate, None)
+            evicted.append(candidate)
+            logger.info(f"驱逐空闲模型: {candidate}, 释放约 {freed:.0f} MB")
+
+        return evicted
+
+    def _register_model(self, model_name: str, model: WhisperModel, memory_mb: float, settings: Dict):
+        """登记已加载的模型。调用方需持有 self.lock"""
+        self.models[model_name] = model
+        self.model_settings[model_name] = settings
+        self.models.move_to_end(model_name)
+        self.model_memory[model_name] = memory_mb
+        self.last_used[model_name] = time.time()
+
+    def _load_model(self, model_name: str, load_name: str, **kwargs) -> WhisperModel:
+        """按运行配置加载模型并测量其实际占用的内存。
+
+        只在登记和驱逐时持有 self.lock，从磁盘加载期间不阻塞其他模型的请求。
+        """
+        estimated_mb = self.estimate_model_memory(model_name)
+        with self.lock:
+            evicted = self._evict_for(estimated_mb)
+            self.loading_memory[model_name] = estimated_mb
+        if evicted:
+            gc.collect()
+
+        try:
+            settings = self._resolve_settings(model_name, load_name, kwargs)
+            rss_before = get_process_memory_mb()
+            model = WhisperModel(load_name, **settings, **kwargs)
+            rss_after = get_process_memory_mb()
+        except Exception:
+            with self.lock:
+                self.loading_memory.pop(model_name, None)
+            raise
+
+        # 并发加载时RSS差值可能包含其他模型，只作为参考
+        memory_mb = estimated_mb
+        if rss_before is not None and rss_after is not None and rss_after > rss_before:
+            memory_mb = rss_after - rss_before
+        logger.info(
+            f"模型 {model_name} 占用内存: {memory_mb:.0f} MB (估算: {estimated_mb:.0f} MB), "
+            f"设备: {settings['device']}, 计算类型: {settings['compute_type']}"
+        )
+
+        with self.lock:
+            self.loading_memory.pop(model_name, None)
+            self._register_model(model_name, model, memory_mb, settings)
+        return model
+
+    def download_model_async(self, model_name: str, revision: str = None):
+        """异步下载模型"""
+        def download_worker():
+            logger.info(f"开始下载模型: {model_name}, 版本: {revision}")
+            try:
+                with self.lock:
+                    self.download_status[model_name] = {
+                        "status": "downloading",
+                        "progress": 0,
+                        "message": "开始下载模型..."
+                    }
+
+                # 下载并加载模型
+                kwargs = {"download_root": "models"}
+                if revision:
+                    kwargs["revision"] = revision
+                logger.debug(f"下载参数: {kwargs}")
+
+                # 与 get_model 共享同一次加载，避免同一模型被加载两次
+                self._get_or_load(model_name, model_name, **kwargs)
+                with self.lock:
+                    self.download_status.pop(model_name, None)
+
+                logger.info(f"模型下载并加载成功: {model_name}")
+
+            except Exception as e:
+                logger.error(f"模型下载失败: {model_name}, 错误: {str(e)}")
+                with self.lock:
+                    self.download_status[model_name] = {
+                        "status": "error",
+                        "progress": 0,
+                        "message": f"下载失败: {str(e)}"
+                    }
+
+        thread = threading.Thread(target=download_worker, daemon=True)
+        thread.start()
+
+    def _get_or_load(self, model_name: str, load_name: str, **kwargs) -> WhisperModel:
+        """返回已加载的模型，否则加载它。同一模型的并发加载 (包括下载后的加载) 共享一次，失败时抛出异常"""
+        with self.lock:
+            # 如果模型已在内存中，直接返回
+            if model_name in self.models:
+                self.models.move_to_end(model_name)
+                self.last_used[model_name] = time.time()
+                return self.models[model_name]
+
+            # 如果模型正在被其他请求加载，等待同一次加载的结果
+            future = self.loading.get(model_name)
+            is_loader = future is None
+            if is_loader:
+                future = Future()
+                self.loading[model_name] = future
+
+        if not is_loader:
+            logger.debug(f"等待模型加载完成: {model_name}")
+            return future.result()
+
+        # 在锁外加载模型
+        try:
+            model = self._load_model(model_name, load_name, **kwargs)
+            future.set_result(model)
+            return model
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(model_name, None)
+
+    def get_model(self, model_name: str) -> Optional[WhisperModel]:
+        """获取模型，如果不存在则尝试加载已下载的模型"""
+        with self.lock:
+            loaded = model_name in self.models or model_name in self.loading
+            downloading = self.download_status.get(model_name, {}).get("status") == "downloading"
+        # 模型未下载或正在下载
+        if not loaded and (downloading or not self.is_model_downloaded(model_name)):
+            return None
+
+        try:
+            if not loaded:
+                logger.info(f"模型 {model_name} 已下载但未加载，正在加载...")
+            model = self._get_or_load(model_name, resolve_model_name(model_name), download_root="models")
+            if not loaded:
+                logger.info(f"模型 {model_name} 加载成功")
+            return model
+        except Exception as e:
+            logger.error(f"加载模型失败: {model_name}, 错误: {str(e)}")
+            return None
+
+    @contextmanager
+    def use_model(self, model_name: str) -> Iterator[Optional[WhisperModel]]:
+        """获取模型并在使用期间标记为活跃，活跃模型不会被驱逐"""
+        with self.lock:
+            self.active_users[model_name] = self.active_users.get(model_name, 0) + 1
+        try:
+            yield self.get_model(model_name)
+        finally:
+            with self.lock:
+                self.active_users[model_name] -= 1
+                if self.active_users[model_name] <= 0:
+                    self.active_users.pop(model_name, None)
+                if model_name in self.last_used:
+                    self.last_used[model_name] = time.time()
+
+    def unload_model(self, model_name: str) -> bool:
+        """从内存中移除空闲的模型 (如运行配置变化后)，下次使用时按新配置重新加载。模型正在使用时返回 False"""
+        with self.lock:
+            if model_name not in self.models or self.active_users.get(model_name, 0) > 0:
+                return False
+            del self.models[model_name]
+            self.model_settings.pop(model_name, None)
+            self.model_memory.pop(model_name, None)
+            self.last_used.pop(model_name, None)
+        gc.collect()
+        logger.info(f"卸载模型: {model_name}")
+        return True
+
+    def pin_model(self, model_name: str):
+        """固定模型，固定的模型不会被驱逐"""
+        with self.lock:
+            self.pinned.add(model_name)
+        logger.info(f"固定模型: {model_name}")
+
+    def unpin_model(self, model_name: str):
+        """取消固定模型"""
+        with self.lock:
+            self.pinned.discard(model_name)
+        logger.info(f"取消固定模型: {model_name}")
+
+    def get_resident_models(self) -> Dict:
+        """获取内存中驻留的模型及其内存占用"""
+        now = time.time()
+        with self.lock:
+            models = [
+                {
+                    "model_name": name,
+                    "memory_mb": round(self.model_memory.get(name, 0.0), 1),
+                    "pinned": name in self.pinned,
+                    "in_use": self.active_users.get(name, 0),
+                    "idle_seconds": round(now - self.last_used.get(name, now), 1),
+                    **self.model_settings.get(name, {}),
+                }
+                for name in self.models
+            ]
+            return {
+                "models": models,
+                "used_memory_mb": round(self._used_memory_mb(), 1),
+                "memory_budget_mb": self.memory_budget_mb,
+                "pinned": sorted(self.pinned),
+                "loading": sorted(self.loading),
+                "process_memory_mb": get_process_memory_mb(),
+                "autotune": self.tuner.get_stats() if self.tuner else None,
+            }
+
+    def delete_model(self, model_name: str) -> Dict[str, str]:
+        """删除指定的模型"""
+        logger.info(f"开始删除模型: {model_name}")
+        with self.lock:
+            # 检查模型是否正在下载
+            if model_name in self.download_status:
+                status = self.download_status[model_name]
+                if status.get("status") == "downloading":
+                    logger.warning(f"模型正在下载中，无法删除: {model_name}")
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"模型 {model_name} 正在下载中，无法删除"
+                    )
+
+            # 正在加载或使用中的模型不能删除
+            if self.active_users.get(model_name, 0) > 0 or model_name in self.loading:
+                logger.warning(f"模型正在使用中，无法删除: {model_name}")
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"模型 {model_name} 正在使用中，请稍后再删除"
+                )
+
+            # 删除后不再固定
+            self.pinned.discard(model_name)
+
+            # 检查模型是否已加载
+            if model_name in self.models:
+                # 从内存中移除模型
+                del self.models[model_name]
+                self.model_settings.pop(model_name, None)
+                self.model_memory.pop(model_name, None)
+                self.last_used.pop(model_name, None)
+                logger.info(f"从内存中移除模型: {model_name}")
+
+            # 删除模型文件
+            try:
+                import shutil
+
+                full_model_name = resolve_model_name(model_name)
+
+                model_dir = Path("models") / f"models--{full_model_name.replace('/', '--')}"
+                if model_dir.exists():
+                    shutil.rmtree(model_dir)
+                    logger.info(f"删除模型文件成功: {model_name}")
+                    return {
+                        "message": f"模型 {model_name} 已成功删除",
+                        "model_name": model_name
+                    }
+                else:
+                    logger.info(f"模型文件不存在: {model_name}")
+                    return {
+                        "message": f"模型 {model_name} 的文件不存在，可能已被删除",
+                        "model_name": model_name
+                    }
+            except Exception as e:
+                logger.error(f"删除模型文件失败: {model_name}, 错误: {str(e)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"删除模型文件失败: {str(e)}"
+                )
@@ -0,0 +1,174 @@
+"""Benchmark-based compute type selection for Whisper models, recorded per model, device and thread count"""
+import gc
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
+from loguru import logger
+from ..utils.system_utils import get_process_memory_mb
+
+# 各设备上参与比较的计算类型，用时相同时取靠前的
+CANDIDATE_COMPUTE_TYPES = {
+    "cpu": ["int8", "int16", "float32"],
+    "cuda": ["int8_float16", "float16", "int8_float32", "float32"],
+}
+
+# 每个权重占用的字节数，用于估算内存 (模型文件以float16保存)
+COMPUTE_TYPE_BYTES = {
+    "float32": 4, "float16": 2, "bfloat16": 2, "int16": 2,
+    "int8": 1, "int8_float32": 1, "int8_float16": 1, "int8_bfloat16": 1,
+}
+
+# 基准测试: 合成音频时长 (秒)、每次解码最多生成的token数、计时的次数 (另有一次预热，取最快一次)
+BENCHMARK_SECONDS = 10
+BENCHMARK_MAX_TOKENS = 32
+BENCHMARK_RUNS = 2
+
+
+def tuning_key(model_name: str, device: str, cpu_threads: int) -> str:
+    return f"{model_name}|{device}|{cpu_threads}"
+
+
+def benchmark_audio() -> np.ndarray:
+    """16kHz的调幅正弦波加少量噪声，避免静音使解码提前结束"""
+    t = np.arange(BENCHMARK_SECONDS * 16000) / 16000
+    noise = np.random.default_rng(0).standard_normal(len(t))
+    return (0.1 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 2 * t)) + 0.01 * noise).astype(np.float32)
+
+
+class WhisperAutoTuner:
+    """在本机比较各候选计算类型的解码速度，选择内存占用不超过上限的最快类型。
+
+    选择结果按 模型|设备|线程数 记录在JSON文件中，之后加载直接使用，不再测试。
+    内存占用取按权重字节数的估算值与 (CPU上) 实测RSS增量中的较大者。
+    """
+
+    def __init__(self, path: Path, memory_limit_mb: float):
+        self.path = Path(path)
+        self.memory_limit_mb = memory_limit_mb
+        self.lock = threading.Lock()
+        self.choices: Dict[str, Dict] = self._read()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取计算类型选择记录失败: {self.path}, 错误: {str(e)}")
+            return {}
+
+    def _write(self):
+        """调用方需持有 self.lock"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.choices, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get_choice(self, key: str) -> Optional[str]:
+        with self.lock:
+            choice = self.choices.get(key)
+            return choice["compute_type"] if choice else None
+
+    def forget(self, key: str):
+        with self.lock:
+            if self.choices.pop(key, None) is not None:
+                self._write()
+
+    def peak_memory_mb(self, device: str, estimated_mb: float) -> float:
+        """测速期间占用的最大内存估算 (一次只加载一个候选，超出上限的候选不加载)"""
+        estimates = [
+            estimated_mb * COMPUTE_TYPE_BYTES.get(compute_type, 4) / 2
+            for compute_type in CANDIDATE_COMPUTE_TYPES.get(device, [])
+        ]
+        if not estimates:
+            return estimated_mb
+        fitting = [memory_mb for memory_mb in estimates if self.memory_limit_mb <= 0 or memory_mb <= self.memory_limit_mb]
+        return max(fitting) if fitting else min(estimates)
+
+    def _benchmark(self, model) -> float:
+        audio = benchmark_audio()
+        options = dict(
+            language="en", beam_size=1, temperature=0.0, condition_on_previous_text=False,
+            without_timestamps=True, max_new_tokens=BENCHMARK_MAX_TOKENS,
+        )
+        list(model.transcribe(audio, **options)[0])
+        best = float("inf")
+        for _ in range(BENCHMARK_RUNS):
+            start = time.perf_counter()
+            list(model.transcribe(audio, **options)[0])
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def tune(self, key: str, load_name: str, device: str, load_kwargs: dict, estimated_mb: float) -> str:
+        """依次加载各候选计算类型并测速，返回选中的类型。全部失败时返回 "default" 且不记录。
+
+        估算内存已超出上限的候选不加载；都超出时只测试估算内存最小的一个
+        """
+        import ctranslate2
+        from faster_whisper import WhisperModel
+
+        supported = ctranslate2.get_supported_compute_types(device)
+        candidates = [compute_type for compute_type in CANDIDATE_COMPUTE_TYPES.get(device, []) if compute_type in supported]
+        estimates = {
+            compute_type: estimated_mb * COMPUTE_TYPE_BYTES.get(compute_type, 4) / 2
+            for compute_type in candidates
+        }
+        if self.memory_limit_mb > 0 and candidates:
+            fitting = [compute_type for compute_type in candidates if estimates[compute_type] <= self.memory_limit_mb]
+            skipped = [compute_type for compute_type in candidates if compute_type not in fitting]
+            if skipped:
+                logger.info(f"估算内存超出上限 {self.memory_limit_mb:.0f} MB，跳过: {skipped}")
+            candidates = fitting or [min(candidates, key=lambda compute_type: estimates[compute_type])]
+        logger.info(f"开始选择计算类型: {key}, 候选: {candidates}")
+
+        results: Dict[str, Dict] = {}
+        for compute_type in candidates:
+            gc.collect()
+            rss_before = get_process_memory_mb()
+            model = None
+            try:
+                model = WhisperModel(load_name, device=device, compute_type=compute_type, **load_kwargs)
+                seconds = self._benchmark(model)
+                rss_after = get_process_memory_mb()
+            except Exception as e:
+                logger.warning(f"计算类型 {compute_type} 测试失败: {str(e)}")
+                continue
+            finally:
+                del model
+
+            memory_mb = estimates[compute_type]
+            if device == "cpu" and rss_before is not None and rss_after is not None:
+                memory_mb = max(memory_mb, rss_after - rss_before)
+            results[compute_type] = {"seconds": round(seconds, 3), "memory_mb": round(memory_mb, 1)}
+            logger.info(f"计算类型 {compute_type}: 用时 {seconds:.2f} 秒, 内存约 {memory_mb:.0f} MB")
+        gc.collect()
+
+        if not results:
+            return "default"
+        fits = [
+            compute_type for compute_type, result in results.items()
+            if self.memory_limit_mb <= 0 or result["memory_mb"] <= self.memory_limit_mb
+        ]
+        if fits:
+            chosen = min(fits, key=lambda compute_type: results[compute_type]["seconds"])
+        else:
+            # 都超出上限时选内存占用最小的
+            chosen = min(results, key=lambda compute_type: results[compute_type]["memory_mb"])
+        logger.info(f"选定计算类型: {key} -> {chosen}")
+
+        with self.lock:
+            self.choices[key] = {"compute_type": chosen, "results": results, "tuned_at": time.time()}
+            self._write()
+        return chosen
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                "memory_limit_mb": self.memory_limit_mb,
+                "choices": {key: choice["compute_type"] for key, choice in self.choices.items()},
+            }
@@ -1,16 +1,207 @@
+import asyncio
+import copy
+import hashlib
+import json
 import os
 import tempfile
-import zipfile
+import threading
 from pathlib import Path
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse, FileResponse
+from typing import Callable, Dict, List, Optional
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from loguru import logger
-from ..dependencies import model_manager
-from ..utils.audio_utils import segments_to_srt, parse_srt, segments_to_srt_string
-from ..config import UPLOAD_DIR
+from ..dependencies import (
+    model_manager, demucs_manager, separation_pool, transcription_pool, transcription_batcher, inference_pool,
+    transcription_cache, separation_cache, analysis_cache, pcm_cache, translation_memory, openai_clients,
+    upload_manager, blob_store, job_manager
+)
+from ..models.inference_pool import InferenceBusyError
+from ..models.demucs_manager import DEMUCS_SAMPLE_RATE
+from ..models.pcm_cache import WHISPER_SAMPLE_RATE, open_pcm
+from ..utils.audio_utils import (
+    parse_srt, segments_to_subtitle_string, encode_audio, AUDIO_OUTPUT_FORMATS, SUBTITLE_FORMATS
+)
+from ..utils.disk_cache import make_cache_key
+from ..utils.response_utils import ranged_file_response, iter_stored_zip
+from ..utils.upload_utils import save_upload_to_temp
+from ..models.translator import SubtitleTranslator
+from .config import get_openai_settings
+from ..config import (
+    MAX_UPLOAD_SIZE_MB, ANALYSIS_BLOCK_SECONDS, ANALYSIS_SILENCE_THRESHOLD_DB,
+    SEPARATION_WINDOW_SECONDS, SEPARATION_OVERLAP_SECONDS, TRANSLATION_CONCURRENCY,
+    TRANSLATION_BATCH_TOKENS, TRANSLATION_BATCH_MAX_SEGMENTS, TRANSLATION_CONTEXT_SEGMENTS, TRANSLATION_MAX_RETRIES
+)
 
 router = APIRouter()
 
+
+def _transcribe_file(audio_path: str, audio_sha256: str, model_name: str, transcribe_options: dict):
+    """在推理线程中加载模型并完成整个解码过程"""
+    # 获取Whisper模型，使用期间不会被驱逐
+    with model_manager.use_model(model_name) as model:
+        if model is None:
+            logger.error(f"模型未找到: {model_name}")
+            raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载或加载失败，请先下载模型")
+
+        # 16kHz单声道PCM从解码缓存读取，同一文件不重复解码
+        with pcm_cache.use(audio_path, audio_sha256, WHISPER_SAMPLE_RATE, 1) as pcm:
+            segments, info = model.transcribe(open_pcm(pcm).reshape(-1), **transcribe_options)
+            return list(segments), info
+
+
+async def _transcribe_batched(
+    audio_path: str, audio_sha256: str, model_name: str, transcribe_options: dict
+) -> Optional[Dict]:
+    """把短音频交给批量转录器，与其他并发请求合并为一次批量推理。
+
+    批量转录已禁用、音频超过批量时长上限或没有可合并的请求时返回 None，由调用方按单个请求转录。
+    """
+    if not transcription_batcher.enabled:
+        return None
+    pcm = await run_in_threadpool(pcm_cache.acquire, audio_path, audio_sha256, WHISPER_SAMPLE_RATE, 1)
+    try:
+        if not transcription_batcher.accepts(pcm):
+            return None
+        batch_result = await transcription_batcher.transcribe(model_name, pcm, transcribe_options)
+    finally:
+        pcm_cache.release(pcm)
+    if batch_result is None:
+        return None
+    logger.info(f"转录完成 (批量): 检测语言: {batch_result['language']}, 段落数: {len(batch_result['segments'])}")
+    return {
+        "text": "".join(segment["text"] for segment in batch_result["segments"]),
+        "language": batch_result["language"],
+        "segments": batch_result["segments"],
+    }
+
+
+def transcribe_long_form(
+    audio_path: str,
+    audio_sha256: Optional[str],
+    model_name: str,
+    transcribe_options: dict,
+    segment_callback: Optional[Callable[[List[Dict]], None]] = None,
+    progress_callback: Optional[Callable[[float, float], None]] = None,
+) -> Dict:
+    """长音频模式: 按静音切分，只转录语音部分，仅有CPU时各块分发到多个进程并行转录。
+
+    返回与普通转录相同格式的结果 {"text", "language", "segments"}，时间戳为在整个文件中的时间。
+    """
+    with pcm_cache.use(audio_path, audio_sha256, WHISPER_SAMPLE_RATE, 1) as pcm:
+        if transcription_pool.enabled and model_manager.get_model_device(model_name) == "cpu":
+            if not model_manager.is_model_downloaded(model_name):
+                raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载，请先下载模型")
+            # 工作进程使用与本进程相同的运行配置和自动选择的计算类型
+            worker = model_manager.get_worker_settings(model_name, transcription_pool.threads_per_worker)
+            result = transcription_pool.transcribe(
+                model_name, pcm, transcribe_options,
+                model_settings=worker["settings"], model_memory_mb=worker["memory_mb"],
+                segment_callback=segment_callback, progress_callback=progress_callback
+            )
+        else:
+            # GPU上使用共享的模型，按顺序转录各块
+            with model_manager.use_model(model_name) as model:
+                if model is None:
+                    raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载或加载失败，请先下载模型")
+                result = transcription_pool.transcribe(
+                    model_name, pcm, transcribe_options, local_model=model,
+                    segment_callback=segment_callback, progress_callback=progress_callback
+                )
+    logger.info(
+        f"长音频转录完成: {len(result['segments'])} 段, {result['chunk_count']} 块, "
+        f"语音 {result['speech_seconds']:.0f} 秒"
+    )
+    return {
+        "text": "".join(segment["text"] for segment in result["segments"]),
+        "language": result["language"],
+        "segments": result["segments"],
+    }
+
+
+def _stream_segments(
+    audio_path: str, audio_sha256: str, model_name: str, transcribe_options: dict, emit, stop: threading.Event
+):
+    """在推理线程中逐段解码，每解码出一段立即通过 emit 发送"""
+    with model_manager.use_model(model_name) as model:
+        if model is None:
+            raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载或加载失败，请先下载模型")
+
+        with pcm_cache.use(audio_path, audio_sha256, WHISPER_SAMPLE_RATE, 1) as pcm:
+            segments, info = model.transcribe(open_pcm(pcm).reshape(-1), **transcribe_options)
+            emit({"type": "info", "language": info.language, "duration": info.duration})
+            count = 0
+            for segment in segments:
+                if stop.is_set():
+                    logger.info(f"客户端已断开，停止流式转录: {audio_path}")
+                    return
+                emit({
+                    "type": "segment",
+                    "index": count,
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": segment.text
+                })
+                count += 1
+            emit({"type": "done", "language": info.language, "segment_count": count})
+
+
+def _start_segment_stream(audio_path: str, audio_sha256: str, model_name: str, language: str = None):
+    """提交流式转录任务，返回事件生成器。
+
+    准入检查在返回前完成，队列已满时立即抛出 HTTPException (429/503)。
+    生成器结束或被关闭 (客户端断开) 时会停止解码并删除音频文件。
+    """
+    transcribe_options = {}
+    if language:
+        transcribe_options["language"] = language
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def emit(event: dict):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def cleanup(_task):
+        if os.path.exists(audio_path):
+            os.unlink(audio_path)
+            logger.debug(f"清理临时文件: {audio_path}")
+
+    try:
+        task = inference_pool.submit(
+            model_name, _stream_segments, audio_path, audio_sha256, model_name, transcribe_options, emit, stop
+        )
+    except InferenceBusyError as e:
+        cleanup(None)
+        logger.warning(f"推理队列已满: {e.message}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.message,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    task.add_done_callback(cleanup)
+    task.add_done_callback(lambda _task: loop.call_soon_threadsafe(events.put_nowait, None))
+
+    async def event_stream():
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            exc = task.exception() if task.done() and not task.cancelled() else None
+            if exc is not None:
+                detail = getattr(exc, "detail", None) or str(exc)
+                logger.error(f"流式转录失败: {detail}")
+                yield {"type": "error", "detail": detail}
+        finally:
+            stop.set()
+
+    return event_stream()
+
+
 @router.post("/api/upload")
 async def upload_audio(file: UploadFile = File(...)):
     """上传音频文件"""
@@ -21,18 +212,17 @@ async def upload_audio(file: UploadFile = File(...)):
             logger.warning(f"文件类型不正确: {file.content_type}")
             raise HTTPException(status_code=400, detail="只支持音频文件")
 
-        # 保存文件
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # 逐块保存到文件仓库，相同内容只保存一份
+        blob = await blob_store.put_upload(file)
 
-        logger.info(f"文件上传成功: {file.filename}, 大小: {len(content)} bytes")
+        logger.info(f"文件上传成功: {file.filename}, 大小: {blob['size']} bytes")
         return {
             "message": "文件上传成功",
-            "filename": file.filename,
-            "size": len(content),
-            "file_path": str(file_path)
+            "filename": blob["filename"],
+            "size": blob["size"],
+            "sha256": blob["sha256"],
+            "blob_id": blob["blob_id"],
+            "deduplicated": blob["deduplicated"]
         }
     except HTTPException:
         raise
@@ -40,30 +230,81 @@ async def upload_audio(file: UploadFile = File(...)):
         logger.error(f"文件上传失败: {file.filename}, 错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"上传失败: {str(e)}")
 
+# /api/process 支持的操作
+PROCESS_OPERATIONS = ("analyze",)
+
+
+def _analyze_file(audio_path: str, audio_sha256: str) -> Dict:
+    """读取元数据并分析解码缓存中原始采样率的PCM。文件无法解码时抛出 ValueError"""
+    from ..utils.analysis_utils import probe_audio, analyze_pcm
+
+    metadata = probe_audio(audio_path)
+    with pcm_cache.use(audio_path, audio_sha256, dtype="int16") as pcm:
+        analysis = analyze_pcm(pcm, ANALYSIS_BLOCK_SECONDS, ANALYSIS_SILENCE_THRESHOLD_DB)
+    # 以实际解码的采样数为准，容器中的时长可能缺失或不准确
+    metadata["duration"] = analysis.pop("duration")
+    return {**metadata, "analysis": analysis}
+
+
 @router.post("/api/process")
-async def process_audio(file: UploadFile = File(...), operation: str = "analyze"):
-    """处理音频文件"""
+async def process_audio(file: UploadFile = File(...), operation: str = Form("analyze")):
+    """处理音频文件。analyze: 解码音频，返回元数据和响度/峰值/静音占比/频谱质心等分析结果"""
     logger.info(f"开始处理音频文件: {file.filename}, 操作: {operation}")
+    if operation not in PROCESS_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"暂不支持的操作: {operation}")
     try:
-        # 这里可以添加实际的音频处理逻辑
-        # 例如：降噪、变调、格式转换等
+        # 流式保存为临时文件，同时计算哈希
+        tmp_file_path, file_size, audio_sha256 = await save_upload_to_temp(file)
+        try:
+            # 相同内容的文件直接返回缓存的分析结果
+            from ..utils.analysis_utils import ANALYSIS_VERSION
 
-        # 读取文件
-        content = await file.read()
+            cache_key = make_cache_key(
+                audio_sha256=audio_sha256,
+                version=ANALYSIS_VERSION,
+                silence_threshold_db=ANALYSIS_SILENCE_THRESHOLD_DB
+            )
+            analysis = analysis_cache.get(cache_key)
+            cached = analysis is not None
+            if cached:
+                logger.info(f"分析缓存命中: {file.filename}")
+            else:
+                try:
+                    # 原始采样率和声道数的PCM与分离共享解码缓存，逐块分析，内存占用与文件大小无关
+                    analysis = await run_in_threadpool(_analyze_file, tmp_file_path, audio_sha256)
+                except ValueError as e:
+                    # 没有音频流、文件损坏或格式不支持
+                    raise HTTPException(status_code=400, detail=str(e))
+                analysis_cache.set(cache_key, analysis)
+        finally:
+            if os.path.exists(tmp_file_path):
+                os.unlink(tmp_file_path)
 
-        # 示例处理结果
+        duration = analysis["duration"] or 0
         result = {
             "message": "音频处理完成",
             "filename": file.filename,
             "operation": operation,
-            "file_size": len(content),
-            "duration": "00:00:00",  # 实际应该从音频文件读取
-            "sample_rate": 44100,  # 实际应该从音频文件读取
-            "channels": 2,  # 实际应该从音频文件读取
+            "file_size": file_size,
+            "duration": f"{int(duration // 3600):02d}:{int(duration % 3600 // 60):02d}:{int(duration % 60):02d}",
+            "duration_seconds": duration,
+            "sample_rate": analysis["sample_rate"],
+            "channels": analysis["channels"],
+            "channel_layout": analysis["channel_layout"],
+            "format": analysis["format"],
+            "codec": analysis["codec"],
+            "bit_rate": analysis["bit_rate"],
+            "analysis": analysis["analysis"],
+            "cached": cached,
         }
 
-        logger.info(f"音频处理完成: {file.filename}, 操作: {operation}")
+        logger.info(
+            f"音频处理完成: {file.filename}, 操作: {operation}, 时长: {duration:.1f} 秒, "
+            f"响度: {analysis['analysis']['integrated_lufs']} LUFS"
+        )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"音频处理失败: {file.filename}, 操作: {operation}, 错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"处理失败: {str(e)}")
@@ -73,72 +314,111 @@ async def transcribe_audio(
     file: UploadFile = File(...),
     model_name: str = Form("base"),
     language: str = Form(None),
-    format: str = Form("json")
+    format: str = Form("json"),
+    long_form: bool = Form(False)
 ):
-    """使用Whisper模型转录音频文件"""
-    logger.info(f"开始转录音频文件: {file.filename}, 模型: {model_name}, 语言: {language}, 格式: {format}")
+    """使用Whisper模型转录音频文件。format 为 json (默认) 或字幕格式 srt / vtt / ass。
+
+    long_form=true 时按静音切分，跳过静音并把各块分发到多个进程并行转录，适合很长且静音较多的音频。
+    """
+    logger.info(
+        f"开始转录音频文件: {file.filename}, 模型: {model_name}, 语言: {language}, 格式: {format}, "
+        f"长音频模式: {long_form}"
+    )
     try:
         # 检查文件类型
         if not file.content_type or not file.content_type.startswith("audio/"):
             logger.warning(f"文件类型不正确: {file.content_type}")
             raise HTTPException(status_code=400, detail="只支持音频文件")
 
-        # 读取文件内容
-        content = await file.read()
-        logger.debug(f"读取音频文件: {file.filename}, 大小: {len(content)} bytes")
-
-        # 创建临时文件保存音频
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        # 流式保存为临时文件，同时计算哈希，临时文件直接交给解码器
+        tmp_file_path, file_size, audio_sha256 = await save_upload_to_temp(file)
+        logger.debug(f"读取音频文件: {file.filename}, 大小: {file_size} bytes")
 
         try:
-            # 获取Whisper模型
-            model = model_manager.get_model(model_name)
-            if model is None:
-                logger.error(f"模型未找到: {model_name}")
-                raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载或加载失败，请先下载模型")
-
             # 转录音频
             transcribe_options = {}
             if language:
                 transcribe_options["language"] = language
 
-            logger.info(f"开始Whisper转录: {file.filename}")
-            segments, info = model.transcribe(tmp_file_path, **transcribe_options)
-            segments = list(segments)
-            logger.info(f"转录完成: {file.filename}, 检测语言: {info.language}, 段落数: {len(segments)}")
+            # 相同音频 + 模型 + 解码参数的结果直接从缓存返回
+            cache_parts = dict(
+                audio_sha256=audio_sha256,
+                model_name=model_name,
+                revision=model_manager.get_model_revision(model_name),
+                options=transcribe_options
+            )
+            if long_form:
+                # 长音频模式的切分方式不同，结果单独缓存
+                cache_parts["long_form"] = True
+            cache_key = make_cache_key(**cache_parts)
+            # 批量管线的解码结果与逐个解码略有不同，单独缓存，可参与批量的请求两种结果都可以使用
+            batched_cache_key = None
+            if not long_form and transcription_batcher.enabled:
+                batched_cache_key = make_cache_key(**cache_parts, decoder="batched")
+            result = await run_in_threadpool(transcription_cache.get, cache_key)
+            if result is None and batched_cache_key is not None:
+                result = await run_in_threadpool(transcription_cache.get, batched_cache_key)
+
+            if result is not None:
+                logger.info(f"转录缓存命中: {file.filename}, 段落数: {len(result['segments'])}")
+            else:
+                logger.info(f"开始Whisper转录: {file.filename}")
+                try:
+                    if long_form:
+                        result = await inference_pool.run(
+                            model_name, transcribe_long_form, tmp_file_path, audio_sha256, model_name,
+                            transcribe_options
+                        )
+                    else:
+                        # 短音频与其他并发请求合并为一批转录
+                        result = await _transcribe_batched(tmp_file_path, audio_sha256, model_name, transcribe_options)
+                        if result is not None:
+                            cache_key = batched_cache_key
+                        else:
+                            segments, info = await inference_pool.run(
+                                model_name, _transcribe_file, tmp_file_path, audio_sha256, model_name,
+                                transcribe_options
+                            )
+                except InferenceBusyError as e:
+                    logger.warning(f"推理队列已满: {e.message}")
+                    raise HTTPException(
+                        status_code=e.status_code,
+                        detail=e.message,
+                        headers={"Retry-After": str(e.retry_after)}
+                    )
 
-            # 转换结果格式以保持兼容性
-            result = {
-                "text": "",
-                "language": info.language,
-                "segments": []
-            }
+                if result is None:
+                    logger.info(f"转录完成: {file.filename}, 检测语言: {info.language}, 段落数: {len(segments)}")
 
-            for segment in segments:
-                result["text"] += segment.text
-                result["segments"].append({
-                    "start": segment.start,
-                    "end": segment.end,
-                    "text": segment.text
-                })
+                    # 转换结果格式以保持兼容性
+                    result = {
+                        "text": "",
+                        "language": info.language,
+                        "segments": []
+                    }
+
+                    for segment in segments:
+                        result["text"] += segment.text
+                        result["segments"].append({
+                            "start": segment.start,
+                            "end": segment.end,
+                            "text": segment.text
+                        })
+
+                await run_in_threadpool(transcription_cache.set, cache_key, result)
 
             # 根据格式返回结果
-            if format.lower() == "srt":
-                srt_content = segments_to_srt(result["segments"])
-                # 创建临时SRT文件
-                srt_filename = Path(file.filename).stem + ".srt"
-                srt_path = UPLOAD_DIR / srt_filename
-                with open(srt_path, "w", encoding="utf-8") as f:
-                    f.write(srt_content)
-
-                logger.info(f"SRT文件生成: {srt_filename}")
-                return FileResponse(
-                    path=srt_path,
-                    filename=srt_filename,
-                    media_type="text/plain",
-                    headers={"Content-Disposition": f"attachment; filename={srt_filename}"}
+            subtitle_format = SUBTITLE_FORMATS.get(format.lower())
+            if subtitle_format is not None:
+                subtitle_content = segments_to_subtitle_string(result["segments"], format.lower())
+                subtitle_filename = Path(file.filename).stem + subtitle_format["suffix"]
+
+                logger.info(f"字幕文件生成: {subtitle_filename}")
+                return Response(
+                    content=subtitle_content,
+                    media_type=subtitle_format["media_type"],
+                    headers={"Content-Disposition": f"attachment; filename={subtitle_filename}"}
                 )
             else:
                 # 返回JSON结果
@@ -164,20 +444,158 @@ async def transcribe_audio(
         raise HTTPException(status_code=500, detail=f"转录失败: {str(e)}")
 
 
+@router.post("/api/transcribe/stream")
+async def transcribe_audio_stream(
+    file: UploadFile = File(...),
+    model_name: str = Form("base"),
+    language: str = Form(None),
+    stream_format: str = Form("ndjson")
+):
+    """流式转录: 每解码出一段字幕立即发送 (NDJSON 或 Server-Sent Events)"""
+    logger.info(f"开始流式转录: {file.filename}, 模型: {model_name}, 语言: {language}, 格式: {stream_format}")
+    if not file.content_type or not file.content_type.startswith("audio/"):
+        logger.warning(f"文件类型不正确: {file.content_type}")
+        raise HTTPException(status_code=400, detail="只支持音频文件")
+
+    tmp_file_path, _, audio_sha256 = await save_upload_to_temp(file)
+    events = _start_segment_stream(tmp_file_path, audio_sha256, model_name, language)
+
+    if stream_format.lower() == "sse":
+        async def sse_stream():
+            async for event in events:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+        return StreamingResponse(
+            sse_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    async def ndjson_stream():
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/api/transcribe/ws")
+async def transcribe_audio_ws(websocket: WebSocket):
+    """WebSocket流式转录。
+
+    协议: 客户端先发送JSON配置 {"model_name", "language", "filename"}，
+    然后以二进制消息发送音频数据，最后发送 {"type": "end"}。
+    服务端逐条推送 info / segment / done / error 事件。
+    """
+    await websocket.accept()
+    tmp_file_path = None
+    try:
+        config = await websocket.receive_json()
+        model_name = config.get("model_name") or "base"
+        language = config.get("language") or None
+        filename = config.get("filename") or "audio"
+        logger.info(f"开始WebSocket流式转录: {filename}, 模型: {model_name}, 语言: {language}")
+
+        max_size = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        received = 0
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename).suffix) as tmp_file:
+            tmp_file_path = tmp_file.name
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect()
+                if message.get("bytes") is not None:
+                    received += len(message["bytes"])
+                    if max_size and received > max_size:
+                        await websocket.send_json({
+                            "type": "error",
+                            "detail": f"文件过大，最大支持 {MAX_UPLOAD_SIZE_MB} MB",
+                            "status_code": 413
+                        })
+                        await websocket.close()
+                        return
+                    digest.update(message["bytes"])
+                    await run_in_threadpool(tmp_file.write, message["bytes"])
+                elif message.get("text") is not None and json.loads(message["text"]).get("type") == "end":
+                    break
+
+        try:
+            events = _start_segment_stream(tmp_file_path, digest.hexdigest(), model_name, language)
+        except HTTPException as e:
+            await websocket.send_json({
+                "type": "error",
+                "detail": e.detail,
+                "status_code": e.status_code,
+                "retry_after": (e.headers or {}).get("Retry-After")
+            })
+            await websocket.close()
+            return
+        # 临时文件由流式任务负责清理
+        tmp_file_path = None
+
+        try:
+            async for event in events:
+                await websocket.send_json(event)
+        finally:
+            await events.aclose()
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("WebSocket客户端已断开")
+    except Exception as e:
+        logger.error(f"WebSocket流式转录失败: {str(e)}")
+        try:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close()
+        except Exception:
+            pass
+    finally:
+        if tmp_file_path and os.path.exists(tmp_file_path):
+            os.unlink(tmp_file_path)
+
+
+def create_subtitle_translator(client, settings: dict) -> SubtitleTranslator:
+    """按配置创建字幕翻译器: 先查询翻译记忆，其余字幕打包为批次并发翻译"""
+    return SubtitleTranslator(
+        client,
+        model=settings["model"],
+        temperature=settings["temperature"],
+        max_tokens=settings["max_tokens"],
+        concurrency=TRANSLATION_CONCURRENCY,
+        batch_token_budget=TRANSLATION_BATCH_TOKENS,
+        max_batch_segments=TRANSLATION_BATCH_MAX_SEGMENTS,
+        context_segments=TRANSLATION_CONTEXT_SEGMENTS,
+        max_retries=TRANSLATION_MAX_RETRIES,
+        memory=translation_memory,
+    )
+
+
 @router.post("/api/translate-srt")
 async def translate_srt(
     file: UploadFile = File(...),
     target_language: str = Form("en"),
     source_language: str = Form(None),
+    background: bool = Form(False),
+    output_format: str = Form("srt"),
 ):
-    """使用LLM翻译SRT字幕文件"""
-    logger.info(f"开始翻译SRT文件: {file.filename}, 目标语言: {target_language}, 源语言: {source_language}")
+    """使用LLM翻译SRT字幕文件，输出为 srt / vtt / ass。background=true 时提交为后台任务，立即返回任务ID，
+    译文可通过 /api/jobs/{job_id}/events 按批次流式获取"""
+    logger.info(
+        f"开始翻译SRT文件: {file.filename}, 目标语言: {target_language}, 源语言: {source_language}, "
+        f"后台任务: {background}"
+    )
     
     try:
         # 检查文件类型
         if not file.filename.endswith('.srt'):
             logger.warning(f"文件类型不正确: {file.filename}")
             raise HTTPException(status_code=400, detail="只支持SRT文件")
+        output_format = output_format.lower()
+        if output_format not in SUBTITLE_FORMATS:
+            raise HTTPException(status_code=400, detail=f"不支持的字幕格式: {output_format}")
         
         # 读取SRT文件内容
         content = await file.read()
@@ -192,84 +610,54 @@ async def translate_srt(
             raise HTTPException(status_code=400, detail="SRT文件为空或格式不正确")
         
         # 检查OpenAI API密钥 - 优先使用配置文件
-        from ..routers.config import load_config
-        config = load_config()
-        api_key = config.get("openai_api_key") or os.getenv("OPENAI_API_KEY", "")
-        model = config.get("openai_model") or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
-        base_url = config.get("openai_base_url") or None
-        temperature = config.get("openai_temperature", 0.3)
-        max_tokens = config.get("openai_max_tokens", 500)
-        
-        if not api_key:
+        settings = get_openai_settings()
+        if not settings["api_key"]:
             logger.error("OpenAI API密钥未配置")
             raise HTTPException(
                 status_code=500,
                 detail="OpenAI API密钥未配置，请在配置页面设置 API 密钥"
             )
+
+        if background:
+            # 原始字幕作为任务输入单独保存，API密钥在执行时再读取，不写入任务记录
+            job = job_manager.submit("translate", {
+                "filename": file.filename,
+                "target_language": target_language,
+                "source_language": source_language,
+                "segment_count": len(segments)
+            }, inputs=segments)
+            return {
+                "message": "翻译任务已提交",
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "segment_count": len(segments)
+            }
         
         # 使用OpenAI翻译
         try:
-            from openai import OpenAI
-            client_kwargs = {"api_key": api_key}
-            if base_url:
-                client_kwargs["base_url"] = base_url
-            client = OpenAI(**client_kwargs)
-            
-            # 翻译所有字幕段
-            translated_segments = []
-            for i, segment in enumerate(segments, 1):
-                text = segment['text'].strip()
-                if not text:
-                    translated_segments.append(segment)
-                    continue
-                
-                # 构建翻译提示
-                source_lang_text = f" from {source_language}" if source_language else ""
-                prompt = f"Translate the following subtitle text{source_lang_text} to {target_language}. Only return the translated text, do not add any explanations or notes:\n\n{text}"
-                
-                logger.debug(f"翻译字幕段 {i}/{len(segments)}: {text[:50]}...")
-                
-                try:
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {"role": "system", "content": "You are a professional translator. Translate subtitle text accurately while preserving the meaning and style."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    )
-                    
-                    translated_text = response.choices[0].message.content.strip()
-                    translated_segments.append({
-                        'start': segment['start'],
-                        'end': segment['end'],
-                        'text': translated_text
-                    })
-                    
-                    logger.debug(f"翻译完成: {text[:30]}... -> {translated_text[:30]}...")
-                    
-                except Exception as e:
-                    logger.error(f"翻译字幕段失败: {i}, 错误: {str(e)}")
-                    # 如果翻译失败，保留原文
-                    translated_segments.append(segment)
-            
-            # 转换为SRT格式
-            translated_srt = segments_to_srt_string(translated_segments)
+            # 复用长期存在的客户端，保持连接池和TLS会话
+            client = openai_clients.get_client(settings["api_key"], settings["base_url"])
+            translator = create_subtitle_translator(client, settings)
+
+            async def report(done: int, total: int):
+                logger.debug(f"翻译进度: {done}/{total}")
+
+            translated_segments = await translator.translate(
+                segments, target_language, source_language, progress_callback=report
+            )
             
-            # 保存翻译后的SRT文件
-            srt_filename = Path(file.filename).stem + f"_translated_{target_language}.srt"
-            srt_path = UPLOAD_DIR / srt_filename
-            with open(srt_path, "w", encoding="utf-8") as f:
-                f.write(translated_srt)
+            # 转换为目标字幕格式
+            translated_content = segments_to_subtitle_string(translated_segments, output_format)
             
-            logger.info(f"SRT翻译完成: {file.filename} -> {srt_filename}")
+            subtitle_filename = (
+                Path(file.filename).stem + f"_translated_{target_language}" + SUBTITLE_FORMATS[output_format]["suffix"]
+            )
+            logger.info(f"SRT翻译完成: {file.filename} -> {subtitle_filename}")
             
-            return FileResponse(
-                path=srt_path,
-                filename=srt_filename,
-                media_type="text/plain",
-                headers={"Content-Disposition": f"attachment; filename={srt_filename}"}
+            return Response(
+                content=translated_content,
+                media_type=SUBTITLE_FORMATS[output_format]["media_type"],
+                headers={"Content-Disposition": f"attachment; filename={subtitle_filename}"}
             )
             
         except ImportError:
@@ -292,225 +680,275 @@ async def translate_srt(
         raise HTTPException(status_code=500, detail=f"翻译失败: {str(e)}")
 
 
+def _separate_file(
+    model_name: str, pcm: Dict, output_dir: Path, filename: str, stereo: bool = True
+) -> Dict[str, Path]:
+    """使用缓存的Demucs模型按窗口分离解码缓存中的PCM，轨道逐窗口写入 output_dir"""
+    from ..utils.separation_utils import separate_to_files
+
+    device = demucs_manager.get_device()
+    logger.info(f"使用设备: {device}")
+
+    def report(processed: float, total: Optional[float]):
+        if total:
+            logger.info(f"分离进度: {filename} {processed:.0f}/{total:.0f} 秒 ({processed / total:.0%})")
+
+    # 从模型缓存获取模型 (首次使用时加载)，使用期间不会被驱逐
+    with demucs_manager.use_model(model_name) as demucs_model:
+        logger.info(f"开始分离音频: {filename}")
+        try:
+            return separate_to_files(
+                demucs_model, pcm, output_dir, device,
+                SEPARATION_WINDOW_SECONDS, SEPARATION_OVERLAP_SECONDS, report, stereo=stereo
+            )
+        except Exception as e:
+            logger.error(f"分离音频失败: {str(e)}")
+            # 如果CUDA失败，尝试CPU
+            if device != "cuda":
+                raise HTTPException(status_code=500, detail=f"音频分离失败: {str(e)}")
+
+        logger.info("CUDA分离失败，尝试使用CPU进行分离")
+        try:
+            # 缓存的模型可能正被其他请求使用，复制一份到CPU
+            cpu_model = copy.deepcopy(demucs_model).cpu()
+            return separate_to_files(
+                cpu_model, pcm, output_dir, "cpu",
+                SEPARATION_WINDOW_SECONDS, SEPARATION_OVERLAP_SECONDS, report, stereo=stereo
+            )
+        except Exception as e2:
+            logger.error(f"CPU分离也失败: {str(e2)}")
+            raise HTTPException(status_code=500, detail=f"音频分离失败: {str(e2)}")
+
+
+def _acquire_cached_stems(cache_key: str) -> Optional[Dict[str, Dict]]:
+    """从缓存中取出已分离的各轨道并标记为使用中，任一轨道文件已被清理时视为未命中"""
+    cached = separation_cache.get(cache_key)
+    if not cached:
+        return None
+    stem_blobs = {}
+    try:
+        for stem_name, blob_id in cached.items():
+            stem_blobs[stem_name] = blob_store.acquire(blob_id)
+    except HTTPException:
+        for blob in stem_blobs.values():
+            blob_store.release(blob)
+        return None
+    return stem_blobs
+
+
+def _acquire_encoded_stem(stem_blob: Dict, output_format: str, work_dir: str) -> Dict:
+    """将WAV轨道编码为指定格式并存入文件仓库，按 (轨道哈希, 格式) 缓存"""
+    cache_key = make_cache_key(stem_sha256=stem_blob["sha256"], format=output_format)
+    cached = separation_cache.get(cache_key)
+    if cached:
+        try:
+            return blob_store.acquire(cached["blob_id"])
+        except HTTPException:
+            pass
+
+    encoded_filename = Path(stem_blob["filename"]).stem + AUDIO_OUTPUT_FORMATS[output_format]["suffix"]
+    encoded_path = Path(work_dir) / f"{stem_blob['sha256'][:12]}_{encoded_filename}"
+    logger.info(f"编码轨道: {stem_blob['filename']} -> {output_format}")
+    encode_audio(Path(stem_blob["file_path"]), encoded_path, output_format)
+    stored = blob_store.put_file(encoded_path, encoded_filename, kind="stem", acquire=True)
+    separation_cache.set(cache_key, {"blob_id": stored["blob_id"]})
+    return stored
+
+
+def _release_blobs(blobs: List[Dict]):
+    for blob in blobs:
+        blob_store.release(blob)
+
+
 @router.post("/api/separate-voice")
 async def separate_voice(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    upload_id: str = Form(None),
     model: str = Form("htdemucs"),
-    stems: str = Form("vocals,drums,bass,other")
+    stems: str = Form("vocals,drums,bass,other"),
+    channels: str = Form("stereo"),
+    format: str = Form("wav")
 ):
-    """使用Demucs分离音频中的声音和伴奏"""
-    logger.info(f"开始分离音频: {file.filename}, 模型: {model}, 分离轨道: {stems}")
+    """使用Demucs分离音频中的声音和伴奏。音频可以直接上传，也可以引用已完成的分块上传 (upload_id)。
+
+    channels: stereo 保留原始立体声，mono 混合为单声道后分离并输出单声道轨道。
+    format: 轨道输出格式 wav/flac/opus。单个轨道直接返回 (支持Range请求)，多个轨道流式打包为ZIP。
+    分离结果按 (音频哈希, 模型, 声道模式) 缓存，只改变请求的轨道时直接命中缓存。
+    """
+    filename = file.filename if file else upload_id
+    logger.info(f"开始分离音频: {filename}, 模型: {model}, 分离轨道: {stems}, 声道: {channels}")
+    if channels not in ("stereo", "mono"):
+        raise HTTPException(status_code=400, detail="channels 只支持 stereo 或 mono")
+    stereo = channels == "stereo"
+    output_format = format.lower()
+    if output_format not in AUDIO_OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {format}")
+    stem_blobs: Dict[str, Dict] = {}
+    held_blobs: List[Dict] = []
     try:
-        # 检查文件类型
-        if not file.content_type or not file.content_type.startswith("audio/"):
-            logger.warning(f"文件类型不正确: {file.content_type}")
-            raise HTTPException(status_code=400, detail="只支持音频文件")
-
-        # 读取文件内容
-        content = await file.read()
-        logger.debug(f"读取音频文件: {file.filename}, 大小: {len(content)} bytes")
-
-        # 创建临时文件保存音频
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        source_blob = None
+        if upload_id:
+            # 分离期间保护文件不被清理线程删除
+            source_blob = blob_store.acquire(upload_manager.resolve_blob_id(upload_id))
+            tmp_file_path = source_blob["file_path"]
+            filename = source_blob["filename"]
+            audio_sha256 = source_blob["sha256"]
+        elif file is not None:
+            # 检查文件类型
+            if not file.content_type or not file.content_type.startswith("audio/"):
+                logger.warning(f"文件类型不正确: {file.content_type}")
+                raise HTTPException(status_code=400, detail="只支持音频文件")
+
+            # 流式保存为临时文件
+            tmp_file_path, file_size, audio_sha256 = await save_upload_to_temp(file)
+            logger.debug(f"读取音频文件: {filename}, 大小: {file_size} bytes")
+        else:
+            raise HTTPException(status_code=400, detail="请上传音频文件或提供 upload_id")
+        output_dir = None
 
         try:
-            # 导入Demucs
-            try:
-                from demucs.pretrained import get_model
-                from demucs.apply import apply_model
-                import torch
-                import torchaudio
-            except ImportError as e:
-                logger.error(f"Demucs库未正确安装: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail="Demucs库未正确安装，请运行: pip install demucs"
-                )
-
+            # 缓存键: 音频内容、模型、声道模式、输入采样率和窗口参数 (请求的轨道子集不影响分离结果)
+            cache_key = make_cache_key(
+                audio_sha256=audio_sha256,
+                model=model,
+                channels=channels,
+                sample_rate=DEMUCS_SAMPLE_RATE,
+                window_seconds=SEPARATION_WINDOW_SECONDS,
+                overlap_seconds=SEPARATION_OVERLAP_SECONDS,
+            )
             # 创建输出目录
             output_dir = tempfile.mkdtemp()
             logger.info(f"创建输出目录: {output_dir}")
 
-            # 检测设备
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"使用设备: {device}")
-
-            # 加载模型
-            logger.info(f"加载Demucs模型: {model}")
-            try:
-                demucs_model = get_model(model)
-                demucs_model.to(device)
-                demucs_model.eval()
-            except Exception as e:
-                logger.error(f"加载模型失败: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"加载模型失败: {str(e)}。请确保模型已下载。"
-                )
-
-            # 加载音频文件
-            logger.info(f"加载音频文件: {tmp_file_path}")
-            try:
-                wav, sr = torchaudio.load(tmp_file_path)
-                # 转换为单声道（如果需要）
-                if wav.shape[0] > 1:
-                    wav = torch.mean(wav, dim=0, keepdim=True)
-                # 转换为模型期望的格式
-                wav = wav.unsqueeze(0)  # 添加batch维度
-            except Exception as e:
-                logger.error(f"加载音频文件失败: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"加载音频文件失败: {str(e)}"
-                )
+            cached_stems = await run_in_threadpool(_acquire_cached_stems, cache_key)
+            if cached_stems is not None:
+                logger.info(f"分离结果命中缓存: {filename}, 模型: {model}")
+                stem_blobs = cached_stems
+            else:
+                # 导入Demucs
+                try:
+                    import demucs.apply  # noqa: F401
+                except ImportError as e:
+                    logger.error(f"Demucs库未正确安装: {str(e)}")
+                    raise HTTPException(
+                        status_code=500,
+                        detail="Demucs库未正确安装，请运行: pip install demucs"
+                    )
 
-            # 分离音频
-            logger.info(f"开始分离音频: {file.filename}")
-            try:
-                with torch.no_grad():
-                    sources = apply_model(demucs_model, wav.to(device), device=device)
-                # sources shape: [batch, sources, channels, samples]
-                sources = sources[0].cpu()  # 移除batch维度
-                
-                # Demucs默认输出: [drums, bass, other, vocals]
-                stem_names = ["drums", "bass", "other", "vocals"]
-                
-                # 保存分离后的文件
-                model_output_dir = Path(output_dir) / model / Path(file.filename).stem
-                model_output_dir.mkdir(parents=True, exist_ok=True)
-                
-                for i, stem_name in enumerate(stem_names):
-                    if i < sources.shape[0]:
-                        stem_audio = sources[i]
-                        # 转换为立体声（如果需要）
-                        if stem_audio.shape[0] == 1:
-                            stem_audio = stem_audio.repeat(2, 1)
-                        
-                        output_path = model_output_dir / f"{stem_name}.wav"
-                        torchaudio.save(str(output_path), stem_audio, sr)
-                        logger.debug(f"保存轨道: {stem_name} -> {output_path}")
-                
-            except Exception as e:
-                logger.error(f"分离音频失败: {str(e)}")
-                # 如果CUDA失败，尝试CPU
-                if device == "cuda":
-                    logger.info("CUDA分离失败，尝试使用CPU进行分离")
-                    try:
-                        demucs_model = demucs_model.cpu()
-                        with torch.no_grad():
-                            sources = apply_model(demucs_model, wav, device="cpu")
-                        sources = sources[0]
-                        
-                        stem_names = ["drums", "bass", "other", "vocals"]
-                        model_output_dir = Path(output_dir) / model / Path(file.filename).stem
-                        model_output_dir.mkdir(parents=True, exist_ok=True)
-                        
-                        for i, stem_name in enumerate(stem_names):
-                            if i < sources.shape[0]:
-                                stem_audio = sources[i]
-                                if stem_audio.shape[0] == 1:
-                                    stem_audio = stem_audio.repeat(2, 1)
-                                output_path = model_output_dir / f"{stem_name}.wav"
-                                torchaudio.save(str(output_path), stem_audio, sr)
-                    except Exception as e2:
-                        logger.error(f"CPU分离也失败: {str(e2)}")
-                        raise HTTPException(
-                            status_code=500,
-                            detail=f"音频分离失败: {str(e2)}"
+                # 解码为模型采样率的PCM (与分析共享解码缓存)，按窗口从内存映射读取和分离，内存占用与音频长度无关
+                # 多于两个声道的音频 (如5.1) 解码时下混为立体声，避免中置和环绕声道被丢弃
+                try:
+                    pcm = await run_in_threadpool(
+                        pcm_cache.acquire, tmp_file_path, audio_sha256, DEMUCS_SAMPLE_RATE, None, "int16", 2
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                model_output_dir = Path(output_dir) / model / Path(filename).stem
+                try:
+                    if separation_pool.enabled and demucs_manager.get_device() == "cpu":
+                        # 仅有CPU时分段分发到多个进程并行分离
+                        separated = await separation_pool.separate(
+                            model, pcm, model_output_dir,
+                            SEPARATION_WINDOW_SECONDS, SEPARATION_OVERLAP_SECONDS, stereo,
+                            lambda done, total: logger.info(f"分离进度: {filename} {done}/{total} 段"),
+                            model_memory_mb=demucs_manager.estimate_model_memory(model),
                         )
-                else:
+                    else:
+                        # 在线程池中执行，不阻塞事件循环
+                        separated = await run_in_threadpool(
+                            _separate_file, model, pcm, model_output_dir, filename, stereo
+                        )
+                finally:
+                    pcm_cache.release(pcm)
+
+                if not separated:
                     raise HTTPException(
                         status_code=500,
-                        detail=f"音频分离失败: {str(e)}"
+                        detail="分离完成但未找到任何输出文件"
                     )
 
-            # 查找分离后的文件
-            # Demucs输出结构: output_dir/model_name/track_name/stem.wav
-            model_output_dir = Path(output_dir) / model / Path(file.filename).stem
-            if not model_output_dir.exists():
-                # 尝试查找其他可能的输出结构
-                model_dirs = list(Path(output_dir).glob("*"))
-                if model_dirs:
-                    model_output_dir = model_dirs[0] / Path(file.filename).stem
-
-            if not model_output_dir.exists():
-                logger.error(f"找不到输出目录: {model_output_dir}")
-                raise HTTPException(
-                    status_code=500,
-                    detail="分离完成但找不到输出文件"
-                )
+                # 各轨道存入文件仓库并记录到缓存
+                for stem_name, stem_path in separated.items():
+                    stem_filename = f"{Path(filename).stem}_{stem_name}.wav"
+                    stem_blobs[stem_name] = await run_in_threadpool(
+                        blob_store.put_file, stem_path, stem_filename, "stem", acquire=True
+                    )
+                separation_cache.set(cache_key, {name: blob["blob_id"] for name, blob in stem_blobs.items()})
 
-            # 收集分离后的文件
-            stem_files = {}
+            # 收集请求的轨道
             requested_stems = [s.strip() for s in stems.split(",")]
-            
-            for stem_file in model_output_dir.glob("*.wav"):
-                stem_name = stem_file.stem
-                if stem_name in requested_stems or stems == "all":
-                    stem_files[stem_name] = stem_file
+            stem_files = {
+                stem_name: blob for stem_name, blob in stem_blobs.items()
+                if stem_name in requested_stems or stems == "all"
+            }
 
             if not stem_files:
                 logger.warning(f"未找到请求的轨道: {requested_stems}")
                 # 返回所有可用的轨道
-                for stem_file in model_output_dir.glob("*.wav"):
-                    stem_files[stem_file.stem] = stem_file
-
-            if not stem_files:
-                raise HTTPException(
-                    status_code=500,
-                    detail="分离完成但未找到任何输出文件"
-                )
+                stem_files = dict(stem_blobs)
 
             logger.info(f"分离完成，找到 {len(stem_files)} 个轨道: {list(stem_files.keys())}")
 
-            # 如果只有一个文件，直接返回
+            # 按需编码为FLAC/Opus，编码结果同样缓存
+            if output_format != "wav":
+                for stem_name, stem_blob in list(stem_files.items()):
+                    encoded_blob = await run_in_threadpool(_acquire_encoded_stem, stem_blob, output_format, output_dir)
+                    held_blobs.append(encoded_blob)
+                    stem_files[stem_name] = encoded_blob
+
+            # 响应发送完毕后再释放轨道文件
+            release_task = BackgroundTask(_release_blobs, list(stem_blobs.values()) + held_blobs)
+            suffix = AUDIO_OUTPUT_FORMATS[output_format]["suffix"]
+
+            # 如果只有一个文件，直接返回 (支持Range请求)
             if len(stem_files) == 1:
-                stem_name, stem_path = next(iter(stem_files.items()))
-                output_filename = f"{Path(file.filename).stem}_{stem_name}.wav"
-                output_path = UPLOAD_DIR / output_filename
-                
-                # 复制文件到上传目录
-                import shutil
-                shutil.copy2(stem_path, output_path)
-                
+                stem_name, stem_blob = next(iter(stem_files.items()))
+                output_filename = f"{Path(filename).stem}_{stem_name}{suffix}"
+
                 logger.info(f"返回单个文件: {output_filename}")
-                return FileResponse(
-                    path=output_path,
-                    filename=output_filename,
-                    media_type="audio/wav",
-                    headers={"Content-Disposition": f"attachment; filename={output_filename}"}
+                response = ranged_file_response(
+                    stem_blob["file_path"],
+                    output_filename,
+                    AUDIO_OUTPUT_FORMATS[output_format]["media_type"],
+                    range_header=request.headers.get("range"),
+                    background=release_task,
+                    headers={"X-Blob-Id": stem_blob["blob_id"]}
                 )
             else:
-                # 多个文件，打包成ZIP
-                zip_filename = f"{Path(file.filename).stem}_separated.zip"
-                zip_path = UPLOAD_DIR / zip_filename
-                
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                    for stem_name, stem_path in stem_files.items():
-                        output_filename = f"{Path(file.filename).stem}_{stem_name}.wav"
-                        zipf.write(stem_path, output_filename)
-                        logger.debug(f"添加到ZIP: {output_filename}")
+                # 多个文件，直接从轨道文件流式生成不压缩的ZIP
+                zip_filename = f"{Path(filename).stem}_separated.zip"
+                entries = [
+                    (f"{Path(filename).stem}_{stem_name}{suffix}", Path(stem_blob["file_path"]))
+                    for stem_name, stem_blob in stem_files.items()
+                ]
 
                 logger.info(f"返回ZIP文件: {zip_filename}, 包含 {len(stem_files)} 个文件")
-                return FileResponse(
-                    path=zip_path,
-                    filename=zip_filename,
+                response = StreamingResponse(
+                    iter_stored_zip(entries),
                     media_type="application/zip",
-                    headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
+                    headers={"Content-Disposition": f"attachment; filename={zip_filename}"},
+                    background=release_task
                 )
+            stem_blobs = {}
+            held_blobs = []
+            return response
 
         finally:
-            # 清理临时文件
-            if os.path.exists(tmp_file_path):
+            # 出错时释放轨道文件 (成功时由响应的后台任务释放)
+            _release_blobs(list(stem_blobs.values()) + held_blobs)
+
+            # 清理临时文件 (文件仓库中的文件由清理线程管理)
+            if source_blob is not None:
+                blob_store.release(source_blob)
+            elif os.path.exists(tmp_file_path):
                 os.unlink(tmp_file_path)
                 logger.debug(f"清理临时文件: {tmp_file_path}")
             
             # 清理输出目录
             try:
                 import shutil
-                if os.path.exists(output_dir):
+                if output_dir and os.path.exists(output_dir):
                     shutil.rmtree(output_dir)
                     logger.debug(f"清理输出目录: {output_dir}")
             except Exception as e:
@@ -519,5 +957,5 @@ async def separate_voice(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"分离音频失败: {file.filename}, 错误: {str(e)}")
+        logger.error(f"分离音频失败: {filename}, 错误: {str(e)}")
         raise HTTPException(status_code=500, detail=f"分离失败: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+from ..dependencies import transcription_cache, separation_cache, analysis_cache, pcm_cache, translation_memory
+
+router = APIRouter()
+
+# 所有可通过API查看和清理的缓存
+CACHES = {
+    "transcription": transcription_cache,
+    "separation": separation_cache,
+    "analysis": analysis_cache,
+    "pcm": pcm_cache,
+    "translation": translation_memory,
+}
+
+
+@router.get("/api/cache/stats")
+async def get_cache_stats():
+    """获取各缓存的命中/未命中计数和占用空间"""
+    return {"caches": {name: cache.get_stats() for name, cache in CACHES.items()}}
+
+
+@router.delete("/api/cache/{name}")
+async def clear_cache(name: str):
+    """清空指定缓存"""
+    cache = CACHES.get(name)
+    if cache is None:
+        raise HTTPException(status_code=404, detail=f"缓存不存在: {name}")
+    cache.clear()
+    logger.info(f"清空缓存: {name}")
+    return {"message": f"缓存 {name} 已清空"}
@@ -1,27 +1,48 @@
 import json
 import os
+import threading
 from pathlib import Path
+from typing import Dict, Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from loguru import logger
-from ..config import OPENAI_API_KEY, OPENAI_MODEL
+from ..config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL
+from ..dependencies import model_manager
 
 router = APIRouter()
 
 # Config file path (save in backend directory)
 CONFIG_FILE = Path(__file__).parent.parent.parent / "config.json"
 
+class WhisperModelProfile(BaseModel):
+    """Runtime settings used when loading a Whisper model"""
+    device: str = "auto"  # auto / cpu / cuda
+    compute_type: str = "auto"  # auto selects by a background benchmark (default until done), or int8 / float16 / ...
+    cpu_threads: int = 0  # 0 lets CTranslate2 decide
+    num_workers: int = 1
+
 class ConfigModel(BaseModel):
     """Configuration model"""
     whisper_default_model: str = "base"
+    whisper_model_profiles: Optional[Dict[str, WhisperModelProfile]] = None  # keyed by model name
     openai_api_key: str = ""
     openai_model: str = "gpt-3.5-turbo"
     openai_base_url: str = ""  # For custom API endpoints
     openai_temperature: float = 0.3
     openai_max_tokens: int = 500
 
-def load_config() -> dict:
-    """Load configuration from file or return defaults"""
+# Parsed config cached by file mtime, so hot paths don't re-read the file
+_config_cache = {"mtime": None, "config": None}
+_config_lock = threading.Lock()
+
+def _config_mtime():
+    try:
+        return CONFIG_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _read_config() -> dict:
+    """Read configuration from file or return defaults"""
     if CONFIG_FILE.exists():
         try:
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
@@ -35,13 +56,40 @@ def load_config() -> dict:
         logger.info("配置文件不存在，使用默认配置")
         return get_default_config()
 
+def load_config() -> dict:
+    """Load configuration, re-reading the file only when it has changed"""
+    mtime = _config_mtime()
+    with _config_lock:
+        if _config_cache["config"] is None or _config_cache["mtime"] != mtime:
+            _config_cache["config"] = _read_config()
+            _config_cache["mtime"] = mtime
+        return dict(_config_cache["config"])
+
+def get_openai_settings() -> dict:
+    """OpenAI settings for translation, config file first, then environment variables"""
+    config = load_config()
+    return {
+        "api_key": config.get("openai_api_key") or os.getenv("OPENAI_API_KEY", ""),
+        "model": config.get("openai_model") or os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+        "base_url": config.get("openai_base_url") or None,
+        "temperature": config.get("openai_temperature", 0.3),
+        "max_tokens": config.get("openai_max_tokens", 500),
+    }
+
+def get_model_profile(model_name: str) -> dict:
+    """Runtime profile of a Whisper model from the config file, empty when not configured"""
+    return (load_config().get("whisper_model_profiles") or {}).get(model_name) or {}
+
+model_manager.set_profile_provider(get_model_profile)
+
 def get_default_config() -> dict:
     """Get default configuration"""
     return {
         "whisper_default_model": "base",
+        "whisper_model_profiles": {},
         "openai_api_key": OPENAI_API_KEY or "",
         "openai_model": OPENAI_MODEL,
-        "openai_base_url": "",
+        "openai_base_url": OPENAI_BASE_URL,
         "openai_temperature": 0.3,
         "openai_max_tokens": 500
     }
@@ -52,6 +100,9 @@ def save_config(config: dict) -> None:
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
         logger.info(f"保存配置文件: {CONFIG_FILE}")
+        with _config_lock:
+            _config_cache["config"] = dict(config)
+            _config_cache["mtime"] = _config_mtime()
         
         # Update environment variables if needed
         if config.get("openai_api_key"):
@@ -102,6 +153,14 @@ async def update_config(config_data: ConfigModel):
             "openai_temperature": config_data.openai_temperature,
             "openai_max_tokens": config_data.openai_max_tokens
         }
+
+        # Keep existing model profiles if not provided
+        if config_data.whisper_model_profiles is not None:
+            new_config["whisper_model_profiles"] = {
+                name: profile.dict() for name, profile in config_data.whisper_model_profiles.items()
+            }
+        else:
+            new_config["whisper_model_profiles"] = existing_config.get("whisper_model_profiles") or {}
         
         # Only update API key if provided (not empty)
         if config_data.openai_api_key:
@@ -114,6 +173,18 @@ async def update_config(config_data: ConfigModel):
         
         # Save config
         save_config(new_config)
+
+        # Keep the default Whisper model pinned in memory
+        old_default = existing_config.get("whisper_default_model")
+        if old_default and old_default != new_config["whisper_default_model"]:
+            model_manager.unpin_model(old_default)
+        model_manager.pin_model(new_config["whisper_default_model"])
+
+        # Models whose runtime profile changed are reloaded with the new settings on next use
+        old_profiles = existing_config.get("whisper_model_profiles") or {}
+        for name in set(old_profiles) | set(new_config["whisper_model_profiles"]):
+            if old_profiles.get(name) != new_config["whisper_model_profiles"].get(name):
+                model_manager.unload_model(name)
         
         logger.info("配置更新成功")
         return {
@@ -1,5 +1,9 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from loguru import logger
+from ..dependencies import (
+    model_preloader, inference_pool, separation_pool, transcription_pool, transcription_batcher, openai_clients
+)
 from ..utils.system_utils import check_cuda
 
 router = APIRouter()
@@ -12,5 +16,19 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "AudioLab API",
-        "cuda": cuda_info
-    }
\ No newline at end of file
+        "cuda": cuda_info,
+        "inference": inference_pool.get_stats(),
+        "separation": separation_pool.get_stats(),
+        "long_form_transcription": transcription_pool.get_stats(),
+        "transcription_batching": transcription_batcher.get_stats(),
+        "openai_client": openai_clients.get_stats()
+    }
+
+@router.get("/api/ready")
+async def readiness_check():
+    """就绪检查端点: 启动时预加载的模型全部加载并预热完成后返回200，否则返回503"""
+    status = model_preloader.get_status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={"status": "ready" if status["ready"] else "starting", **status}
+    )
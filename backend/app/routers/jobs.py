@@ -0,0 +1,376 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Request
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger
+from ..config import JOB_EVENTS_POLL_SECONDS, TRANSLATION_JOB_WORKERS
+from ..dependencies import model_manager, inference_pool, job_manager, upload_manager, blob_store, openai_clients, pcm_cache
+from ..models.inference_pool import InferenceBusyError
+from ..models.job_manager import JobContext, FINISHED_STATES
+from ..models.pcm_cache import WHISPER_SAMPLE_RATE, open_pcm
+from ..utils.audio_utils import segments_to_subtitle_string, SUBTITLE_FORMATS
+from .audio import create_subtitle_translator, transcribe_long_form
+from .config import get_openai_settings
+
+router = APIRouter()
+
+
+def run_transcription_job(ctx: JobContext) -> dict:
+    """在任务工作线程中执行转录，逐段上报进度和部分结果"""
+    if ctx.params.get("blob_id"):
+        # 文件从提交起已被占用 (见 hold_transcription_job_blob)，不会被清理线程删除
+        blob = blob_store.get(ctx.params["blob_id"])
+        return _transcribe_job_audio(ctx, blob["file_path"], blob["sha256"])
+    return _transcribe_job_audio(ctx, ctx.params["audio_path"])
+
+
+def _run_inference(ctx: JobContext, model_name: str, fn, *args):
+    """通过推理线程池执行，与接口请求共享准入和每个模型的并发限制。队列已满时等待后重试"""
+    while True:
+        try:
+            return inference_pool.run_from_thread(model_name, fn, *args)
+        except InferenceBusyError as e:
+            logger.info(f"推理队列已满，任务 {ctx.job_id} {e.retry_after} 秒后重试")
+            time.sleep(e.retry_after)
+            ctx.check_cancelled()
+
+
+def _transcribe_job_audio(ctx: JobContext, audio_path: str, audio_sha256: str = None) -> dict:
+    params = ctx.params
+    model_name = params["model_name"]
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"音频文件不存在: {audio_path}")
+
+    transcribe_options = {}
+    if params.get("language"):
+        transcribe_options["language"] = params["language"]
+
+    if params.get("long_form"):
+        return _run_inference(
+            ctx, model_name, _transcribe_job_long_form, ctx, audio_path, audio_sha256, transcribe_options
+        )
+    return _run_inference(
+        ctx, model_name, _transcribe_job_file, ctx, audio_path, audio_sha256, transcribe_options
+    )
+
+
+def _transcribe_job_file(ctx: JobContext, audio_path: str, audio_sha256: str, transcribe_options: dict) -> dict:
+    """在推理线程中解码整个文件，逐段上报进度和部分结果"""
+    model_name = ctx.params["model_name"]
+    with model_manager.use_model(model_name) as model:
+        if model is None:
+            raise HTTPException(status_code=400, detail=f"模型 {model_name} 未下载或加载失败，请先下载模型")
+
+        # 16kHz单声道PCM从解码缓存读取，未提供哈希时按文件内容计算
+        with pcm_cache.use(audio_path, audio_sha256, WHISPER_SAMPLE_RATE, 1) as pcm:
+            segments, info = model.transcribe(open_pcm(pcm).reshape(-1), **transcribe_options)
+            ctx.report_progress(0, info.duration)
+
+            text = ""
+            segment_count = 0
+            for segment in segments:
+                text += segment.text
+                segment_count += 1
+                ctx.add_items([{
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": segment.text
+                }])
+                ctx.report_progress(segment.end, info.duration)
+
+    logger.info(f"转录任务完成: {ctx.job_id}, 检测语言: {info.language}, 段落数: {segment_count}")
+    return {
+        "text": text,
+        "language": info.language,
+        "duration": info.duration,
+        "segment_count": segment_count,
+        "model_name": model_name
+    }
+
+
+def _transcribe_job_long_form(ctx: JobContext, audio_path: str, audio_sha256: str, transcribe_options: dict) -> dict:
+    """长音频模式: 各块并行转录，按时间顺序上报每块的字幕段"""
+    model_name = ctx.params["model_name"]
+    duration = 0.0
+
+    def on_progress(done: float, total: float):
+        nonlocal duration
+        duration = total
+        ctx.report_progress(done, total)
+
+    result = transcribe_long_form(
+        audio_path, audio_sha256, model_name, transcribe_options,
+        segment_callback=ctx.add_items, progress_callback=on_progress
+    )
+    logger.info(
+        f"长音频转录任务完成: {ctx.job_id}, 检测语言: {result['language']}, 段落数: {len(result['segments'])}"
+    )
+    return {
+        "text": result["text"],
+        "language": result["language"],
+        "duration": duration,
+        "segment_count": len(result["segments"]),
+        "model_name": model_name
+    }
+
+
+def hold_transcription_job_blob(params: dict):
+    """提交时占用任务的输入文件，排队期间也不会被清理线程按保留时间或配额删除"""
+    if params.get("blob_id"):
+        blob_store.acquire(params["blob_id"])
+
+
+def cleanup_transcription_job(params: dict):
+    """任务结束后释放输入文件 (文件仓库中的文件由清理线程管理)，删除随任务上传的音频文件"""
+    if params.get("blob_id") and params.get("sha256"):
+        blob_store.release({"sha256": params["sha256"]})
+    audio_path = params.get("audio_path")
+    if params.get("owns_audio", True) and audio_path and os.path.exists(audio_path):
+        os.unlink(audio_path)
+        logger.debug(f"清理任务音频文件: {audio_path}")
+
+
+job_manager.register_handler(
+    "transcribe", run_transcription_job, cleanup_transcription_job, hold_transcription_job_blob
+)
+
+
+def run_translation_job(ctx: JobContext) -> dict:
+    """在任务工作线程中翻译字幕，每完成一个批次就保存该批次的译文。
+
+    已完成的译文同时写入翻译记忆，任务中断后重新执行时不会重复请求。
+    """
+    params = ctx.params
+    segments = _translation_job_inputs(ctx.get_inputs(), params)
+    settings = get_openai_settings()
+    if not settings["api_key"]:
+        raise RuntimeError("OpenAI API密钥未配置，请在配置页面设置 API 密钥")
+
+    total = sum(1 for segment in segments if segment["text"].strip())
+    ctx.report_progress(0, total)
+
+    async def translate():
+        # 共享客户端绑定在服务的事件循环上，任务线程使用独立的客户端
+        client = openai_clients.create_client(settings["api_key"], settings["base_url"])
+        translator = create_subtitle_translator(client, settings)
+        done = 0
+
+        async def on_segments(translations: dict):
+            nonlocal done
+            ctx.add_items([
+                {
+                    "index": index,
+                    "start": segments[index]["start"],
+                    "end": segments[index]["end"],
+                    "text": text
+                }
+                for index, text in sorted(translations.items())
+            ])
+            done += len(translations)
+            ctx.report_progress(done, total)
+
+        try:
+            return await translator.translate(
+                segments, params["target_language"], params.get("source_language"),
+                segment_callback=on_segments
+            )
+        finally:
+            await client.close()
+
+    translated_segments = asyncio.run(translate())
+    failed = sum(
+        1 for original, translated in zip(segments, translated_segments)
+        if original["text"].strip() and translated["text"] == original["text"]
+    )
+    logger.info(f"翻译任务完成: {ctx.job_id}, 字幕段数: {len(segments)}, 未翻译: {failed}")
+    return {
+        "segment_count": len(segments),
+        "untranslated_count": failed,
+        "target_language": params["target_language"],
+        "model": settings["model"]
+    }
+
+
+def _translation_job_inputs(inputs, params: dict) -> list:
+    """待翻译的字幕段。早期的任务把字幕段保存在 params 中"""
+    return inputs if inputs is not None else params.get("segments", [])
+
+
+# 翻译任务使用独立的工作线程，不会排在长时间的转录任务之后
+job_manager.register_handler("translate", run_translation_job, workers=TRANSLATION_JOB_WORKERS)
+
+
+@router.post("/api/jobs/transcribe")
+async def create_transcription_job(
+    file: UploadFile = File(None),
+    upload_id: str = Form(None),
+    model_name: str = Form("base"),
+    language: str = Form(None),
+    long_form: bool = Form(False)
+):
+    """提交转录任务，立即返回任务ID。音频可以直接上传，也可以引用已完成的分块上传 (upload_id)。
+
+    long_form=true 时按静音切分并行转录 (见 /api/transcribe)
+    """
+    filename = file.filename if file else upload_id
+    logger.info(f"提交转录任务: {filename}, 模型: {model_name}, 语言: {language}, 长音频模式: {long_form}")
+    try:
+        if upload_id:
+            blob = blob_store.acquire(upload_manager.resolve_blob_id(upload_id))
+        elif file is not None:
+            # 检查文件类型
+            if not file.content_type or not file.content_type.startswith("audio/"):
+                logger.warning(f"文件类型不正确: {file.content_type}")
+                raise HTTPException(status_code=400, detail="只支持音频文件")
+
+            # 存入文件仓库，相同内容的重复提交不会重复占用磁盘
+            blob = await blob_store.put_upload(file, kind="job", acquire=True)
+        else:
+            raise HTTPException(status_code=400, detail="请上传音频文件或提供 upload_id")
+        filename = blob["filename"]
+
+        # 提交前一直持有文件，提交后由任务在排队和执行期间持有，中间不会被清理
+        try:
+            job = job_manager.submit("transcribe", {
+                "blob_id": blob["blob_id"],
+                "sha256": blob["sha256"],
+                "filename": filename,
+                "model_name": model_name,
+                "language": language,
+                "long_form": long_form
+            })
+        finally:
+            blob_store.release(blob)
+        return {
+            "message": "转录任务已提交",
+            "job_id": job["job_id"],
+            "status": job["status"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"提交转录任务失败: {filename}, 错误: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"提交任务失败: {str(e)}")
+
+
+@router.get("/api/jobs")
+async def list_jobs(limit: int = 50, kind: str = None):
+    """获取最近的任务列表"""
+    return {"jobs": job_manager.list_jobs(limit=limit, kind=kind)}
+
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, since: int = 0):
+    """获取任务进度、部分结果和最终结果。since 用于增量获取字幕段"""
+    job = job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    job.pop("params", None)
+    job["segments"] = job_manager.get_items(job_id, since=since)
+    job["next_since"] = since + len(job["segments"])
+    return job
+
+
+def _format_event(event: dict, fmt: str) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    if fmt == "ndjson":
+        return data + "\n"
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+@router.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, since: int = 0, format: str = "sse"):
+    """以SSE (默认) 或NDJSON流式推送任务进度和新产生的结果段，任务结束后发送 done 事件并关闭"""
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format 只支持 sse 或 ndjson")
+    if job_manager.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+
+    async def events():
+        next_since = since
+        last_progress = None
+        while not await request.is_disconnected():
+            job = job_manager.get_job(job_id)
+            if job is None:
+                return
+            # 先读取状态再读取结果段，任务结束时不会漏掉最后一批结果
+            segments = job_manager.get_items(job_id, since=next_since)
+            if segments:
+                next_since += len(segments)
+                yield _format_event({"type": "segments", "segments": segments, "next_since": next_since}, format)
+
+            progress = (job["status"], job["processed"], job["total"])
+            if progress != last_progress:
+                last_progress = progress
+                yield _format_event({
+                    "type": "progress",
+                    "status": job["status"],
+                    "processed": job["processed"],
+                    "total": job["total"],
+                    "progress": job["progress"],
+                    "percent": round(job["progress"] * 100, 1)
+                }, format)
+
+            if job["status"] in FINISHED_STATES:
+                yield _format_event({
+                    "type": "done",
+                    "status": job["status"],
+                    "result": job["result"],
+                    "error": job["error"],
+                    "next_since": next_since
+                }, format)
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _translated_job_segments(job: dict) -> list:
+    """原始字幕与已完成的译文按下标合并，未完成或失败的部分保留原文"""
+    inputs = job_manager.get_inputs(job["job_id"])
+    segments = [dict(segment) for segment in _translation_job_inputs(inputs, job["params"])]
+    for item in job_manager.get_items(job["job_id"]):
+        if 0 <= item["index"] < len(segments):
+            segments[item["index"]]["text"] = item["text"]
+    return segments
+
+
+@router.get("/api/jobs/{job_id}/srt")
+async def get_job_srt(job_id: str, format: str = "srt"):
+    """下载任务已完成部分的字幕，format 为 srt (默认) / vtt / ass (翻译任务中尚未翻译的字幕保留原文)"""
+    subtitle_format = SUBTITLE_FORMATS.get(format.lower())
+    if subtitle_format is None:
+        raise HTTPException(status_code=400, detail=f"不支持的字幕格式: {format}")
+    job = job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    params = job["params"]
+    stem = Path(params.get("filename") or job_id).stem
+    if job["kind"] == "translate":
+        segments = _translated_job_segments(job)
+        stem += f"_translated_{params['target_language']}"
+    else:
+        segments = job_manager.get_items(job_id)
+    subtitle_content = segments_to_subtitle_string(segments, format.lower())
+    subtitle_filename = stem + subtitle_format["suffix"]
+    return Response(
+        content=subtitle_content,
+        media_type=subtitle_format["media_type"],
+        headers={"Content-Disposition": f"attachment; filename={subtitle_filename}"}
+    )
+
+
+@router.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消任务"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+    messages = {"cancelled": "任务已取消", "running": "任务正在取消"}
+    return {"message": messages.get(job["status"], "任务已结束"), "status": job["status"]}
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from loguru import logger
-from ..dependencies import model_manager
+from ..dependencies import model_manager, demucs_manager
 
 router = APIRouter()
 
@@ -11,8 +11,13 @@ async def list_models():
     try:
         models = model_manager.get_available_models()
         logger.info(f"获取模型列表成功，共 {len(models)} 个模型")
+        separation_models = {
+            name: {**info, "status": demucs_manager.get_model_status(name)["status"]}
+            for name, info in demucs_manager.get_available_models().items()
+        }
         return {
             "models": models,
+            "separation_models": separation_models,
             "message": "获取模型列表成功"
         }
     except Exception as e:
@@ -73,4 +78,29 @@ async def delete_model(model_name: str):
         raise
     except Exception as e:
         logger.error(f"删除模型失败: {model_name}, 错误: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"删除模型失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"删除模型失败: {str(e)}")
+
+@router.get("/api/model/resident")
+async def get_resident_models():
+    """获取内存中驻留的模型及其内存占用"""
+    logger.info("获取驻留模型列表")
+    try:
+        resident = model_manager.get_resident_models()
+        resident["separation"] = demucs_manager.get_resident_models()
+        logger.info(f"获取驻留模型成功，共 {len(resident['models'])} 个模型")
+        return resident
+    except Exception as e:
+        logger.error(f"获取驻留模型失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取驻留模型失败: {str(e)}")
+
+@router.get("/api/model/separation/status")
+async def get_separation_model_status(model_name: str):
+    """获取Demucs分离模型的状态"""
+    return demucs_manager.get_model_status(model_name)
+
+@router.delete("/api/model/separation/unload")
+async def unload_separation_model(model_name: str):
+    """从内存中卸载空闲的Demucs模型"""
+    if not demucs_manager.unload_model(model_name):
+        raise HTTPException(status_code=409, detail=f"模型 {model_name} 未加载或正在使用中")
+    return {"message": f"模型 {model_name} 已卸载", "model_name": model_name}
@@ -0,0 +1,111 @@
+import hashlib
+import mimetypes
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from loguru import logger
+from ..dependencies import upload_manager, blob_store
+from ..utils.response_utils import ranged_file_response
+from ..config import MAX_UPLOAD_SIZE_MB
+
+router = APIRouter()
+
+
+class UploadInitModel(BaseModel):
+    """Chunked upload session parameters"""
+    filename: str
+    total_size: int
+    sha256: Optional[str] = None  # 整个文件的SHA-256，完成时校验
+
+
+@router.post("/api/uploads")
+async def init_upload(data: UploadInitModel):
+    """创建分块上传会话"""
+    logger.info(f"创建分块上传: {data.filename}, 大小: {data.total_size} bytes")
+    if MAX_UPLOAD_SIZE_MB and data.total_size > MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"文件过大，最大支持 {MAX_UPLOAD_SIZE_MB} MB")
+    return await run_in_threadpool(upload_manager.create, data.filename, data.total_size, data.sha256)
+
+
+@router.put("/api/uploads/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """写入一个分块。请求体为分块原始数据，可通过 X-Chunk-SHA256 请求头校验分块完整性"""
+    expected = request.headers.get("X-Chunk-SHA256")
+    f, meta = await run_in_threadpool(upload_manager.open_chunk, upload_id, offset)
+    digest = hashlib.sha256()
+    length = 0
+
+    def write_block(block: bytes):
+        digest.update(block)
+        f.write(block)
+
+    try:
+        async for block in request.stream():
+            if not block:
+                continue
+            length += len(block)
+            if offset + length > meta["total_size"]:
+                raise HTTPException(status_code=416, detail="分块超出文件大小")
+            await run_in_threadpool(write_block, block)
+    finally:
+        f.close()
+
+    if expected and expected.lower() != digest.hexdigest():
+        logger.warning(f"分块校验失败: {upload_id}, 偏移: {offset}")
+        raise HTTPException(status_code=422, detail="分块SHA-256校验失败，请重新上传该分块")
+
+    status = await run_in_threadpool(upload_manager.commit_chunk, upload_id, offset, length)
+    logger.debug(f"收到分块: {upload_id}, 偏移: {offset}, 大小: {length} bytes")
+    return status
+
+
+@router.get("/api/uploads/{upload_id}")
+async def get_upload_status(upload_id: str):
+    """查询已收到和缺失的区间，用于断点续传"""
+    return await run_in_threadpool(upload_manager.get_status, upload_id)
+
+
+@router.post("/api/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """完成上传: 校验完整性并生成可用于转录/分离的文件"""
+    logger.info(f"完成分块上传: {upload_id}")
+    return await run_in_threadpool(upload_manager.finalize, upload_id)
+
+
+@router.delete("/api/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """取消上传并删除已上传的数据"""
+    await run_in_threadpool(upload_manager.abort, upload_id)
+    return {"message": "上传已取消", "upload_id": upload_id}
+
+
+@router.get("/api/files/{blob_id}")
+async def download_file(blob_id: str, request: Request):
+    """下载文件仓库中的文件 (上传的音频或生成的结果)，支持Range请求断点续传"""
+    blob = await run_in_threadpool(blob_store.acquire, blob_id)
+    try:
+        media_type = mimetypes.guess_type(blob["filename"])[0] or "application/octet-stream"
+        return ranged_file_response(
+            blob["file_path"],
+            blob["filename"],
+            media_type,
+            range_header=request.headers.get("range"),
+            background=BackgroundTask(blob_store.release, blob)
+        )
+    except BaseException:
+        blob_store.release(blob)
+        raise
+
+
+@router.get("/api/storage/stats")
+async def get_storage_stats():
+    """获取文件仓库的占用和配额"""
+    return await run_in_threadpool(blob_store.get_stats)
+
+
+@router.post("/api/storage/cleanup")
+async def cleanup_storage():
+    """立即执行一次过期文件清理"""
+    return await run_in_threadpool(blob_store.collect_garbage)
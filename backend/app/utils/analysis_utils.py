@@ -0,0 +1,232 @@
+"""Block-wise audio analysis: metadata, peak / RMS / BS.1770 loudness, silence ratio and spectral centroid"""
+import math
+from typing import Dict, Iterator, Optional
+import numpy as np
+
+# 分析算法或输出字段变化时递增，缓存中旧版本的结果不再使用
+ANALYSIS_VERSION = "2"
+
+# 分析帧长 (秒)。BS.1770 的400ms门限块由4个连续帧组成 (75%重叠)
+FRAME_SECONDS = 0.1
+FRAMES_PER_GATING_BLOCK = 4
+
+# BS.1770 门限: 绝对门限 -70 LUFS，相对门限低于未加权平均 10 LU
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# 门限块响度直方图 (-70 ~ +10 LUFS，0.01 LU一档)，内存占用与音频长度无关
+HISTOGRAM_STEP_LU = 0.01
+HISTOGRAM_BINS = 8000
+
+
+def _k_weighting_power(freqs: np.ndarray, sample_rate: int) -> np.ndarray:
+    """K加权滤波器 (高频搁架 + 高通) 在给定频率处的功率响应 |H(f)|²。
+
+    系数按 BS.1770 的模拟原型换算到任意采样率，48kHz时与标准中给出的系数一致。
+    """
+    # 第一级: 高频搁架滤波器
+    k = math.tan(math.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    # 第二级: 高通滤波器
+    k = math.tan(math.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+
+    z = np.exp(-2j * np.pi * freqs / sample_rate)
+    power = np.ones_like(freqs)
+    for b, a in ((shelf_b, shelf_a), (highpass_b, highpass_a)):
+        response = (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+        power *= response.real ** 2 + response.imag ** 2
+    return power
+
+
+def _channel_weights(channels: int) -> np.ndarray:
+    """BS.1770 声道权重: 5.1声道中LFE不计入，两个环绕声道为1.41，其余为1.0"""
+    weights = np.ones(channels)
+    if channels == 6:
+        weights[3] = 0.0
+        weights[4:] = 1.41
+    return weights
+
+
+def _to_db(value: float) -> Optional[float]:
+    """线性幅度转换为 dBFS，值为0时返回 None (JSON中不能表示负无穷)"""
+    if value <= 0:
+        return None
+    return round(20 * math.log10(value), 2)
+
+
+class AudioAnalyzer:
+    """逐块累积音频统计量，内存占用与音频长度无关。
+
+    - 峰值、RMS: 对每块直接向量化计算，精确累积
+    - 响度 (LUFS): 按100ms帧做FFT，在频域施加K加权求各帧能量，
+      每4帧组成一个400ms门限块，门限块响度记入直方图，最后按 BS.1770 的双重门限求积分响度
+    - 静音占比: RMS低于门限的100ms帧所占比例
+    - 频谱质心: 非静音帧的单声道混合频谱质心的平均值
+    """
+
+    def __init__(self, sample_rate: int, channels: int, silence_threshold_db: float = -60.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_size = max(1, round(sample_rate * FRAME_SECONDS))
+        self.silence_threshold = 10 ** (silence_threshold_db / 10)  # 均方值门限
+
+        self.freqs = np.fft.rfftfreq(self.frame_size, 1.0 / sample_rate)
+        # Parseval定理: rfft中除直流和奈奎斯特频率外的频点代表正负两个频率，能量计两次
+        bin_factor = np.full(len(self.freqs), 2.0)
+        bin_factor[0] = 1.0
+        if self.frame_size % 2 == 0:
+            bin_factor[-1] = 1.0
+        self.k_weights = _k_weighting_power(self.freqs, sample_rate) * bin_factor / self.frame_size ** 2
+        self.channel_weights = _channel_weights(channels)
+
+        self.pending = np.zeros((channels, 0), dtype=np.float32)
+        self.total_samples = 0
+        self.sum_squares = np.zeros(channels)
+        self.peaks = np.zeros(channels)
+        self.frame_count = 0
+        self.silent_frames = 0
+        self.centroid_sum = 0.0
+        self.centroid_frames = 0
+        # 上一块末尾不足一个门限块的帧能量，与下一块拼接
+        self.recent_energy = np.zeros(0)
+        self.histogram_counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.histogram_energy = np.zeros(HISTOGRAM_BINS)
+
+    def update(self, block: np.ndarray):
+        """加入一块音频，形状为 (声道数, 采样数) 的float32数组，取值范围 [-1, 1]"""
+        if block.size == 0:
+            return
+        self.total_samples += block.shape[1]
+        self.peaks = np.maximum(self.peaks, np.abs(block).max(axis=1))
+        self.sum_squares += np.einsum("ij,ij->i", block, block, dtype=np.float64)
+
+        samples = np.concatenate([self.pending, block], axis=1) if self.pending.shape[1] else block
+        frame_count = samples.shape[1] // self.frame_size
+        used = frame_count * self.frame_size
+        self.pending = samples[:, used:].copy()
+        if frame_count:
+            self._process_frames(samples[:, :used].reshape(self.channels, frame_count, self.frame_size))
+
+    def _process_frames(self, frames: np.ndarray):
+        """frames 形状为 (声道数, 帧数, 帧长)"""
+        spectrum = np.fft.rfft(frames, axis=-1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+
+        # 每帧K加权均方值，按声道权重求和
+        energy = self.channel_weights @ (power @ self.k_weights)
+
+        # 静音帧: 各声道平均的均方值低于门限
+        mean_square = np.einsum("cfn,cfn->f", frames, frames, dtype=np.float64) / (self.channels * self.frame_size)
+        silent = mean_square < self.silence_threshold
+        self.frame_count += len(silent)
+        self.silent_frames += int(silent.sum())
+
+        # 单声道混合的幅度谱 (FFT是线性的，各声道频谱的平均即混合信号的频谱)
+        magnitude = np.abs(spectrum.mean(axis=0))[~silent]
+        magnitude_sum = magnitude.sum(axis=1)
+        valid = magnitude_sum > 0
+        if valid.any():
+            centroids = (magnitude[valid] @ self.freqs) / magnitude_sum[valid]
+            self.centroid_sum += float(centroids.sum())
+            self.centroid_frames += len(centroids)
+
+        # 400ms门限块能量 = 连续4帧能量的平均 (滑动窗口)
+        energies = np.concatenate([self.recent_energy, energy])
+        self.recent_energy = energies[-(FRAMES_PER_GATING_BLOCK - 1):]
+        if len(energies) < FRAMES_PER_GATING_BLOCK:
+            return
+        cumulative = np.concatenate([[0.0], np.cumsum(energies)])
+        block_energy = (
+            cumulative[FRAMES_PER_GATING_BLOCK:] - cumulative[:-FRAMES_PER_GATING_BLOCK]
+        ) / FRAMES_PER_GATING_BLOCK
+        block_energy = block_energy[block_energy > 0]
+        loudness = -0.691 + 10 * np.log10(block_energy)
+        gated = loudness > ABSOLUTE_GATE_LUFS
+        bins = np.clip(
+            ((loudness[gated] - ABSOLUTE_GATE_LUFS) / HISTOGRAM_STEP_LU).astype(np.int64), 0, HISTOGRAM_BINS - 1
+        )
+        np.add.at(self.histogram_counts, bins, 1)
+        np.add.at(self.histogram_energy, bins, block_energy[gated])
+
+    def _integrated_loudness(self) -> Optional[float]:
+        total = self.histogram_counts.sum()
+        if total == 0:
+            return None
+        relative_gate = -0.691 + 10 * math.log10(self.histogram_energy.sum() / total) + RELATIVE_GATE_LU
+        first_bin = max(0, math.ceil((relative_gate - ABSOLUTE_GATE_LUFS) / HISTOGRAM_STEP_LU))
+        count = self.histogram_counts[first_bin:].sum()
+        if count == 0:
+            return None
+        return round(-0.691 + 10 * math.log10(self.histogram_energy[first_bin:].sum() / count), 2)
+
+    def result(self) -> Dict:
+        samples = max(1, self.total_samples)
+        channel_rms = np.sqrt(self.sum_squares / samples)
+        overall_rms = math.sqrt(float(self.sum_squares.sum()) / (samples * self.channels))
+        return {
+            "duration": round(self.total_samples / self.sample_rate, 3),
+            "peak_dbfs": _to_db(float(self.peaks.max())),
+            "rms_dbfs": _to_db(overall_rms),
+            "integrated_lufs": self._integrated_loudness(),
+            "silence_ratio": round(self.silent_frames / self.frame_count, 4) if self.frame_count else None,
+            "spectral_centroid_hz": (
+                round(self.centroid_sum / self.centroid_frames, 1) if self.centroid_frames else None
+            ),
+            "channel_peak_dbfs": [_to_db(float(value)) for value in self.peaks],
+            "channel_rms_dbfs": [_to_db(float(value)) for value in channel_rms],
+        }
+
+
+def probe_audio(audio_path: str) -> Dict:
+    """读取容器和音频流的元数据，不解码音频。文件无法识别时抛出 ValueError"""
+    import av
+
+    try:
+        with av.open(audio_path) as container:
+            if not container.streams.audio:
+                raise ValueError("文件中没有音频流")
+            stream = container.streams.audio[0]
+            duration = None
+            if stream.duration is not None and stream.time_base is not None:
+                duration = float(stream.duration * stream.time_base)
+            elif container.duration is not None:
+                duration = container.duration / av.time_base
+            return {
+                "format": container.format.name,
+                "codec": stream.codec_context.name,
+                "sample_rate": stream.sample_rate,
+                "channels": len(stream.layout.channels),
+                "channel_layout": stream.layout.name,
+                "bit_rate": container.bit_rate,
+                "duration": duration,
+            }
+    except av.error.FFmpegError as e:
+        raise ValueError(f"无法解码音频文件: {str(e)}")
+
+
+def iter_pcm_blocks(samples: np.ndarray, block_frames: int) -> Iterator[np.ndarray]:
+    """按块读取 (帧数, 声道数) 的PCM数组，逐块返回 (声道数, 采样数) 的float32数组"""
+    from ..models.pcm_cache import pcm_to_float32
+
+    block_frames = max(1, block_frames)
+    for start in range(0, len(samples), block_frames):
+        yield np.ascontiguousarray(pcm_to_float32(samples[start:start + block_frames]).T)
+
+
+def analyze_pcm(pcm: Dict, block_seconds: float = 10.0, silence_threshold_db: float = -60.0) -> Dict:
+    """分析解码缓存中的PCM (见 PcmCache)，逐块读取内存映射，内存占用与音频长度无关"""
+    from ..models.pcm_cache import open_pcm
+
+    analyzer = AudioAnalyzer(pcm["sample_rate"], pcm["channels"], silence_threshold_db)
+    for block in iter_pcm_blocks(open_pcm(pcm), int(block_seconds * pcm["sample_rate"])):
+        analyzer.update(block)
+    return analyzer.result()
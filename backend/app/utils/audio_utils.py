@@ -1,102 +1,301 @@
-def format_timestamp(seconds: float) -> str:
-    """将秒数转换为SRT格式的时间戳 (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    milliseconds = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, TextIO
 
+# 轨道输出格式: 扩展名、MIME类型和ffmpeg编码参数
+AUDIO_OUTPUT_FORMATS = {
+    "wav": {"suffix": ".wav", "media_type": "audio/wav", "codec_args": None},
+    "flac": {"suffix": ".flac", "media_type": "audio/flac", "codec_args": ["-c:a", "flac"]},
+    "opus": {"suffix": ".opus", "media_type": "audio/ogg", "codec_args": ["-c:a", "libopus", "-b:a", "160k"]},
+}
 
-def segments_to_srt(segments) -> str:
-    """将转录段转换为SRT格式"""
-    srt_content = []
-    for i, segment in enumerate(segments, 1):
-        start_time = format_timestamp(segment.start)
-        end_time = format_timestamp(segment.end)
-        text = segment.text.strip()
 
-        srt_entry = f"{i}\n{start_time} --> {end_time}\n{text}\n"
-        srt_content.append(srt_entry)
+# 字幕时间戳: [时:]分:秒[,.毫秒]，SRT使用逗号，WebVTT使用点号
+_TIMESTAMP = r"(?:(\d+):)?(\d{1,2}):(\d{1,2})(?:[,.](\d{1,9}))?"
+_TIMESTAMP_PATTERN = re.compile(r"^\s*" + _TIMESTAMP + r"\s*$")
+# 时间轴行，结束时间之后可能带有WebVTT的cue设置 (如 align:start)，忽略
+_CUE_TIMING_PATTERN = re.compile(r"\s*" + _TIMESTAMP + r"\s*-->\s*" + _TIMESTAMP)
+# 标准格式的字幕块开头: 可选的序号行 + 时间轴行 (HH:MM:SS,mmm --> HH:MM:SS,mmm)
+_SRT_CUE_HEAD_PATTERN = re.compile(
+    r"(?:\d+\n)?(\d+):(\d\d):(\d\d)[,.](\d\d\d) --> (\d+):(\d\d):(\d\d)[,.](\d\d\d)[ \t]*\n"
+)
+# 毫秒部分按位数换算为秒的除数 (超过3位的只取前3位)
+_FRACTION_DIVISORS = (1, 10.0, 100.0, 1000.0)
 
-    return "\n".join(srt_content)
+# ASS文件头和默认样式 (行尾的反斜杠为续行，Format 行实际只有一行)
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+WrapStyle: 0
+ScaledBorderAndShadow: yes
 
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, \
+Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, \
+MarginV, Encoding
+Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,3,1,2,40,40,50,1
 
-def parse_srt(srt_content: str) -> list:
-    """解析SRT文件内容，返回字幕段列表"""
-    lines = srt_content.split('\n')
-    segments = []
-    current_segment = None
-    
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def _timestamp_match_to_seconds(hours, minutes, seconds, fraction) -> float:
+    total = int(minutes) * 60 + int(seconds)
+    if hours:
+        total += int(hours) * 3600
+    if fraction:
+        # 小数部分只取前3位 (毫秒)
+        return total + int(fraction[:3]) / _FRACTION_DIVISORS[min(len(fraction), 3)]
+    return float(total)
+
+
+def _split_milliseconds(seconds: float):
+    total_ms = max(0, round(seconds * 1000))
+    hours, rest = divmod(total_ms, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    secs, milliseconds = divmod(rest, 1000)
+    return hours, minutes, secs, milliseconds
+
+
+def format_timestamp(seconds: float, separator: str = ",") -> str:
+    """将秒数转换为SRT格式的时间戳 (HH:MM:SS,mmm)，separator="." 时为WebVTT格式"""
+    # 按整数毫秒换算，避免浮点取余的误差 (如 1.001 秒)
+    total_ms = round(seconds * 1000) if seconds > 0 else 0
+    secs, milliseconds = divmod(total_ms, 1000)
+    minutes, secs = divmod(secs, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+
+def format_ass_timestamp(seconds: float) -> str:
+    """将秒数转换为ASS格式的时间戳 (H:MM:SS.cc，精确到百分之一秒)"""
+    hours, minutes, secs, milliseconds = _split_milliseconds(seconds)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{milliseconds // 10:02d}"
+
+
+def srt_time_to_seconds(time_str: str) -> float:
+    """将SRT时间格式 (HH:MM:SS,mmm) 转换为秒数，也支持点号分隔的毫秒和省略小时的WebVTT格式"""
+    match = _TIMESTAMP_PATTERN.match(time_str)
+    if not match:
+        raise ValueError(f"无效的时间戳: {time_str}")
+    return _timestamp_match_to_seconds(*match.groups())
+
+
+def _cue_from_lines(groups, text_lines: List[str]) -> Dict:
+    return {
+        "start": _timestamp_match_to_seconds(*groups[:4]),
+        "end": _timestamp_match_to_seconds(*groups[4:]),
+        "text": "\n".join(text_lines),
+    }
+
+
+def iter_srt(lines: Iterable[str]) -> Iterator[Dict]:
+    """逐行解析SRT字幕，每解析完一条字幕立即返回 {"start", "end", "text"}。
+
+    lines 可以是打开的文本文件等任意按行迭代的对象，不需要一次读入整个文件。
+    兼容UTF-8 BOM和CRLF换行；多行字幕保留换行；序号行可以缺失；
+    WebVTT文件的文件头、注释和cue设置会被忽略，因此也可以解析WebVTT。
+    """
+    groups = None
+    text_lines: List[str] = []
+    match_timing = _CUE_TIMING_PATTERN.match
+    first = True
     for line in lines:
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
         line = line.strip()
-        
-        # 空行表示一个字幕段结束
         if not line:
-            if current_segment:
-                segments.append(current_segment)
-                current_segment = None
+            # 空行表示一条字幕结束
+            if groups is not None:
+                yield _cue_from_lines(groups, text_lines)
+                groups = None
             continue
-        
-        # 检查是否是时间戳行 (包含 -->)
-        if '-->' in line:
-            parts = line.split('-->')
-            if len(parts) == 2:
-                start_str = parts[0].strip()
-                end_str = parts[1].strip()
-                current_segment = {
-                    'start': srt_time_to_seconds(start_str),
-                    'end': srt_time_to_seconds(end_str),
-                    'text': ''
-                }
-        # 如果是数字（序号），跳过
-        elif line.isdigit():
+
+        match = match_timing(line) if "-->" in line else None
+        if match:
+            if groups is not None:
+                # 字幕之间缺少空行: 紧挨时间轴行的数字是下一条的序号
+                if text_lines and text_lines[-1].isdigit():
+                    text_lines.pop()
+                yield _cue_from_lines(groups, text_lines)
+            groups = match.groups()
+            text_lines = []
+        elif groups is not None:
+            text_lines.append(line)
+        # 时间轴行之前的内容 (序号、WEBVTT文件头等) 忽略
+
+    # 最后一条字幕之后可能没有空行
+    if groups is not None:
+        yield _cue_from_lines(groups, text_lines)
+
+
+def _iter_srt_block(block: str, match_timing) -> Iterator[Dict]:
+    """解析非标准格式的字幕块"""
+    arrow = block.find("-->")
+    if arrow == -1:
+        # 文件头、注释或空块
+        if block.strip():
+            yield from iter_srt(block.split("\n"))
+        return
+    line_start = block.rfind("\n", 0, arrow) + 1
+    line_end = block.find("\n", arrow)
+    if line_end == -1:
+        line_end = len(block)
+    match = match_timing(block, line_start, line_end)
+    text = block[line_end + 1:].strip()
+    if match is None or "-->" in text or (line_start and not block[:line_start - 1].strip().isdigit()):
+        # 缺少空行、时间轴无效或时间轴前有多余内容，逐行解析
+        yield from iter_srt(block.split("\n"))
+        return
+    if "\n" in text:
+        text_lines = [line.strip() for line in text.split("\n")]
+        if "" in text_lines:
+            # 只含空白字符的行同样表示字幕结束
+            yield from iter_srt(block.split("\n"))
+            return
+        text = "\n".join(text_lines)
+    groups = match.groups()
+    yield {
+        "start": _timestamp_match_to_seconds(*groups[:4]),
+        "end": _timestamp_match_to_seconds(*groups[4:]),
+        "text": text,
+    }
+
+
+def iter_srt_string(srt_content: str) -> Iterator[Dict]:
+    """从完整的字符串解析SRT字幕，结果与 iter_srt 相同。
+
+    先按空行切分为字幕块 (在C代码中完成)，标准格式的块用一次正则匹配取出序号和时间轴并直接换算，
+    其他格式 (WebVTT、缺少空行、毫秒位数不同等) 的块交给通用的解析逻辑。
+    """
+    content = srt_content.lstrip("\ufeff")
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    match_head = _SRT_CUE_HEAD_PATTERN.match
+    match_timing = _CUE_TIMING_PATTERN.match
+    for block in content.split("\n\n"):
+        match = match_head(block)
+        if match is None:
+            yield from _iter_srt_block(block, match_timing)
+            continue
+        text = block[match.end():].strip()
+        if "-->" in text:
+            yield from _iter_srt_block(block, match_timing)
             continue
-        # 否则是文本内容
-        elif current_segment is not None:
-            if current_segment['text']:
-                current_segment['text'] += ' ' + line
-            else:
-                current_segment['text'] = line
-    
-    # 添加最后一个段
-    if current_segment:
-        segments.append(current_segment)
-    
-    return segments
+        if "\n" in text:
+            text_lines = [line.strip() for line in text.split("\n")]
+            if "" in text_lines:
+                yield from _iter_srt_block(block, match_timing)
+                continue
+            text = "\n".join(text_lines)
+        h1, m1, s1, f1, h2, m2, s2, f2 = match.groups()
+        yield {
+            "start": int(h1) * 3600 + int(m1) * 60 + int(s1) + int(f1) / 1000.0,
+            "end": int(h2) * 3600 + int(m2) * 60 + int(s2) + int(f2) / 1000.0,
+            "text": text,
+        }
 
 
-def srt_time_to_seconds(time_str: str) -> float:
-    """将SRT时间格式 (HH:MM:SS,mmm) 转换为秒数"""
-    # 处理逗号或点作为毫秒分隔符
-    if ',' in time_str:
-        time_part, ms_part = time_str.split(',')
-    elif '.' in time_str:
-        time_part, ms_part = time_str.split('.')
-    else:
-        time_part = time_str
-        ms_part = '0'
-    
-    # 解析时:分:秒
-    time_parts = time_part.split(':')
-    hours = int(time_parts[0]) if len(time_parts) > 0 else 0
-    minutes = int(time_parts[1]) if len(time_parts) > 1 else 0
-    seconds = int(time_parts[2]) if len(time_parts) > 2 else 0
-    
-    # 解析毫秒（最多3位）
-    milliseconds = int(ms_part[:3].ljust(3, '0'))
-    
-    return hours * 3600 + minutes * 60 + seconds + milliseconds / 1000.0
+def parse_srt(srt_content: str) -> list:
+    """解析SRT文件内容，返回字幕段列表"""
+    return list(iter_srt_string(srt_content))
+
+
+def _segment_fields(segment):
+    """字幕段可以是字典，也可以是带 start/end/text 属性的对象 (如faster-whisper的转录段)"""
+    if isinstance(segment, dict):
+        return segment["start"], segment["end"], segment["text"]
+    return segment.start, segment.end, segment.text
+
+
+def _cue_text(text: str) -> str:
+    text = text.strip()
+    if "\n" in text:
+        # 字幕内的空行会被当作字幕结束，去掉
+        text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+    return text
+
+
+def iter_srt_entries(segments: Iterable) -> Iterator[str]:
+    """逐条生成SRT字幕文本，可直接写入文件或作为流式响应发送"""
+    for i, segment in enumerate(segments, 1):
+        start, end, text = _segment_fields(segment)
+        yield f"{i}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{_cue_text(text)}\n\n"
+
+
+def iter_vtt_entries(segments: Iterable) -> Iterator[str]:
+    """逐条生成WebVTT字幕文本 (第一块为文件头)"""
+    yield "WEBVTT\n\n"
+    for i, segment in enumerate(segments, 1):
+        start, end, text = _segment_fields(segment)
+        # WebVTT的字幕文本中 & < > 需要转义 (也避免出现 -->)
+        text = _cue_text(text)
+        if "&" in text or "<" in text or ">" in text:
+            text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        yield f"{i}\n{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n"
+
+
+def iter_ass_entries(segments: Iterable) -> Iterator[str]:
+    """逐条生成ASS字幕文本 (第一块为文件头和默认样式)"""
+    yield ASS_HEADER
+    for segment in segments:
+        start, end, text = _segment_fields(segment)
+        # 花括号会被当作样式标签，换行使用 \N
+        text = _cue_text(text).replace("{", "(").replace("}", ")").replace("\n", "\\N")
+        yield f"Dialogue: 0,{format_ass_timestamp(start)},{format_ass_timestamp(end)},Default,,0,0,0,,{text}\n"
+
+
+# 字幕输出格式: 扩展名、MIME类型和逐条生成字幕文本的函数
+SUBTITLE_FORMATS = {
+    "srt": {"suffix": ".srt", "media_type": "text/plain", "writer": iter_srt_entries},
+    "vtt": {"suffix": ".vtt", "media_type": "text/vtt", "writer": iter_vtt_entries},
+    "ass": {"suffix": ".ass", "media_type": "text/x-ssa", "writer": iter_ass_entries},
+}
+
+
+def iter_subtitles(segments: Iterable, subtitle_format: str = "srt") -> Iterator[str]:
+    """按指定格式逐条生成字幕文本"""
+    return SUBTITLE_FORMATS[subtitle_format]["writer"](segments)
+
+
+def write_subtitles(segments: Iterable, stream: TextIO, subtitle_format: str = "srt") -> int:
+    """将字幕逐条写入文本流，返回写入的字幕条数"""
+    count = -1 if subtitle_format in ("vtt", "ass") else 0  # 不计文件头
+    for entry in iter_subtitles(segments, subtitle_format):
+        stream.write(entry)
+        count += 1
+    return count
+
+
+def segments_to_subtitle_string(segments: Iterable, subtitle_format: str = "srt") -> str:
+    """将字幕段转换为指定格式的字幕字符串"""
+    return "".join(iter_subtitles(segments, subtitle_format))
+
+
+def segments_to_srt(segments) -> str:
+    """将转录段转换为SRT格式"""
+    return "".join(iter_srt_entries(segments))
 
 
 def segments_to_srt_string(segments: list) -> str:
     """将字幕段列表转换为SRT格式字符串"""
-    srt_content = []
-    for i, segment in enumerate(segments, 1):
-        start_time = format_timestamp(segment['start'])
-        end_time = format_timestamp(segment['end'])
-        text = segment['text'].strip()
-        
-        srt_entry = f"{i}\n{start_time} --> {end_time}\n{text}\n"
-        srt_content.append(srt_entry)
-    
-    return "\n".join(srt_content)
\ No newline at end of file
+    return "".join(iter_srt_entries(segments))
+
+
+def encode_audio(src_path: Path, dest_path: Path, output_format: str):
+    """使用ffmpeg将WAV编码为FLAC/Opus，流式处理，内存占用与文件长度无关"""
+    codec_args = AUDIO_OUTPUT_FORMATS[output_format]["codec_args"]
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg未安装，无法编码为 " + output_format)
+    result = subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-i", str(src_path), *codec_args, str(dest_path)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg编码失败: {result.stderr.decode('utf-8', errors='replace').strip()}")
@@ -0,0 +1,143 @@
+"""Content-addressed on-disk cache with size-based LRU eviction"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from loguru import logger
+
+
+def make_cache_key(**parts: Any) -> str:
+    """将键的各组成部分规范化为JSON后取SHA-256，作为缓存键"""
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """以文件形式存储JSON结果的缓存。
+
+    每个条目保存为 <dir>/<key[:2]>/<key>.json，命中时更新访问时间；
+    总大小超过上限时按最近访问时间驱逐最旧的条目。
+    """
+
+    def __init__(self, name: str, directory: Path, max_size_mb: int):
+        self.name = name
+        self.directory = Path(directory)
+        self.max_size_bytes = max(0, max_size_mb) * 1024 * 1024
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, float]] = {}
+        self.total_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _scan(self):
+        """启动时扫描已有的缓存文件"""
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            self.entries[path.stem] = {"size": stat.st_size, "atime": stat.st_mtime}
+            self.total_size += stat.st_size
+        if self.entries:
+            logger.info(f"缓存 {self.name}: 已加载 {len(self.entries)} 个条目, {self.total_size / 1024 / 1024:.1f} MB")
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            now = time.time()
+            os.utime(path, (now, now))
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取缓存失败: {self.name}/{key}, 错误: {str(e)}")
+            with self.lock:
+                self._remove(key)
+                self.misses += 1
+            return None
+
+        with self.lock:
+            if key in self.entries:
+                self.entries[key]["atime"] = now
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if self.max_size_bytes and len(data) > self.max_size_bytes:
+            logger.debug(f"缓存条目过大，跳过: {self.name}/{key}")
+            return
+
+        # 先写临时文件再重命名，避免读到不完整的条目
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入缓存失败: {self.name}/{key}, 错误: {str(e)}")
+            return
+
+        with self.lock:
+            old = self.entries.get(key)
+            if old:
+                self.total_size -= old["size"]
+            self.entries[key] = {"size": len(data), "atime": time.time()}
+            self.total_size += len(data)
+            self._evict()
+
+    def _remove(self, key: str):
+        """删除条目。调用方需持有 self.lock"""
+        entry = self.entries.pop(key, None)
+        if entry:
+            self.total_size -= entry["size"]
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """按最近访问时间驱逐，直到总大小不超过上限。调用方需持有 self.lock"""
+        if not self.max_size_bytes or self.total_size <= self.max_size_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1]["atime"]):
+            if self.total_size <= self.max_size_bytes:
+                break
+            self._remove(key)
+            self.evictions += 1
+            logger.debug(f"驱逐缓存条目: {self.name}/{key}")
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self._remove(key)
+        logger.info(f"已清空缓存: {self.name}")
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self.entries),
+                "size_mb": round(self.total_size / 1024 / 1024, 2),
+                "max_size_mb": round(self.max_size_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,126 @@
+"""Streaming download helpers: HTTP Range file responses and on-the-fly ZIP archives"""
+import io
+import os
+import re
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+from fastapi import HTTPException
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+# 每次从文件读取并发送的块大小
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """解析单个区间的Range请求头，返回 [start, end] (含end)。不支持多区间，此时返回 None 以发送完整文件"""
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    start_text, end_text = match.groups()
+    if not start_text and not end_text:
+        return None
+    if start_text:
+        start = int(start_text)
+        end = min(int(end_text), file_size - 1) if end_text else file_size - 1
+    else:
+        # bytes=-N 表示最后N个字节
+        start = max(0, file_size - int(end_text))
+        end = file_size - 1
+    if start >= file_size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="请求的范围无效",
+            headers={"Content-Range": f"bytes */{file_size}"},
+        )
+    return start, end
+
+
+def _iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def ranged_file_response(
+    path: str,
+    filename: str,
+    media_type: str,
+    range_header: Optional[str] = None,
+    background: Optional[BackgroundTask] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    """返回文件，支持单区间的HTTP Range请求 (206 Partial Content)，便于大文件断点续传"""
+    file_size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={filename}",
+        **(headers or {}),
+    }
+    byte_range = parse_range_header(range_header, file_size) if range_header else None
+    if byte_range is None:
+        return FileResponse(path=path, media_type=media_type, headers=headers, background=background)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_file_range(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+        background=background,
+    )
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """只写缓冲区: zipfile 写入的数据暂存在这里，由生成器取出后发送"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_stored_zip(entries: Iterable[Tuple[str, Path]]) -> Iterator[bytes]:
+    """边读文件边生成不压缩 (ZIP_STORED) 的ZIP数据流。
+
+    音频文件几乎无法再压缩，不压缩可以省去CPU开销；不在磁盘上生成ZIP文件。
+    entries 为 (压缩包内文件名, 文件路径)。
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED, allowZip64=True) as zipf:
+        for arcname, path in entries:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, "rb") as src, zipf.open(info, "w", force_zip64=True) as dest:
+                for block in iter(lambda: src.read(STREAM_CHUNK_SIZE), b""):
+                    dest.write(block)
+                    yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
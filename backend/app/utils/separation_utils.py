@@ -0,0 +1,186 @@
+"""Windowed Demucs separation over memory-mapped PCM with overlap-add, writing stems incrementally"""
+import wave
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import torch
+from demucs.apply import apply_model
+from loguru import logger
+from ..models.pcm_cache import open_pcm, pcm_to_float32
+
+
+class StemWriter:
+    """逐块追加写入各轨道的16位PCM WAV文件，声道数与分离结果一致"""
+
+    def __init__(self, output_dir: Path, stem_names: List[str], sample_rate: int):
+        self.output_dir = Path(output_dir)
+        self.stem_names = stem_names
+        self.sample_rate = sample_rate
+        self.files: Dict[str, wave.Wave_write] = {}
+
+    def _open(self, channels: int):
+        for stem_name in self.stem_names:
+            f = wave.open(str(self.output_dir / f"{stem_name}.wav"), "wb")
+            f.setnchannels(channels)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            self.files[stem_name] = f
+
+    def write(self, sources: torch.Tensor):
+        """写入一段分离结果，sources shape: [sources, channels, samples]"""
+        if sources.shape[-1] == 0:
+            return
+        if not self.files:
+            self._open(sources.shape[1])
+        pcm = (sources.clamp(-1.0, 1.0) * 32767).round().to(torch.int16)
+        for i, stem_name in enumerate(self.stem_names):
+            if i < pcm.shape[0]:
+                # [channels, samples] -> 交错的 [samples, channels]
+                self.files[stem_name].writeframes(pcm[i].t().contiguous().numpy().tobytes())
+
+    def close(self) -> Dict[str, Path]:
+        for f in self.files.values():
+            f.close()
+        return {name: self.output_dir / f"{name}.wav" for name in self.files}
+
+
+def _prepare_window(chunk: torch.Tensor, model_channels: int, stereo: bool) -> torch.Tensor:
+    """转换为模型期望的声道数。
+
+    立体声模式下声道数相同时原样输入；单声道模式或单声道音频先混合为单声道再扩展。
+    """
+    if stereo and chunk.shape[0] >= model_channels:
+        return chunk[:model_channels]
+    if chunk.shape[0] > 1:
+        chunk = torch.mean(chunk, dim=0, keepdim=True)
+    if model_channels > 1:
+        chunk = chunk.expand(model_channels, -1)
+    return chunk
+
+
+def separate_to_files(
+    model,
+    pcm: Dict,
+    output_dir: Path,
+    device: str,
+    window_seconds: float,
+    overlap_seconds: float,
+    progress_callback: Optional[Callable[[float, Optional[float]], None]] = None,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    stereo: bool = True,
+) -> Dict[str, Path]:
+    """按窗口读取解码缓存中的PCM (见 PcmCache) 并逐窗口分离，相邻窗口的重叠部分线性交叉淡化后追加写入磁盘。
+
+    PCM以内存映射方式读取，内存占用只与窗口长度有关，与音频总长度无关。
+    PCM的采样率应与模型一致 (model.samplerate)。
+    progress_callback(已处理秒数, 总秒数) 在每个窗口完成后调用。
+    start_frame/end_frame 用于只分离其中一段 (多进程并行分离时每个进程处理一段)。
+    stereo 为 False 时混合为单声道分离，并输出单声道轨道。
+    """
+    samples = open_pcm(pcm)
+    sample_rate = pcm["sample_rate"]
+    total_frames = min(end_frame or pcm["frames"], pcm["frames"])
+    total_seconds = total_frames / sample_rate
+
+    window = max(1, int(window_seconds * sample_rate))
+    overlap = min(int(overlap_seconds * sample_rate), window // 2)
+    hop = window - overlap
+    model_channels = getattr(model, "audio_channels", 1)
+    stem_names = list(getattr(model, "sources", ["drums", "bass", "other", "vocals"]))
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    writer = StemWriter(output_dir, stem_names, sample_rate)
+    tail: Optional[torch.Tensor] = None
+    offset = start_frame
+    try:
+        while True:
+            num_frames = min(window, total_frames - offset)
+            if num_frames <= 0:
+                break
+            # (帧数, 声道数) -> (声道数, 帧数)
+            chunk = torch.from_numpy(
+                np.ascontiguousarray(pcm_to_float32(samples[offset:offset + num_frames]).T)
+            )
+            length = chunk.shape[-1]
+
+            chunk = _prepare_window(chunk, model_channels, stereo)
+            with torch.no_grad():
+                sources = apply_model(model, chunk.unsqueeze(0).to(device), device=device)
+            # sources shape: [batch, sources, channels, samples]
+            sources = sources[0].cpu()
+            if not stereo:
+                sources = sources.mean(dim=1, keepdim=True)
+
+            # 与上一个窗口的重叠部分交叉淡化
+            if tail is not None:
+                blend = min(tail.shape[-1], length)
+                fade_in = torch.linspace(0.0, 1.0, blend)
+                sources[..., :blend] = tail[..., :blend] * (1.0 - fade_in) + sources[..., :blend] * fade_in
+
+            is_last = offset + length >= total_frames
+            if is_last:
+                writer.write(sources)
+                tail = None
+            else:
+                writer.write(sources[..., :length - overlap])
+                tail = sources[..., length - overlap:].clone()
+
+            processed_seconds = (offset + length) / sample_rate
+            logger.debug(f"分离进度: {processed_seconds:.1f}/{total_seconds:.1f} 秒")
+            if progress_callback:
+                progress_callback(processed_seconds, total_seconds)
+
+            if is_last:
+                break
+            offset += hop
+    finally:
+        stem_files = writer.close()
+    return stem_files
+
+
+def concat_segments(segments: List[Dict[str, Path]], output_dir: Path, overlap_frames: int) -> Dict[str, Path]:
+    """拼接按段分离的轨道文件: 相邻段重叠 overlap_frames 帧，重叠部分线性交叉淡化。
+
+    每段的最后 overlap_frames 帧与下一段的开头对应同一段音频，逐块复制，内存占用与总长度无关。
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    block_frames = 1024 * 1024
+    stem_files = {}
+    for stem_name in segments[0]:
+        output_path = output_dir / f"{stem_name}.wav"
+        writer = None
+        tail = None
+        for i, segment in enumerate(segments):
+            with wave.open(str(segment[stem_name]), "rb") as reader:
+                if writer is None:
+                    writer = wave.open(str(output_path), "wb")
+                    writer.setparams(reader.getparams())
+                channels = reader.getnchannels()
+                remaining = reader.getnframes()
+
+                # 与上一段的重叠部分交叉淡化
+                if tail is not None:
+                    head = np.frombuffer(reader.readframes(len(tail)), dtype=np.int16).reshape(-1, channels)
+                    blend = len(head)
+                    fade_in = np.linspace(0.0, 1.0, blend, dtype=np.float32)[:, None]
+                    mixed = tail[:blend] * (1.0 - fade_in) + head.astype(np.float32) * fade_in
+                    writer.writeframes(np.clip(np.round(mixed), -32768, 32767).astype(np.int16).tobytes())
+                    remaining -= blend
+                    tail = None
+
+                is_last = i == len(segments) - 1
+                body = remaining if is_last else max(0, remaining - overlap_frames)
+                while body > 0:
+                    count = min(block_frames, body)
+                    writer.writeframes(reader.readframes(count))
+                    body -= count
+                if not is_last:
+                    tail = np.frombuffer(reader.readframes(overlap_frames), dtype=np.int16)
+                    tail = tail.reshape(-1, channels).astype(np.float32)
+        if writer is not None:
+            writer.close()
+        stem_files[stem_name] = output_path
+    return stem_files
@@ -163,3 +163,29 @@ def get_system_info() -> Dict[str, Any]:
     
     return info
 
+
+
+def get_process_memory_mb() -> Optional[float]:
+    """
+    获取当前进程的常驻内存 (RSS)
+
+    Returns:
+        RSS大小 (MB)，无法获取时返回None
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 ** 2)
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.warning(f"无法获取进程内存: {str(e)}")
+        return None
+
+    # 没有psutil时，在Linux上回退到/proc
+    try:
+        import os
+        with open("/proc/self/statm", "r") as f:
+            rss_pages = int(f.read().split()[1])
+        return rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 ** 2)
+    except Exception:
+        return None
@@ -0,0 +1,65 @@
+"""Streaming upload helpers"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Tuple
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from loguru import logger
+from ..config import MAX_UPLOAD_SIZE_MB
+
+# 每次从请求中读取的块大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def save_upload(file: UploadFile, dest_path: Path, max_size_mb: int = MAX_UPLOAD_SIZE_MB) -> Tuple[int, str]:
+    """
+    将上传文件逐块写入目标路径，边写边计算SHA-256
+
+    内存占用与文件大小无关；磁盘写入在线程池中执行，不阻塞事件循环。
+    超过大小上限时删除已写入的部分并返回413。
+
+    Returns:
+        (文件大小, SHA-256十六进制摘要)
+    """
+    max_size = max_size_mb * 1024 * 1024
+    digest = hashlib.sha256()
+    size = 0
+
+    def write_chunk(f, chunk: bytes):
+        digest.update(chunk)
+        f.write(chunk)
+
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    logger.warning(f"上传文件超过大小上限: {file.filename}, 上限: {max_size_mb} MB")
+                    raise HTTPException(status_code=413, detail=f"文件过大，最大支持 {max_size_mb} MB")
+                await run_in_threadpool(write_chunk, f, chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.unlink(dest_path)
+        raise
+
+    return size, digest.hexdigest()
+
+
+async def save_upload_to_temp(file: UploadFile, max_size_mb: int = MAX_UPLOAD_SIZE_MB) -> Tuple[str, int, str]:
+    """
+    将上传文件流式保存为临时文件 (保留原扩展名，便于解码器识别格式)
+
+    Returns:
+        (临时文件路径, 文件大小, SHA-256十六进制摘要)
+    """
+    suffix = Path(file.filename or "").suffix
+    fd, tmp_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    size, sha256 = await save_upload(file, Path(tmp_path), max_size_mb)
+    logger.debug(f"保存上传文件: {file.filename} -> {tmp_path}, 大小: {size} bytes")
+    return tmp_path, size, sha256
@@ -0,0 +1,158 @@
+"""字幕解析/生成的微基准测试
+
+在 backend 目录下运行:
+    python benchmarks/bench_subtitles.py [--cues 100000] [--repeat 3]
+
+生成包含指定条数字幕 (含多行字幕和CRLF换行) 的SRT文件，分别测量:
+- 旧实现 (整体按行切分 + 字符串切分时间戳) 的解析和生成速度，作为对照
+- parse_srt 从字符串解析、iter_srt 从文件流逐行解析
+- SRT / WebVTT / ASS 的生成，以及 write_subtitles 逐条写入文件
+"""
+import argparse
+import importlib.util
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# 直接按路径加载 audio_utils，避免导入 app 包时创建整个应用
+_AUDIO_UTILS_PATH = Path(__file__).resolve().parent.parent / "app" / "utils" / "audio_utils.py"
+_spec = importlib.util.spec_from_file_location("audio_utils", _AUDIO_UTILS_PATH)
+audio_utils = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(audio_utils)
+
+
+def legacy_time_to_seconds(time_str: str) -> float:
+    if ',' in time_str:
+        time_part, ms_part = time_str.split(',')
+    elif '.' in time_str:
+        time_part, ms_part = time_str.split('.')
+    else:
+        time_part, ms_part = time_str, '0'
+    time_parts = time_part.split(':')
+    hours = int(time_parts[0]) if len(time_parts) > 0 else 0
+    minutes = int(time_parts[1]) if len(time_parts) > 1 else 0
+    seconds = int(time_parts[2]) if len(time_parts) > 2 else 0
+    milliseconds = int(ms_part[:3].ljust(3, '0'))
+    return hours * 3600 + minutes * 60 + seconds + milliseconds / 1000.0
+
+
+def legacy_parse_srt(srt_content: str) -> list:
+    """改写前的 parse_srt，作为对照"""
+    segments = []
+    current_segment = None
+    for line in srt_content.split('\n'):
+        line = line.strip()
+        if not line:
+            if current_segment:
+                segments.append(current_segment)
+                current_segment = None
+            continue
+        if '-->' in line:
+            parts = line.split('-->')
+            if len(parts) == 2:
+                current_segment = {
+                    'start': legacy_time_to_seconds(parts[0].strip()),
+                    'end': legacy_time_to_seconds(parts[1].strip()),
+                    'text': ''
+                }
+        elif line.isdigit():
+            continue
+        elif current_segment is not None:
+            current_segment['text'] = (current_segment['text'] + ' ' + line) if current_segment['text'] else line
+    if current_segment:
+        segments.append(current_segment)
+    return segments
+
+
+def legacy_format_timestamp(seconds: float) -> str:
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    milliseconds = int((seconds % 1) * 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+
+def legacy_segments_to_srt_string(segments: list) -> str:
+    """改写前的 segments_to_srt_string，作为对照"""
+    srt_content = []
+    for i, segment in enumerate(segments, 1):
+        start_time = legacy_format_timestamp(segment['start'])
+        end_time = legacy_format_timestamp(segment['end'])
+        srt_content.append(f"{i}\n{start_time} --> {end_time}\n{segment['text'].strip()}\n")
+    return "\n".join(srt_content)
+
+
+def make_segments(count: int) -> list:
+    segments = []
+    for i in range(count):
+        text = f"字幕第 {i} 行 subtitle line number {i}"
+        if i % 3 == 0:
+            text += "\n第二行 second line"
+        segments.append({"start": i * 2.5, "end": i * 2.5 + 2.0, "text": text})
+    return segments
+
+
+def measure(label: str, func, repeat: int, cues: int, size_bytes: int = 0):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    throughput = f"{cues / best:>12,.0f} 条/秒"
+    if size_bytes:
+        throughput += f"  {size_bytes / best / 1024 / 1024:>7.1f} MB/秒"
+    print(f"{label:<32} {best * 1000:>9.1f} ms  {throughput}  峰值内存 {peak / 1024 / 1024:>7.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字幕解析/生成微基准测试")
+    parser.add_argument("--cues", type=int, default=100_000, help="字幕条数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最快一次")
+    args = parser.parse_args()
+
+    segments = make_segments(args.cues)
+    srt_content = audio_utils.segments_to_srt_string(segments).replace("\n", "\r\n")
+    size = len(srt_content.encode("utf-8"))
+    print(f"字幕条数: {args.cues:,}, SRT大小: {size / 1024 / 1024:.1f} MB\n")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        srt_path = os.path.join(tmp_dir, "bench.srt")
+        with open(srt_path, "w", encoding="utf-8", newline="") as f:
+            f.write(srt_content)
+
+        measure("旧实现 parse_srt", lambda: legacy_parse_srt(srt_content), args.repeat, args.cues, size)
+        parsed = measure("parse_srt (字符串)", lambda: audio_utils.parse_srt(srt_content), args.repeat, args.cues, size)
+
+        def parse_stream():
+            with open(srt_path, "r", encoding="utf-8-sig") as f:
+                return sum(1 for _ in audio_utils.iter_srt(f))
+
+        count = measure("iter_srt (文件流, 不保留结果)", parse_stream, args.repeat, args.cues, size)
+        assert len(parsed) == count == args.cues, "解析结果条数不一致"
+        assert parsed == segments, "解析结果与原始字幕不一致"
+        print()
+
+        measure("旧实现 生成SRT字符串", lambda: legacy_segments_to_srt_string(segments), args.repeat, args.cues)
+        for fmt in ("srt", "vtt", "ass"):
+            measure(
+                f"生成 {fmt.upper()} 字符串",
+                lambda: audio_utils.segments_to_subtitle_string(segments, fmt), args.repeat, args.cues
+            )
+
+        def write_stream():
+            with open(os.path.join(tmp_dir, "out.srt"), "w", encoding="utf-8") as f:
+                return audio_utils.write_subtitles(segments, f, "srt")
+
+        measure("write_subtitles (文件流)", write_stream, args.repeat, args.cues)
+
+
+if __name__ == "__main__":
+    main()
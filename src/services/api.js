@@ -44,6 +44,45 @@ export const audioAPI = {
     return await api.post('/upload', formData)
   },
 
+  // 分块上传大文件，支持并行和断点续传。传入 uploadId 可继续之前未完成的上传
+  async uploadResumable(file, { uploadId = null, chunkSize = 8 * 1024 * 1024, concurrency = 3, onProgress } = {}) {
+    const session = uploadId
+      ? await api.get(`/uploads/${uploadId}`)
+      : await api.post('/uploads', { filename: file.name, total_size: file.size }, {
+          headers: { 'Content-Type': 'application/json' },
+        })
+
+    // 只上传缺失的区间
+    const chunks = []
+    for (const [start, end] of session.missing) {
+      for (let offset = start; offset < end; offset += chunkSize) {
+        chunks.push([offset, Math.min(offset + chunkSize, end)])
+      }
+    }
+
+    let uploaded = session.received_bytes
+    const uploadNext = async () => {
+      while (chunks.length > 0) {
+        const [start, end] = chunks.shift()
+        const data = await file.slice(start, end).arrayBuffer()
+        const digest = await crypto.subtle.digest('SHA-256', data)
+        const checksum = Array.from(new Uint8Array(digest))
+          .map((b) => b.toString(16).padStart(2, '0'))
+          .join('')
+        await api.put(`/uploads/${session.upload_id}`, data, {
+          params: { offset: start },
+          headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum },
+          timeout: 0,
+        })
+        uploaded += end - start
+        onProgress?.(uploaded / file.size)
+      }
+    }
+    await Promise.all(Array.from({ length: concurrency }, uploadNext))
+
+    return await api.post(`/uploads/${session.upload_id}/complete`)
+  },
+
   // 处理音频文件
   async processAudio(file, operation = 'analyze') {
     const formData = new FormData()
@@ -53,18 +92,22 @@ export const audioAPI = {
   },
 
   // 使用Whisper转录音频
-  async transcribeAudio(file, modelName = 'base', language = null) {
+  // longForm: 长音频模式，按静音切分后并行转录
+  async transcribeAudio(file, modelName = 'base', language = null, longForm = false) {
     const formData = new FormData()
     formData.append('file', file)
     formData.append('model_name', modelName)
     if (language) {
       formData.append('language', language)
     }
+    if (longForm) {
+      formData.append('long_form', 'true')
+    }
     return await api.post('/transcribe', formData)
   },
 
   // 下载SRT字幕文件
-  async downloadSRT(file, modelName = 'base', language = null) {
+  async downloadSRT(file, modelName = 'base', language = null, longForm = false) {
     const formData = new FormData()
     formData.append('file', file)
     formData.append('model_name', modelName)
@@ -72,6 +115,9 @@ export const audioAPI = {
     if (language) {
       formData.append('language', language)
     }
+    if (longForm) {
+      formData.append('long_form', 'true')
+    }
 
     // 使用axios直接获取blob
     const response = await axios.post('/api/transcribe', formData, {
@@ -82,6 +128,82 @@ export const audioAPI = {
     return response
   },
 
+  // 通过WebSocket流式转录，每解码出一段字幕立即回调 onSegment
+  streamTranscription(file, { modelName = 'base', language = null, onInfo, onSegment, onDone, onError } = {}) {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+    const socket = new WebSocket(`${protocol}//${window.location.host}/api/transcribe/ws`)
+    socket.binaryType = 'arraybuffer'
+
+    socket.onopen = async () => {
+      socket.send(JSON.stringify({ model_name: modelName, language, filename: file.name }))
+      // 分块发送音频，避免一次性占用大量内存
+      const chunkSize = 1024 * 1024
+      for (let offset = 0; offset < file.size; offset += chunkSize) {
+        socket.send(await file.slice(offset, offset + chunkSize).arrayBuffer())
+      }
+      socket.send(JSON.stringify({ type: 'end' }))
+    }
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data)
+      if (message.type === 'info') onInfo?.(message)
+      else if (message.type === 'segment') onSegment?.(message)
+      else if (message.type === 'done') onDone?.(message)
+      else if (message.type === 'error') onError?.(new Error(message.detail || '流式转录失败'))
+    }
+
+    socket.onerror = () => onError?.(new Error('WebSocket连接失败'))
+
+    return socket
+  },
+
+  // 提交后台转录任务（适用于长音频），立即返回任务ID
+  async createTranscriptionJob(file, modelName = 'base', language = null, longForm = false) {
+    const formData = new FormData()
+    formData.append('file', file)
+    formData.append('model_name', modelName)
+    if (language) {
+      formData.append('language', language)
+    }
+    if (longForm) {
+      formData.append('long_form', 'true')
+    }
+    return await api.post('/jobs/transcribe', formData)
+  },
+
+  // 获取任务进度和结果，since 用于增量获取字幕段
+  async getJob(jobId, since = 0) {
+    return await api.get(`/jobs/${jobId}`, { params: { since } })
+  },
+
+  async cancelJob(jobId) {
+    return await api.delete(`/jobs/${jobId}`)
+  },
+
+  // 通过SSE订阅任务进度和新产生的结果段，任务结束后自动关闭连接
+  watchJob(jobId, { since = 0, onProgress, onSegments, onDone, onError } = {}) {
+    const source = new EventSource(`/api/jobs/${jobId}/events?since=${since}`)
+    source.addEventListener('progress', (event) => onProgress?.(JSON.parse(event.data)))
+    source.addEventListener('segments', (event) => onSegments?.(JSON.parse(event.data)))
+    source.addEventListener('done', (event) => {
+      source.close()
+      onDone?.(JSON.parse(event.data))
+    })
+    source.onerror = () => {
+      // 服务端正常结束时已先收到 done 事件并关闭
+      if (source.readyState !== EventSource.CLOSED) {
+        source.close()
+        onError?.(new Error('任务事件流连接失败'))
+      }
+    }
+    return source
+  },
+
+  // 下载任务结果的字幕 (未完成时为已完成部分)，format 为 srt / vtt / ass
+  async getJobSRT(jobId, format = 'srt') {
+    return await axios.get(`/api/jobs/${jobId}/srt`, { params: { format }, responseType: 'blob' })
+  },
+
   // 模型管理相关API
   async getModels() {
     return await api.get('/models')
@@ -119,6 +241,18 @@ export const audioAPI = {
     return response
   },
 
+  // 提交后台翻译任务，译文通过 watchJob 按批次推送
+  async createTranslationJob(file, targetLanguage = 'en', sourceLanguage = null) {
+    const formData = new FormData()
+    formData.append('file', file)
+    formData.append('target_language', targetLanguage)
+    formData.append('background', 'true')
+    if (sourceLanguage) {
+      formData.append('source_language', sourceLanguage)
+    }
+    return await api.post('/translate-srt', formData)
+  },
+
   // 配置相关API
   async getConfig() {
     return await api.get('/config')
@@ -133,11 +267,12 @@ export const audioAPI = {
   },
 
   // 语音分离相关API
-  async separateVoice(file, model = 'htdemucs', stems = 'vocals,drums,bass,other') {
+  async separateVoice(file, model = 'htdemucs', stems = 'vocals,drums,bass,other', format = 'wav') {
     const formData = new FormData()
     formData.append('file', file)
     formData.append('model', model)
     formData.append('stems', stems)
+    formData.append('format', format)
 
     // 使用axios直接获取blob（可能是单个文件或ZIP）
     const response = await axios.post('/api/separate-voice', formData, {